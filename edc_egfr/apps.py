@@ -1,5 +1,20 @@
+import sys
+
 from django.apps import AppConfig as DjangoAppConfig
+from django.core.checks import register
 
 
 class AppConfig(DjangoAppConfig):
     name = "edc_egfr"
+
+    def ready(self):
+        from . import signals  # noqa
+        from .system_checks import egfr_drop_notification_model_check
+        from .warm_up import get_warm_up, warm_up_egfr
+
+        register(egfr_drop_notification_model_check)
+        if get_warm_up():
+            report = warm_up_egfr()
+            sys.stdout.write(f" * {report}.\n")
+            for message in report.messages:
+                sys.stdout.write(f"   - {message}\n")
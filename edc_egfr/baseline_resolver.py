@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Iterable
+
+from django.apps import apps as django_apps
+
+if TYPE_CHECKING:
+    from django.db import models
+
+
+class BaselineEgfrResolver:
+    """Resolves an as-of baseline eGFR, the most recent eGFR value at
+    or before a reference datetime and within `window` of it, from an
+    eGFR result CRF model.
+
+    All rows of a subject are considered, including those of
+    unscheduled visits (`visit_code_sequence` > 0).
+
+    eGFR values are fetched once per subject into a sorted index
+    and cached. Use `prefetch()` to build the index for a batch of
+    subjects with a single query.
+
+    Set `using` to read from a database other than the default, e.g.
+    a read replica.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        window: timedelta | None = None,
+        related_visit_model_attr: str | None = None,
+        datetime_field: str | None = None,
+        using: str | None = None,
+    ):
+        self.model = model
+        self.window = window
+        self.using = using
+        self.related_visit_model_attr = related_visit_model_attr or "subject_visit"
+        self.datetime_field = datetime_field or "report_datetime"
+        # {subject_identifier: ([report_datetime, ...], [egfr_value, ...], [pk, ...])}
+        self._cache: dict[str, tuple[list[datetime], list[Decimal], list[Any]]] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(model={self.model}, window={self.window})"
+
+    @property
+    def model_cls(self) -> models.Model:
+        return django_apps.get_model(self.model)
+
+    def get_egfr_value(
+        self, subject_identifier: str, reference_datetime: datetime
+    ) -> Decimal | None:
+        """Returns the most recent eGFR value at or before
+        `reference_datetime` and within the window, or None.
+        """
+        if subject_identifier not in self._cache:
+            self.prefetch([subject_identifier])
+        datetimes, egfr_values, _ = self._cache[subject_identifier]
+        index = bisect_right(datetimes, reference_datetime)
+        if not index or (
+            self.window is not None and datetimes[index - 1] < reference_datetime - self.window
+        ):
+            return None
+        return egfr_values[index - 1]
+
+    def prefetch(self, subject_identifiers: Iterable[str]):
+        """Fetches and caches the eGFR values of the given subjects
+        with one query.
+        """
+        subject_identifiers = set(subject_identifiers)
+        subject_identifier_field = f"{self.related_visit_model_attr}__subject_identifier"
+        queryset = (
+            self.model_cls._default_manager.using(self.using)
+            .filter(
+                **{
+                    f"{subject_identifier_field}__in": subject_identifiers,
+                    "egfr_value__isnull": False,
+                }
+            )
+            .values_list(subject_identifier_field, self.datetime_field, "egfr_value", "pk")
+            .order_by(subject_identifier_field, self.datetime_field)
+        )
+        data = defaultdict(lambda: ([], [], []))
+        for subject_identifier, report_datetime, egfr_value, pk in queryset:
+            data[subject_identifier][0].append(report_datetime)
+            data[subject_identifier][1].append(egfr_value)
+            data[subject_identifier][2].append(pk)
+        for subject_identifier in subject_identifiers:
+            self._cache[subject_identifier] = data[subject_identifier]
+
+    def update(
+        self,
+        subject_identifier: str,
+        pk: Any,
+        report_datetime: datetime,
+        egfr_value: Decimal | None,
+    ) -> None:
+        """Updates the index of a cached subject after a row is saved,
+        e.g. when a batch job recomputes rows in date order.
+        """
+        if subject_identifier not in self._cache:
+            return
+        datetimes, egfr_values, pks = self._cache[subject_identifier]
+        if pk in pks:
+            index = pks.index(pk)
+            for values in [datetimes, egfr_values, pks]:
+                del values[index]
+        if egfr_value is not None:
+            index = bisect_right(datetimes, report_datetime)
+            datetimes.insert(index, report_datetime)
+            egfr_values.insert(index, egfr_value)
+            pks.insert(index, pk)
+
+    def clear(self) -> None:
+        self._cache = {}
@@ -0,0 +1,223 @@
+"""Chunked processing sized to a memory budget.
+
+`AdaptiveBatchRunner` measures the peak memory allocated while each
+chunk is processed, with `tracemalloc`, and sizes the next chunk
+from it. Chunks grow, at most doubling, while the estimated peak of
+the next chunk fits within the budget and rows per second do not
+fall. A chunk over the budget shrinks the next one and caps the
+size from then on.
+
+`tracemalloc` only traces memory allocated through Python's
+allocators, which includes NumPy arrays but not, for example,
+database driver buffers. Its peak is process-wide: allocations of
+other threads are counted, and a measurement started in another
+thread resets the peak of one in progress, which is then
+underestimated. Measure one chunk at a time per process.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Sequence
+
+MB = 1024 * 1024
+
+_lock = threading.Lock()
+# open `traced_peak` blocks, and whether tracing was started by them
+_tracing = 0
+_started = False
+
+
+@contextmanager
+def traced_peak() -> Iterator[list[int]]:
+    """Yields a list that, on exit, holds the peak bytes allocated
+    within the block.
+
+    Tracing is started, if not on already, and stopped on exit of
+    the last open block. Blocks must not overlap across threads,
+    each resets the process-wide peak.
+    """
+    global _tracing, _started
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started = True
+        _tracing += 1
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    peak = []
+    try:
+        yield peak
+    finally:
+        with _lock:
+            peak.append(max(tracemalloc.get_traced_memory()[1] - before, 0))
+            _tracing -= 1
+            if not _tracing and _started:
+                tracemalloc.stop()
+                _started = False
+
+
+@dataclass
+class ChunkMeasurement:
+    rows: int = 0
+    # peak bytes allocated while the chunk was processed
+    peak: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class BatchRunReport:
+    memory_budget: int
+    chunks: list[ChunkMeasurement] = field(default_factory=list)
+
+    def __str__(self):
+        if not self.chunks:
+            return "0 rows"
+        return (
+            f"{self.rows} rows in {len(self.chunks)} chunks of "
+            f"{min(self.chunk_sizes)}-{max(self.chunk_sizes)} rows, "
+            f"peak {self.peak / MB:.1f}MB of {self.memory_budget / MB:.1f}MB, "
+            f"{self.rows_per_second:.0f} rows/s"
+        )
+
+    @property
+    def chunk_sizes(self) -> list[int]:
+        return [chunk.rows for chunk in self.chunks]
+
+    @property
+    def peaks(self) -> list[int]:
+        return [chunk.peak for chunk in self.chunks]
+
+    @property
+    def seconds(self) -> float:
+        return sum(chunk.seconds for chunk in self.chunks)
+
+    @property
+    def rows(self) -> int:
+        return sum(self.chunk_sizes)
+
+    @property
+    def peak(self) -> int:
+        return max(self.peaks, default=0)
+
+    @property
+    def over_budget(self) -> int:
+        """Returns the number of chunks that exceeded the budget."""
+        return len([peak for peak in self.peaks if peak > self.memory_budget])
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class AdaptiveBatchRunner:
+    """Processes rows in chunks sized to keep the peak memory of each
+    chunk within `memory_budget` bytes.
+
+    Use `run()` for a sequence, or `chunk_size` and `measure()` to
+    fetch chunks as you go:
+
+        runner = AdaptiveBatchRunner(memory_budget=256 * MB)
+        while True:
+            with runner.measure() as chunk:
+                rows = fetch(runner.chunk_size)
+                chunk.rows = len(rows)
+                process(rows)
+            if not rows:
+                break
+        print(runner.report)
+
+    The next chunk is sized to fill `headroom` of the budget.
+    """
+
+    headroom = 0.8
+    # fall in rows per second, relative to the best, that stops growth
+    slowdown_tolerance = 0.1
+    # chunks quicker than this are too noisy to compare rows per second
+    min_timed_seconds = 0.05
+
+    def __init__(
+        self,
+        memory_budget: int,
+        min_chunk_size: int | None = None,
+        max_chunk_size: int | None = None,
+        initial_chunk_size: int | None = None,
+    ):
+        if memory_budget <= 0:
+            raise ValueError(
+                f"Invalid memory budget. Expected bytes > 0. Got {memory_budget}."
+            )
+        self.memory_budget = memory_budget
+        self.min_chunk_size = min_chunk_size or 10
+        self.max_chunk_size = max(max_chunk_size or 10000, self.min_chunk_size)
+        self.chunk_size = self.clamp(initial_chunk_size or 100)
+        self.ceiling = self.max_chunk_size
+        self.best_rate = 0.0
+        self.best_size = 0
+        self.report = BatchRunReport(memory_budget=memory_budget)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(memory_budget={self.memory_budget})"
+
+    def clamp(self, chunk_size: int) -> int:
+        return min(max(chunk_size, self.min_chunk_size), self.max_chunk_size)
+
+    def run(self, rows: Sequence, func: Callable[[Sequence], Any]) -> BatchRunReport:
+        """Calls `func` with consecutive chunks of `rows` and returns
+        the report, accumulated over all calls of this runner.
+        """
+        index = 0
+        while index < len(rows):
+            chunk = rows[index : index + self.chunk_size]
+            with self.measure(len(chunk)):
+                func(chunk)
+            index += len(chunk)
+        return self.report
+
+    @contextmanager
+    def measure(self, rows: int = 0) -> Iterator[ChunkMeasurement]:
+        """Measures a chunk and sizes the next chunk.
+
+        Set `rows` of the yielded measurement if the number of rows
+        is not known until within the block. The chunk is measured
+        even if the block raises.
+        """
+        chunk = ChunkMeasurement(rows=rows)
+        start = time.perf_counter()
+        try:
+            with traced_peak() as peak:
+                yield chunk
+        finally:
+            chunk.peak = peak[0]
+            chunk.seconds = time.perf_counter() - start
+            self.update(chunk)
+
+    def update(self, chunk: ChunkMeasurement) -> None:
+        if chunk.rows:
+            self.report.chunks.append(chunk)
+            self.chunk_size = self.get_next_chunk_size(chunk.rows, chunk.peak, chunk.seconds)
+
+    def get_next_chunk_size(self, rows: int, peak: int, seconds: float) -> int:
+        target = self.memory_budget * self.headroom
+        if peak > target:
+            # too big: shrink in proportion and do not grow back past it
+            chunk_size = int(rows * target / peak)
+            self.ceiling = max(min(self.ceiling, chunk_size), self.min_chunk_size)
+            return self.clamp(chunk_size)
+        if seconds >= self.min_timed_seconds:
+            rate = rows / seconds
+            if rate >= self.best_rate:
+                self.best_rate, self.best_size = rate, rows
+            elif rows > self.best_size and rate < self.best_rate * (
+                1 - self.slowdown_tolerance
+            ):
+                # larger but slower: settle on the fastest size seen
+                self.ceiling = self.best_size
+        chunk_size = rows * 2
+        if peak:
+            chunk_size = min(chunk_size, int(rows * target / peak))
+        return self.clamp(min(chunk_size, self.ceiling))
@@ -1,11 +1,14 @@
 from typing import Any, Optional, Union
 
-from edc_constants.constants import FEMALE, MALE
-from edc_reportable import MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER, convert_units
-
-
-class EgfrCalculatorError(Exception):
-    pass
+from .core import (
+    FEMALE,
+    MALE,
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+    CreatinineConversionNotHandled,
+    EgfrCalculatorError,
+    convert_creatinine,
+)
 
 
 class BaseEgfr:
@@ -33,21 +36,25 @@ class BaseEgfr:
             )
         self.age_in_years = float(age_in_years) if age_in_years else None
         if creatinine_value and creatinine_units:
-            self.scr.update(
-                {
-                    MILLIGRAMS_PER_DECILITER: convert_units(
-                        float(creatinine_value),
-                        units_from=creatinine_units,
-                        units_to=MILLIGRAMS_PER_DECILITER,
-                    )
-                }
-            )
-            self.scr.update(
-                {
-                    MICROMOLES_PER_LITER: convert_units(
-                        float(creatinine_value),
-                        units_from=creatinine_units,
-                        units_to=MICROMOLES_PER_LITER,
-                    )
-                }
+            for units_to in [MILLIGRAMS_PER_DECILITER, MICROMOLES_PER_LITER]:
+                self.scr.update(
+                    {
+                        units_to: self.convert_creatinine(
+                            creatinine_value, creatinine_units, units_to
+                        )
+                    }
+                )
+
+    @staticmethod
+    def convert_creatinine(
+        creatinine_value: Union[float, int], units_from: str, units_to: str
+    ) -> float:
+        try:
+            return convert_creatinine(creatinine_value, units_from, units_to)
+        except CreatinineConversionNotHandled:
+            # let edc_reportable handle or raise `ConversionNotHandled`
+            from edc_reportable import convert_units
+
+            return convert_units(
+                float(creatinine_value), units_from=units_from, units_to=units_to
             )
@@ -0,0 +1,141 @@
+"""Batch evaluation of the eGFR calculators that never raises per
+row.
+
+Each row gets an error code instead of an exception; see
+`error_reasons`. Codes are assigned in the order the scalar
+calculators validate their input.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+from . import vectorized
+from .vectorized import EgfrInputs
+
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
+
+OK = 0
+INVALID_GENDER = 1
+INVALID_AGE = 2
+MISSING_CREATININE = 3
+CREATININE_UNITS_NOT_HANDLED = 4
+MISSING_ETHNICITY = 5
+MISSING_WEIGHT = 6
+NOT_CALCULATED = 7
+
+error_reasons = {
+    OK: "ok",
+    INVALID_GENDER: "invalid_gender",
+    INVALID_AGE: "invalid_age",
+    MISSING_CREATININE: "missing_creatinine",
+    CREATININE_UNITS_NOT_HANDLED: "creatinine_units_not_handled",
+    MISSING_ETHNICITY: "missing_ethnicity",
+    MISSING_WEIGHT: "missing_weight",
+    NOT_CALCULATED: "not_calculated",
+}
+
+
+@dataclass
+class ErrorReport:
+    """Counts of rows by error reason."""
+
+    total: int = 0
+    counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def failed(self) -> int:
+        return self.total - self.counts.get(error_reasons[OK], 0)
+
+    def merge(self, other: ErrorReport) -> ErrorReport:
+        counts = Counter(self.counts)
+        counts.update(other.counts)
+        return ErrorReport(total=self.total + other.total, counts=dict(counts))
+
+    def as_rows(self) -> list[tuple[str, int]]:
+        """Returns (reason, count) for the failed rows, most
+        frequent first.
+        """
+        return sorted(
+            [(k, v) for k, v in self.counts.items() if k != error_reasons[OK]],
+            key=lambda x: (-x[1], x[0]),
+        )
+
+
+@dataclass
+class BatchResult:
+    values: np.ndarray
+    error_codes: np.ndarray
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def error_report(self) -> ErrorReport:
+        codes, counts = np.unique(self.error_codes, return_counts=True)
+        return ErrorReport(
+            total=len(self),
+            counts={
+                error_reasons[code]: count
+                for code, count in zip(codes.tolist(), counts.tolist())
+            },
+        )
+
+
+def get_error_codes(formula_name: str, inputs: EgfrInputs, values: ArrayLike) -> np.ndarray:
+    """Returns a uint8 array with the first reason each row could
+    not be calculated, or `OK`.
+    """
+    codes = np.full(len(inputs), OK, dtype=np.uint8)
+    value = inputs.creatinine_value
+    checks = [
+        (INVALID_GENDER, ~inputs.valid_gender),
+        (INVALID_AGE, ~inputs.valid_age),
+        (MISSING_CREATININE, (value == 0) | np.isnan(value) | ~inputs.has_units),
+        (CREATININE_UNITS_NOT_HANDLED, ~(inputs.umol_l | inputs.mg_dl)),
+    ]
+    if formula_name == "ckd-epi":
+        checks.append((MISSING_ETHNICITY, ~inputs.has_ethnicity))
+    elif formula_name == "cockcroft-gault":
+        checks.append((MISSING_WEIGHT, ~inputs.has_weight))
+    checks.append((NOT_CALCULATED, np.isnan(vectorized.as_float_array(values))))
+    pending = np.ones(len(inputs), dtype=bool)
+    for code, mask in checks:
+        mask = pending & mask
+        codes[mask] = code
+        pending &= ~mask
+    return codes
+
+
+def evaluate_batch(formula_name: str, inputs: EgfrInputs) -> BatchResult:
+    """Returns eGFR values and per row error codes for `inputs`.
+
+    Raises only for an invalid `formula_name`.
+    """
+    values = vectorized.calculate(formula_name, inputs)
+    return BatchResult(
+        values=values, error_codes=get_error_codes(formula_name, inputs, values)
+    )
+
+
+def evaluate_rows(formula_name: str, rows: Iterable[dict]) -> BatchResult:
+    """Returns a `BatchResult` for rows of calculator keyword
+    arguments, as passed to `EgfrCkdEpi` or `EgfrCockcroftGault`.
+    """
+    rows = list(rows)
+    return evaluate_batch(
+        formula_name,
+        EgfrInputs.from_values(
+            gender=[row.get("gender") for row in rows],
+            age_in_years=[row.get("age_in_years") for row in rows],
+            creatinine_value=[row.get("creatinine_value") for row in rows],
+            creatinine_units=[row.get("creatinine_units") for row in rows],
+            ethnicity=[row.get("ethnicity") for row in rows],
+            weight=[row.get("weight") for row in rows],
+        ),
+    )
@@ -0,0 +1,88 @@
+"""Django-free core of the eGFR calculators.
+
+Imports only the standard library so that a worker that only
+calculates, e.g. in a process pool, starts without loading Django,
+`edc_reportable` or `edc_constants`. The constants below have the
+same values as those in `edc_constants` and `edc_reportable`.
+
+`EgfrCkdEpi` and `EgfrCockcroftGault` validate their inputs and
+delegate the arithmetic to `ckd_epi` and `cockcroft_gault`.
+`egfr_percent_change` is already free of Django.
+"""
+
+from __future__ import annotations
+
+import math
+
+BLACK = "black"
+FEMALE = "F"
+MALE = "M"
+
+MICROMOLES_PER_LITER = "umol/L"
+MILLIGRAMS_PER_DECILITER = "mg/dL"
+
+# creatinine, umol/L = mg/dL * 88.42
+CREATININE_UMOL_L_PER_MG_DL = 88.42
+
+# as `edc_reportable.convert_units`
+CONVERSION_PLACES = 4
+
+
+class EgfrCalculatorError(Exception):
+    pass
+
+
+class CreatinineConversionNotHandled(Exception):
+    pass
+
+
+def round_half_away_from_zero(value: float, places: int) -> float:
+    """Returns value rounded as `edc_utils.round_half_away_from_zero`
+    rounds a float.
+    """
+    multiplier = 10**places
+    return math.copysign(math.floor(abs(value) * multiplier + 0.5) / multiplier, value)
+
+
+def convert_creatinine(value: float, units_from: str, units_to: str) -> float:
+    """Returns a creatinine value converted between umol/L and mg/dL
+    as `edc_reportable.convert_units` would or raises
+    `CreatinineConversionNotHandled`.
+    """
+    value = float(value)
+    if units_from != units_to:
+        if (units_from, units_to) == (MILLIGRAMS_PER_DECILITER, MICROMOLES_PER_LITER):
+            value = value * CREATININE_UMOL_L_PER_MG_DL
+        elif (units_from, units_to) == (MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER):
+            value = value / CREATININE_UMOL_L_PER_MG_DL
+        else:
+            raise CreatinineConversionNotHandled(
+                f"Conversion not handled. Got from {units_from} to {units_to}"
+            )
+    if value:
+        value = round_half_away_from_zero(value, CONVERSION_PLACES)
+    return value
+
+
+def ckd_epi(
+    scr_mg_dl: float, gender: str, age_in_years: float, ethnicity: str | None
+) -> float:
+    """Returns the CKD-EPI (2009) eGFR for creatinine in mg/dL."""
+    kappa = 0.7 if gender == FEMALE else 0.9
+    alpha = -0.329 if gender == FEMALE else -0.411
+    return float(
+        141.000
+        * (min(scr_mg_dl / kappa, 1.000) ** alpha)
+        * (max(scr_mg_dl / kappa, 1.000) ** -1.209)
+        * float(0.993**age_in_years)
+        * (1.018 if gender == FEMALE else 1.000)
+        * (1.159 if ethnicity == BLACK else 1.000)
+    )
+
+
+def cockcroft_gault(
+    scr_umol_l: float, gender: str, age_in_years: float, weight: float
+) -> float:
+    """Returns the Cockcroft-Gault eGFR for creatinine in umol/L."""
+    gender_factor = 1.05 if gender == FEMALE else 1.23
+    return ((140.00 - age_in_years) * weight * gender_factor) / float(scr_umol_l)
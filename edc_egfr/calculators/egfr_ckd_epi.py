@@ -1,12 +1,9 @@
 from typing import Optional
 
-from edc_constants.constants import BLACK, FEMALE
-
 # TODO: https://www.rcpa.edu.au/Manuals/RCPA-Manual/
 #  Pathology-Tests/C/Creatinine-clearance-Cockcroft-and-Gault
-from edc_reportable import MILLIGRAMS_PER_DECILITER
-
 from .base_egrfr import BaseEgfr, EgfrCalculatorError
+from .core import BLACK, FEMALE, MILLIGRAMS_PER_DECILITER, ckd_epi
 
 
 class EgfrCkdEpi(BaseEgfr):
@@ -30,14 +27,11 @@ class EgfrCkdEpi(BaseEgfr):
             and self.ethnicity
             and self.scr.get(MILLIGRAMS_PER_DECILITER)
         ):
-            scr = self.scr.get(MILLIGRAMS_PER_DECILITER)
-            return float(
-                141.000
-                * (min(scr / self.kappa, 1.000) ** self.alpha)
-                * (max(scr / self.kappa, 1.000) ** -1.209)
-                * self.age_factor
-                * self.gender_factor
-                * self.ethnicity_factor
+            return ckd_epi(
+                self.scr.get(MILLIGRAMS_PER_DECILITER),
+                self.gender,
+                self.age_in_years,
+                self.ethnicity,
             )
         opts = dict(
             gender=self.gender,
@@ -2,10 +2,8 @@ from __future__ import annotations
 
 from decimal import Decimal
 
-from edc_constants.constants import FEMALE
-from edc_reportable import MICROMOLES_PER_LITER
-
 from .base_egrfr import BaseEgfr, EgfrCalculatorError
+from .core import MICROMOLES_PER_LITER, cockcroft_gault
 
 
 class EgfrCockcroftGault(BaseEgfr):
@@ -46,12 +44,12 @@ class EgfrCockcroftGault(BaseEgfr):
             and self.weight
             and self.scr.get(MICROMOLES_PER_LITER)
         ):
-            gender_factor = 1.05 if self.gender == FEMALE else 1.23
-            adjusted_age = 140.00 - self.age_in_years
-            value = (adjusted_age * self.weight * gender_factor) / float(
-                self.scr.get(MICROMOLES_PER_LITER)
+            return cockcroft_gault(
+                self.scr.get(MICROMOLES_PER_LITER),
+                self.gender,
+                self.age_in_years,
+                self.weight,
             )
-            return value
         opts = dict(
             gender=self.gender,
             age_in_years=self.age_in_years,
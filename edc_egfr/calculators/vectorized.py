@@ -0,0 +1,330 @@
+"""Vectorized (numpy) versions of the eGFR calculators for columns
+of values.
+
+Rows for which a scalar calculator would raise are returned as
+NaN. Values match the scalar calculators exactly.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .core import (
+    BLACK,
+    CREATININE_UMOL_L_PER_MG_DL,
+    FEMALE,
+    MALE,
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+)
+
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
+
+    from ..grading import CompiledGradingTable
+
+NOT_GRADED = -1
+
+
+def as_float_array(values: ArrayLike) -> np.ndarray:
+    """Returns a float64 array, None becomes NaN."""
+    return np.asarray(values, dtype=np.float64)
+
+
+def as_object_array(values: ArrayLike) -> np.ndarray:
+    return np.asarray(values, dtype=object)
+
+
+def is_truthy(values: ArrayLike) -> np.ndarray:
+    """Returns a boolean array, False for None, NaN and empty values."""
+    values = as_object_array(values)
+    # NaN is the only value not equal to itself
+    return values.astype(bool) & (values == values)
+
+
+@dataclass
+class EgfrInputs:
+    """Columns of calculator inputs as float arrays and boolean
+    masks.
+
+    Use `from_values` for columns of Python values or build the
+    masks directly, e.g. from Arrow buffers.
+    """
+
+    male: np.ndarray
+    female: np.ndarray
+    age_in_years: np.ndarray
+    creatinine_value: np.ndarray
+    umol_l: np.ndarray
+    mg_dl: np.ndarray
+    black: np.ndarray | None = None
+    has_ethnicity: np.ndarray | None = None
+    weight: np.ndarray | None = None
+    has_units: np.ndarray | None = None
+
+    def __post_init__(self):
+        size = len(self.creatinine_value)
+        if self.has_units is None:
+            self.has_units = self.umol_l | self.mg_dl
+        if self.black is None:
+            self.black = np.zeros(size, dtype=bool)
+        if self.has_ethnicity is None:
+            self.has_ethnicity = np.zeros(size, dtype=bool)
+        if self.weight is None:
+            self.weight = np.full(size, np.nan)
+
+    def __len__(self):
+        return len(self.creatinine_value)
+
+    @classmethod
+    def from_values(
+        cls,
+        gender: ArrayLike,
+        age_in_years: ArrayLike,
+        creatinine_value: ArrayLike,
+        creatinine_units: ArrayLike,
+        ethnicity: ArrayLike | None = None,
+        weight: ArrayLike | None = None,
+    ) -> EgfrInputs:
+        gender = as_object_array(gender)
+        creatinine_units = as_object_array(creatinine_units)
+        if ethnicity is not None:
+            ethnicity = as_object_array(ethnicity)
+        return cls(
+            male=gender == MALE,
+            female=gender == FEMALE,
+            age_in_years=as_float_array(age_in_years),
+            creatinine_value=as_float_array(creatinine_value),
+            umol_l=creatinine_units == MICROMOLES_PER_LITER,
+            mg_dl=creatinine_units == MILLIGRAMS_PER_DECILITER,
+            black=None if ethnicity is None else ethnicity == BLACK,
+            has_ethnicity=None if ethnicity is None else is_truthy(ethnicity),
+            weight=None if weight is None else as_float_array(weight),
+            has_units=is_truthy(creatinine_units),
+        )
+
+    @property
+    def valid_gender(self) -> np.ndarray:
+        return self.male | self.female
+
+    @property
+    def valid_age(self) -> np.ndarray:
+        return (self.age_in_years >= 18) & (self.age_in_years < 120)
+
+    @property
+    def has_creatinine(self) -> np.ndarray:
+        value = self.creatinine_value
+        return (value != 0) & ~np.isnan(value) & (self.umol_l | self.mg_dl)
+
+    @property
+    def has_weight(self) -> np.ndarray:
+        return (self.weight != 0) & ~np.isnan(self.weight)
+
+    def scr(self, units_to: str) -> np.ndarray:
+        """Returns creatinine converted to `units_to`, rounded to 4
+        places as `edc_reportable.convert_units` does.
+
+        Values with units that cannot be converted are NaN.
+        """
+        values = np.where(self.creatinine_value == 0, np.nan, self.creatinine_value)
+        converted = np.full(values.shape, np.nan)
+        if units_to == MILLIGRAMS_PER_DECILITER:
+            converted[self.mg_dl] = values[self.mg_dl]
+            converted[self.umol_l] = values[self.umol_l] / CREATININE_UMOL_L_PER_MG_DL
+        elif units_to == MICROMOLES_PER_LITER:
+            converted[self.umol_l] = values[self.umol_l]
+            converted[self.mg_dl] = values[self.mg_dl] * CREATININE_UMOL_L_PER_MG_DL
+        return round_half_away_from_zero(converted, 4)
+
+
+def round_half_away_from_zero(values: ArrayLike, places: int) -> np.ndarray:
+    """Vectorized `edc_utils.round_up.round_half_away_from_zero`."""
+    values = as_float_array(values)
+    multiplier = 10**places
+    return np.copysign(np.floor(np.abs(values) * multiplier + 0.5) / multiplier, values)
+
+
+def age_in_years(dob: ArrayLike, report_datetime: ArrayLike) -> np.ndarray:
+    """Returns age in completed years for arrays of dates of birth
+    and UTC report datetimes, as `edc_utils.age(...).years`.
+
+    Note: as with `relativedelta`, a 29 February birthday falls on
+    28 February in a non-leap year.
+    """
+    dob = np.asarray(dob, dtype="datetime64[D]")
+    report_date = np.asarray(report_datetime, dtype="datetime64[D]")
+
+    def ymd(d):
+        year = d.astype("datetime64[Y]").astype(np.int64) + 1970
+        month = d.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        day = (d - d.astype("datetime64[M]")).astype(np.int64) + 1
+        return year, month, day
+
+    dob_year, dob_month, dob_day = ymd(dob)
+    year, month, day = ymd(report_date)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    dob_day = np.where((dob_month == 2) & (dob_day == 29) & ~leap, 28, dob_day)
+    before_birthday = (month < dob_month) | ((month == dob_month) & (day < dob_day))
+    years = (year - dob_year - before_birthday).astype(np.float64)
+    years[np.isnat(dob) | np.isnat(report_date)] = np.nan
+    return years
+
+
+def power(base: ArrayLike, exponent: ArrayLike) -> np.ndarray:
+    """Returns base ** exponent, evaluated with Python's `**` once
+    per distinct pair.
+
+    numpy's `power` may differ from `**` in the last place, so it is
+    not used, to match the scalar calculators exactly.
+    """
+    base, exponent = np.broadcast_arrays(as_float_array(base), as_float_array(exponent))
+    pairs, inverse = np.unique(
+        np.stack([base.ravel(), exponent.ravel()], axis=1), axis=0, return_inverse=True
+    )
+    values = np.array([b**e for b, e in pairs.tolist()], dtype=np.float64)
+    return values[inverse.reshape(-1)].reshape(base.shape)
+
+
+def age_factor(age_in_years: np.ndarray, base: float = 0.993) -> np.ndarray:
+    """Returns base ** age, evaluated once per distinct age."""
+    return power(base, age_in_years)
+
+
+def ckd_epi(inputs: EgfrInputs) -> np.ndarray:
+    """Vectorized `EgfrCkdEpi.value`."""
+    scr = inputs.scr(MILLIGRAMS_PER_DECILITER)
+    valid = inputs.valid_gender & inputs.valid_age & inputs.has_ethnicity & (scr > 0)
+    value = np.full(scr.shape, np.nan)
+    female = inputs.female[valid]
+    kappa = np.where(female, 0.7, 0.9)
+    alpha = np.where(female, -0.329, -0.411)
+    ratio = scr[valid] / kappa
+    value[valid] = (
+        141.000
+        * power(np.minimum(ratio, 1.000), alpha)
+        * power(np.maximum(ratio, 1.000), -1.209)
+        * age_factor(inputs.age_in_years[valid])
+        * np.where(female, 1.018, 1.000)
+        * np.where(inputs.black[valid], 1.159, 1.000)
+    )
+    return value
+
+
+def cockcroft_gault(inputs: EgfrInputs) -> np.ndarray:
+    """Vectorized `EgfrCockcroftGault.value`."""
+    scr = inputs.scr(MICROMOLES_PER_LITER)
+    valid = inputs.valid_gender & inputs.valid_age & inputs.has_weight & (scr > 0)
+    value = np.full(scr.shape, np.nan)
+    gender_factor = np.where(inputs.female[valid], 1.05, 1.23)
+    value[valid] = (
+        (140.00 - inputs.age_in_years[valid]) * inputs.weight[valid] * gender_factor
+    ) / scr[valid]
+    return value
+
+
+calculators = {"ckd-epi": ckd_epi, "cockcroft-gault": cockcroft_gault}
+
+
+def calculate(formula_name: str, inputs: EgfrInputs) -> np.ndarray:
+    """Returns eGFR values for `formula_name`, "ckd-epi" or
+    "cockcroft-gault".
+    """
+    try:
+        calculator = calculators[formula_name]
+    except KeyError:
+        raise ValueError(
+            f"Invalid formula_name. Expected one of {list(calculators)}. "
+            f"Got {formula_name}."
+        )
+    return calculator(inputs)
+
+
+def egfr(
+    formula_name: str,
+    gender: ArrayLike,
+    age_in_years: ArrayLike,
+    creatinine_value: ArrayLike,
+    creatinine_units: ArrayLike,
+    ethnicity: ArrayLike | None = None,
+    weight: ArrayLike | None = None,
+) -> np.ndarray:
+    """Returns eGFR values for columns of Python values."""
+    return calculate(
+        formula_name,
+        EgfrInputs.from_values(
+            gender=gender,
+            age_in_years=age_in_years,
+            creatinine_value=creatinine_value,
+            creatinine_units=creatinine_units,
+            ethnicity=ethnicity,
+            weight=weight,
+        ),
+    )
+
+
+def percent_drop(egfr_value: ArrayLike, baseline_egfr_value: ArrayLike) -> np.ndarray:
+    """Vectorized `Egfr.egfr_drop_value`, the percent drop from
+    baseline, never less than 0.
+
+    The drop is 0 where there is no baseline and NaN where the eGFR
+    value is NaN.
+    """
+    value = as_float_array(egfr_value)
+    baseline = np.broadcast_to(as_float_array(baseline_egfr_value), value.shape)
+    has_values = (value != 0) & (baseline != 0) & ~np.isnan(baseline)
+    drop = np.zeros(value.shape, dtype=np.float64)
+    drop[has_values] = 100 * (
+        (baseline[has_values] - value[has_values]) / baseline[has_values]
+    )
+    drop[drop < 0.0] = 0.0
+    drop[np.isnan(value)] = np.nan
+    return drop
+
+
+def grade(
+    grading_table: CompiledGradingTable,
+    values: ArrayLike,
+    male: np.ndarray,
+    female: np.ndarray,
+    age_in_years: ArrayLike,
+    units: str,
+) -> np.ndarray:
+    """Returns an int array of grades, `NOT_GRADED` where no grade
+    applies or the value is NaN.
+    """
+    values = as_float_array(values)
+    age = np.broadcast_to(as_float_array(age_in_years), values.shape)
+    grades = np.full(values.shape, NOT_GRADED, dtype=np.int8)
+    pending = ~np.isnan(values)
+    for ref in grading_table.references:
+        if ref.units != units:
+            continue
+        mask = pending & (
+            (male if MALE in ref.gender else False)
+            | (female if FEMALE in ref.gender else False)
+        )
+        mask &= _in_bounds(
+            age,
+            ref.age_lower,
+            ref.age_upper,
+            ref.age_lower_inclusive,
+            ref.age_upper_inclusive,
+        )
+        mask &= _in_bounds(
+            values, ref.lower, ref.upper, ref.lower_inclusive, ref.upper_inclusive
+        )
+        grades[mask] = ref.grade
+        pending &= ~mask
+    return grades
+
+
+def _in_bounds(values, lower, upper, lower_inclusive, upper_inclusive) -> np.ndarray:
+    mask = np.ones(values.shape, dtype=bool)
+    if lower is not None:
+        mask &= (lower <= values) if lower_inclusive else (lower < values)
+    if upper is not None:
+        mask &= (values <= upper) if upper_inclusive else (values < upper)
+    return mask
@@ -0,0 +1,295 @@
+"""Streaming eGFR distribution statistics by group, e.g. by site and
+visit.
+
+Moments are updated online (Welford) and merged pairwise (Chan et
+al.). Quantiles are estimated with a log-bucketed sketch (as in
+DDSketch) with a bounded relative error. Both merge exactly, so
+results from chunks or worker processes can be combined, and memory
+is bounded by the number of groups, not the number of rows.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Hashable, Iterable
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+    from numpy.typing import ArrayLike
+
+default_thresholds = (60.0, 30.0)
+
+
+@dataclass
+class RunningMoments:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: RunningMoments) -> RunningMoments:
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+
+    @property
+    def variance(self) -> float | None:
+        """Returns the sample variance or None if fewer than 2
+        values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def sd(self) -> float | None:
+        variance = self.variance
+        return None if variance is None else math.sqrt(variance)
+
+
+class QuantileSketch:
+    """A mergeable quantile sketch of non-negative values.
+
+    Values are counted in buckets whose bounds grow geometrically,
+    so a quantile is estimated to within `relative_accuracy` of the
+    true value. If the number of buckets would exceed `max_buckets`,
+    the lowest buckets are collapsed.
+    """
+
+    min_value = 1e-9
+
+    def __init__(self, relative_accuracy: float | None = None, max_buckets: int | None = None):
+        self.relative_accuracy = relative_accuracy or 0.01
+        self.max_buckets = max_buckets or 2048
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: dict[int, int] = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(relative_accuracy={self.relative_accuracy}, "
+            f"count={self.count})"
+        )
+
+    def key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= self.min_value:
+            self.zero_count += count
+        else:
+            self.buckets[self.key(value)] += count
+            self.collapse()
+        self.count += count
+
+    def add_counts(self, counts: dict[int, int], zero_count: int = 0) -> None:
+        """Adds bucket counts computed elsewhere, e.g. with numpy."""
+        for key, count in counts.items():
+            self.buckets[key] += count
+        self.zero_count += zero_count
+        self.count += sum(counts.values()) + zero_count
+        self.collapse()
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        if other.gamma != self.gamma:
+            raise ValueError(
+                "Cannot merge sketches with a different relative accuracy. "
+                f"Got {self.relative_accuracy} and {other.relative_accuracy}."
+            )
+        self.add_counts(other.buckets, other.zero_count)
+        return self
+
+    def collapse(self) -> None:
+        if len(self.buckets) > self.max_buckets:
+            keys = sorted(self.buckets)
+            excess = keys[: len(keys) - self.max_buckets + 1]
+            count = sum(self.buckets.pop(key) for key in excess)
+            self.buckets[excess[-1]] += count
+
+    def quantile(self, q: float) -> float | None:
+        """Returns the estimated value at quantile `q` (0 to 1) or
+        None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            cumulative += self.buckets[key]
+            if cumulative > rank:
+                return 2 * self.gamma**key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class EgfrDistribution:
+    """The distribution of eGFR values of one group."""
+
+    def __init__(
+        self,
+        thresholds: Iterable[float] | None = None,
+        relative_accuracy: float | None = None,
+    ):
+        self.thresholds = tuple(thresholds or default_thresholds)
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+        self.below = {threshold: 0 for threshold in self.thresholds}
+        self.missing = 0
+
+    def add(self, value: float | None) -> None:
+        if value is None or math.isnan(value := float(value)):
+            self.missing += 1
+            return
+        self.moments.add(value)
+        self.sketch.add(value)
+        for threshold in self.thresholds:
+            if value < threshold:
+                self.below[threshold] += 1
+
+    def add_array(self, values: ArrayLike) -> None:
+        """Adds a numpy array of values in one pass."""
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        self.missing += int(missing.sum())
+        values = values[~missing]
+        if not len(values):
+            return
+        self.moments.merge(
+            RunningMoments(
+                count=len(values),
+                mean=float(values.mean()),
+                m2=float(((values - values.mean()) ** 2).sum()),
+            )
+        )
+        zero = values <= self.sketch.min_value
+        keys, counts = np.unique(
+            np.ceil(np.log(values[~zero]) / self.sketch.log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        self.sketch.add_counts(dict(zip(keys.tolist(), counts.tolist())), int(zero.sum()))
+        for threshold in self.thresholds:
+            self.below[threshold] += int((values < threshold).sum())
+
+    def merge(self, other: EgfrDistribution) -> EgfrDistribution:
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        for threshold, count in other.below.items():
+            self.below[threshold] = self.below.get(threshold, 0) + count
+        self.missing += other.missing
+        return self
+
+    def as_dict(self) -> dict[str, Any]:
+        count = self.moments.count
+        data = dict(
+            n=count,
+            missing=self.missing,
+            mean=self.moments.mean if count else None,
+            sd=self.moments.sd,
+            q1=self.sketch.quantile(0.25),
+            median=self.sketch.quantile(0.5),
+            q3=self.sketch.quantile(0.75),
+        )
+        for threshold, below in self.below.items():
+            data[f"pct_below_{threshold:g}"] = 100 * below / count if count else None
+        return data
+
+
+@dataclass
+class EgfrCohortStatistics:
+    """eGFR distributions by group.
+
+    For example, by site and visit from a queryset:
+
+        stats = EgfrCohortStatistics()
+        stats.add_queryset(ResultCrf.objects.all())
+        rows = stats.as_rows()
+    """
+
+    thresholds: tuple[float, ...] = default_thresholds
+    relative_accuracy: float | None = None
+    groups: dict[Hashable, EgfrDistribution] = field(default_factory=dict)
+
+    def get_distribution(self, key: Hashable) -> EgfrDistribution:
+        try:
+            return self.groups[key]
+        except KeyError:
+            distribution = self.groups[key] = EgfrDistribution(
+                thresholds=self.thresholds, relative_accuracy=self.relative_accuracy
+            )
+            return distribution
+
+    def add(self, key: Hashable, value: float | None) -> None:
+        self.get_distribution(key).add(value)
+
+    def add_array(self, keys: ArrayLike, values: ArrayLike) -> None:
+        """Adds numpy arrays of group keys and values, e.g. batch
+        calculator output.
+
+        Keys are grouped as the original Python objects, not as a
+        numpy array, so tuple keys keep their types, e.g. ("site", 1)
+        merges with the same key from `add_queryset`, and a key may
+        be None.
+        """
+        import numpy as np
+
+        if isinstance(keys, np.ndarray):
+            keys = keys.tolist()
+        values = np.asarray(values, dtype=np.float64)
+        indexes: dict[Hashable, list[int]] = defaultdict(list)
+        for index, key in enumerate(keys):
+            indexes[tuple(key) if isinstance(key, list) else key].append(index)
+        for key, key_indexes in indexes.items():
+            self.get_distribution(key).add_array(values[key_indexes])
+
+    def add_queryset(
+        self,
+        queryset: QuerySet,
+        group_by: Iterable[str] | None = None,
+        field_name: str | None = None,
+        chunk_size: int | None = None,
+    ) -> None:
+        """Streams `field_name` (default "egfr_value") grouped by
+        `group_by` (default site id and visit code) from a queryset.
+        """
+        from .recompute.site_partitioned import get_site_lookup
+
+        group_by = list(
+            group_by or [get_site_lookup(queryset.model), "subject_visit__visit_code"]
+        )
+        field_name = field_name or "egfr_value"
+        for row in (
+            queryset.values_list(*group_by, field_name)
+            .order_by()
+            .iterator(chunk_size=chunk_size or 2000)
+        ):
+            self.add(row[:-1] if len(group_by) > 1 else row[0], row[-1])
+
+    def merge(self, other: EgfrCohortStatistics) -> EgfrCohortStatistics:
+        for key, distribution in other.groups.items():
+            self.get_distribution(key).merge(distribution)
+        return self
+
+    def as_rows(self) -> list[dict[str, Any]]:
+        """Returns a row per group, sorted by group key."""
+        return [
+            dict(group=key, **self.groups[key].as_dict())
+            for key in sorted(self.groups, key=str)
+        ]
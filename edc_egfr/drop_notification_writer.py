@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from decimal import Decimal
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from edc_utils import get_utcnow
+
+from .notification_executor import get_egfr_notification_executor
+from .outbox import EGFR_DROP_NOTIFICATION, write_egfr_outbox_event
+
+if TYPE_CHECKING:
+    from .model_mixins import EgfrDropNotificationModelMixin
+    from .notification_executor import NotificationExecutor
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_coalesce_transaction() -> bool:
+    """Returns True if writes within a transaction are deferred
+    to a single write on commit.
+
+    Set `EDC_EGFR_DROP_NOTIFICATION_COALESCE_TRANSACTION`, default False.
+    """
+    return getattr(settings, "EDC_EGFR_DROP_NOTIFICATION_COALESCE_TRANSACTION", False)
+
+
+def _get_pending(using: str) -> dict[tuple, list[weakref.ref]]:
+    try:
+        pending = _local.pending
+    except AttributeError:
+        pending = _local.pending = {}
+    return pending.setdefault(using, {})
+
+
+class _DeferredWrite:
+    """A write deferred to the end of the transaction, registered
+    as its own on_commit callback.
+
+    `_get_pending` only holds weak references to deferred writes.
+    If the savepoint or transaction of a write rolls back, Django
+    discards its callback and the write is dropped with it. The
+    first callback of a visit to run writes the last values not
+    rolled back.
+    """
+
+    def __init__(self, writer, key: tuple, related_visit_id, values, create_values):
+        self.writer = writer
+        self.key = key
+        self.related_visit_id = related_visit_id
+        self.values = values
+        self.create_values = create_values
+
+    def __call__(self) -> None:
+        refs = _get_pending(self.writer.using).pop(self.key, [])
+        deferred_writes = [ref() for ref in refs if ref() is not None]
+        if deferred_writes:
+            last = deferred_writes[-1]
+            self.writer.write_after_commit(
+                last.related_visit_id, last.values, last.create_values
+            )
+
+
+class EgfrDropNotificationWriter:
+    """Creates or updates the eGFR drop notification for a visit.
+
+    An update is skipped if none of the values changed. A changed
+    value is always written with `save()`, so `modified` is bumped
+    and history is created. If `coalesce_transaction` is set, writes
+    for the same visit within a transaction are deferred and saved
+    once, with the last values, on commit.
+
+    If an `executor` is set, see `get_egfr_notification_executor`,
+    the write is handed to the executor after commit instead of
+    being written by the saving thread. A write that fails in the
+    executor is kept as an `EgfrDropNotificationFailure`.
+    """
+
+    def __init__(
+        self,
+        model_cls: type[EgfrDropNotificationModelMixin],
+        coalesce_transaction: bool | None = None,
+        using: str | None = None,
+        executor: NotificationExecutor | None = None,
+    ):
+        self.model_cls = model_cls
+        self.coalesce_transaction = (
+            get_coalesce_transaction()
+            if coalesce_transaction is None
+            else coalesce_transaction
+        )
+        self.using = using or DEFAULT_DB_ALIAS
+        self.executor = executor or get_egfr_notification_executor()
+
+    def write(
+        self, related_visit_id: Any, values: dict, create_values: dict
+    ) -> EgfrDropNotificationModelMixin | None:
+        """Returns the notification instance or, if the write is
+        deferred to the end of the transaction or handed to the
+        executor, None.
+
+        `values` are compared and updated, `create_values` are only
+        used if the notification does not exist.
+        """
+        if (
+            self.coalesce_transaction
+            and transaction.get_connection(self.using).in_atomic_block
+        ):
+            key = (self.model_cls._meta.label_lower, related_visit_id)
+            deferred_write = _DeferredWrite(self, key, related_visit_id, values, create_values)
+            pending = _get_pending(self.using)
+            # drop visits whose writes were all rolled back
+            for k, refs in list(pending.items()):
+                if all(ref() is None for ref in refs):
+                    del pending[k]
+            pending.setdefault(key, []).append(weakref.ref(deferred_write))
+            transaction.on_commit(deferred_write, using=self.using)
+            return None
+        if self.executor:
+            transaction.on_commit(
+                partial(self.write_after_commit, related_visit_id, values, create_values),
+                using=self.using,
+            )
+            return None
+        return self.write_now(related_visit_id, values, create_values)
+
+    def write_after_commit(
+        self, related_visit_id: Any, values: dict, create_values: dict
+    ) -> EgfrDropNotificationModelMixin | None:
+        """Hands the write to the executor, if any, or writes now."""
+        if self.executor:
+            self.executor.submit(
+                (self.using, self.model_cls._meta.label_lower, related_visit_id),
+                partial(
+                    self.write_now,
+                    related_visit_id,
+                    values,
+                    create_values,
+                    clear_failures=True,
+                ),
+                on_failure=partial(
+                    self.write_failure, related_visit_id, values, create_values
+                ),
+            )
+            return None
+        return self.write_now(related_visit_id, values, create_values)
+
+    def write_now(
+        self,
+        related_visit_id: Any,
+        values: dict,
+        create_values: dict,
+        clear_failures: bool | None = None,
+    ) -> EgfrDropNotificationModelMixin:
+        """Writes the notification and, if `clear_failures`, removes
+        the failed writes of the visit it supersedes.
+        """
+        manager = self.model_cls.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            if clear_failures:
+                self.get_failures(related_visit_id).delete()
+            try:
+                obj = manager.get(subject_visit__id=related_visit_id)
+            except ObjectDoesNotExist:
+                obj = manager.create(
+                    subject_visit_id=related_visit_id, **create_values, **values
+                )
+            else:
+                changed = self.get_changed(obj, values)
+                if not changed:
+                    return obj
+                for attr, value in changed.items():
+                    setattr(obj, attr, value)
+                obj.modified = get_utcnow()
+                obj.save()
+            write_egfr_outbox_event(EGFR_DROP_NOTIFICATION, obj, using=self.using)
+        obj.refresh_from_db()
+        return obj
+
+    def write_failure(
+        self, related_visit_id: Any, values: dict, create_values: dict, exception: Exception
+    ) -> None:
+        """Keeps a write that failed in the executor, replacing any
+        earlier failure of the visit.
+        """
+        from .models import EgfrDropNotificationFailure
+
+        with transaction.atomic(using=self.using):
+            self.get_failures(related_visit_id).delete()
+            EgfrDropNotificationFailure.objects.using(self.using).create(
+                model=self.model_cls._meta.label_lower,
+                related_visit_id=str(related_visit_id),
+                values=values,
+                create_values=create_values,
+                error=f"{exception.__class__.__name__}: {exception}",
+            )
+
+    def get_failures(self, related_visit_id: Any) -> models.QuerySet:
+        from .models import EgfrDropNotificationFailure
+
+        return EgfrDropNotificationFailure.objects.using(self.using).filter(
+            model=self.model_cls._meta.label_lower, related_visit_id=str(related_visit_id)
+        )
+
+    def get_changed(self, obj: EgfrDropNotificationModelMixin, values: dict) -> dict:
+        """Returns the values that differ from those stored, compared
+        at the precision of each field.
+        """
+        changed = {}
+        for attr, value in values.items():
+            field = obj._meta.get_field(attr)
+            if self.to_stored(field, value) != self.to_stored(field, getattr(obj, attr)):
+                changed.update({attr: value})
+        return changed
+
+    @staticmethod
+    def to_stored(field: models.Field, value: Any) -> Any:
+        if value is None:
+            return None
+        value = field.to_python(value)
+        if isinstance(field, models.DecimalField):
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+        return value
+
+
+def flush_egfr_drop_notifications(using: str | None = None) -> int:
+    """Writes the deferred notifications of this thread not rolled
+    back and returns the number written.
+    """
+    pending = _get_pending(using or DEFAULT_DB_ALIAS)
+    count = 0
+    for refs in list(pending.values()):
+        deferred_writes = [ref() for ref in refs if ref() is not None]
+        if deferred_writes:
+            deferred_writes[-1]()
+            count += 1
+    pending.clear()
+    return count
+
+
+def retry_egfr_drop_notifications(using: str | None = None) -> int:
+    """Writes the drop notifications that failed in the executor, in
+    the calling thread, and returns the number written.
+
+    A failure is removed once written. A write that fails again is
+    logged and kept.
+    """
+    from .models import EgfrDropNotificationFailure
+
+    count = 0
+    for failure in EgfrDropNotificationFailure.objects.using(using).order_by("id"):
+        writer = EgfrDropNotificationWriter(django_apps.get_model(failure.model), using=using)
+        try:
+            writer.write_now(
+                failure.related_visit_id,
+                failure.values,
+                failure.create_values,
+                clear_failures=True,
+            )
+        except Exception:
+            logger.exception(
+                "eGFR drop notification failed again. "
+                f"Got model={failure.model}, related_visit_id={failure.related_visit_id}."
+            )
+        else:
+            count += 1
+    return count
@@ -6,14 +6,13 @@ from typing import TYPE_CHECKING, Any, Optional
 from zoneinfo import ZoneInfo
 
 from dateutil.relativedelta import relativedelta
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
 from edc_constants.constants import NEW
 from edc_reportable import site_reportables
 from edc_reportable.units import EGFR_UNITS, PERCENT
-from edc_utils import age, get_utcnow
+from edc_utils import age
 
 from .calculators import EgfrCkdEpi, EgfrCockcroftGault, egfr_percent_change
+from .drop_notification_writer import EgfrDropNotificationWriter
 from .get_drop_notification_model import get_egfr_drop_notification_model_cls
 
 if TYPE_CHECKING:
@@ -26,6 +25,7 @@ class EgfrError(Exception):
 
 class Egfr:
     calculators: dict = {"ckd-epi": EgfrCkdEpi, "cockcroft-gault": EgfrCockcroftGault}
+    egfr_drop_notification_writer_cls = EgfrDropNotificationWriter
 
     def __init__(
         self,
@@ -190,35 +190,34 @@ class Egfr:
         return self.weight_in_kgs
 
     def create_or_update_egfr_drop_notification(self):
-        """Creates or updates the `eGFR notification model`"""
-        with transaction.atomic():
-            try:
-                obj = self.egfr_drop_notification_model_cls.objects.get(
-                    subject_visit__id=self.related_visit.id
-                )
-            except ObjectDoesNotExist:
-                obj = self.egfr_drop_notification_model_cls.objects.create(
-                    subject_visit_id=self.related_visit.id,
-                    report_datetime=self.report_datetime,
-                    egfr_value=self.egfr_value,
-                    creatinine_date=self.assay_date,
-                    creatinine_value=self.creatinine_value,
-                    creatinine_units=self.creatinine_units,
-                    weight=self.get_weight_in_kgs(),
-                    egfr_percent_change=self.egfr_drop_value,
-                    report_status=NEW,
-                    site_id=self.related_visit.site.id,
-                )
-            else:
-                obj.egfr_value = self.egfr_value
-                obj.creatinine_value = self.creatinine_value
-                obj.weight = self.get_weight_in_kgs()
-                obj.egfr_percent_change = self.egfr_drop_value
-                obj.creatinine_date = self.assay_date
-                obj.modified = get_utcnow()
-                obj.save()
-        obj.refresh_from_db()
-        return obj
+        """Creates or updates the `eGFR notification model`.
+
+        Returns None if the write is deferred to the end of the
+        transaction, see `EgfrDropNotificationWriter`.
+        """
+        writer = self.egfr_drop_notification_writer_cls(self.egfr_drop_notification_model_cls)
+        return writer.write(
+            self.related_visit.id,
+            values=self.get_egfr_drop_notification_values(),
+            create_values=dict(
+                report_datetime=self.report_datetime,
+                creatinine_units=self.creatinine_units,
+                report_status=NEW,
+                site_id=self.related_visit.site.id,
+            ),
+        )
+
+    def get_egfr_drop_notification_values(self) -> dict:
+        """Returns the values to create or update the `eGFR
+        notification model` with.
+        """
+        return dict(
+            egfr_value=self.egfr_value,
+            creatinine_value=self.creatinine_value,
+            weight=self.get_weight_in_kgs(),
+            egfr_percent_change=self.egfr_drop_value,
+            creatinine_date=self.assay_date,
+        )
 
     @property
     def egfr_drop_notification_model_cls(self):
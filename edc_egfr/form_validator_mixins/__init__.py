@@ -1,4 +1,6 @@
 from .egfr_form_validator_mixins import (
+    BaseEgfrFormValidatorMixin,
+    EgfrBulkValidation,
     EgfrCkdEpiFormValidatorMixin,
     EgfrCockcroftGaultFormValidatorMixin,
 )
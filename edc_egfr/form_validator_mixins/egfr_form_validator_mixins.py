@@ -1,54 +1,110 @@
-from typing import Any
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Iterable
 
 from django import forms
 from edc_reportable import CalculatorError, ConversionNotHandled
 
-from ..calculators import EgfrCkdEpi, EgfrCockcroftGault
+from ..calculators import EgfrCalculatorError, EgfrCkdEpi, EgfrCockcroftGault
+
+
+@dataclass
+class EgfrBulkValidation:
+    # eGFR value per row, None if not enough data or an error
+    values: list[float | None] = field(default_factory=list)
+    # {row index: ValidationError}
+    errors: dict[int, forms.ValidationError] = field(default_factory=dict)
 
 
-class EgfrCkdEpiFormValidatorMixin:
+class BaseEgfrFormValidatorMixin:
+    calculator_cls = None
+    formula_name: str = None
+    required_fields: tuple[str, ...] = ()
+
     def validate_egfr(self: Any):
-        if (
-            self.cleaned_data.get("gender")
-            and self.cleaned_data.get("age_in_years")
-            and self.cleaned_data.get("ethnicity")
-            and self.cleaned_data.get("creatinine_value")
-            and self.cleaned_data.get("creatinine_units")
-        ):
-            opts = dict(
-                gender=self.cleaned_data.get("gender"),
-                age_in_years=self.cleaned_data.get("age_in_years"),
-                ethnicity=self.cleaned_data.get("ethnicity"),
-                creatinine_value=self.cleaned_data.get("creatinine_value"),
-                creatinine_units=self.cleaned_data.get("creatinine_units"),
-            )
+        return self.get_egfr(self.cleaned_data)
+
+    @classmethod
+    def get_egfr(cls, cleaned_data: dict) -> float | None:
+        """Returns the eGFR value, None if not enough data, or
+        raises a ValidationError.
+        """
+        if all(cleaned_data.get(name) for name in cls.required_fields):
+            opts = {name: cleaned_data.get(name) for name in cls.required_fields}
             try:
-                egfr = EgfrCkdEpi(**opts).value
+                egfr = cls.calculator_cls(**opts).value
             except (CalculatorError, ConversionNotHandled) as e:
                 raise forms.ValidationError(e)
             return egfr
         return None
 
+    @classmethod
+    def validate_egfr_many(cls, cleaned_data_list: Iterable[dict]) -> EgfrBulkValidation:
+        """Returns eGFR values and ValidationErrors, by row index,
+        for many `cleaned_data`, e.g. of a formset.
 
-class EgfrCockcroftGaultFormValidatorMixin:
-    def validate_egfr(self: Any):
-        if (
-            self.cleaned_data.get("gender")
-            and self.cleaned_data.get("age_in_years")
-            and self.cleaned_data.get("weight")
-            and self.cleaned_data.get("creatinine_value")
-            and self.cleaned_data.get("creatinine_units")
-        ):
-            opts = dict(
-                gender=self.cleaned_data.get("gender"),
-                age_in_years=self.cleaned_data.get("age_in_years"),
-                weight=self.cleaned_data.get("weight"),
-                creatinine_value=self.cleaned_data.get("creatinine_value"),
-                creatinine_units=self.cleaned_data.get("creatinine_units"),
+        Rows with enough data are calculated together with the
+        batch kernels (requires numpy). Rows the kernels flag as an
+        error are passed to `get_egfr` so that values and messages
+        are the same as for `validate_egfr`. An `EgfrCalculatorError`,
+        e.g. for an invalid gender or age, which `validate_egfr`
+        raises as is, is returned as a ValidationError for its row.
+        """
+        from ..calculators import batch, vectorized
+
+        cleaned_data_list = list(cleaned_data_list)
+        result = EgfrBulkValidation(values=[None] * len(cleaned_data_list))
+        indexes = [
+            index
+            for index, cleaned_data in enumerate(cleaned_data_list)
+            if all(cleaned_data.get(name) for name in cls.required_fields)
+        ]
+        if indexes:
+            batch_result = batch.evaluate_batch(
+                cls.formula_name,
+                vectorized.EgfrInputs.from_values(
+                    **{
+                        name: [cleaned_data_list[index].get(name) for index in indexes]
+                        for name in ["gender", "age_in_years", "creatinine_value"]
+                        + ["creatinine_units", "ethnicity", "weight"]
+                    }
+                ),
             )
-            try:
-                egfr = EgfrCockcroftGault(**opts).value
-            except (CalculatorError, ConversionNotHandled) as e:
-                raise forms.ValidationError(e)
-            return egfr
-        return None
+            for index, value, code in zip(
+                indexes, batch_result.values.tolist(), batch_result.error_codes.tolist()
+            ):
+                if code == batch.OK:
+                    result.values[index] = value
+                    continue
+                try:
+                    result.values[index] = cls.get_egfr(cleaned_data_list[index])
+                except forms.ValidationError as e:
+                    result.errors[index] = e
+                except EgfrCalculatorError as e:
+                    result.errors[index] = forms.ValidationError(str(e))
+        return result
+
+
+class EgfrCkdEpiFormValidatorMixin(BaseEgfrFormValidatorMixin):
+    calculator_cls = EgfrCkdEpi
+    formula_name = "ckd-epi"
+    required_fields = (
+        "gender",
+        "age_in_years",
+        "ethnicity",
+        "creatinine_value",
+        "creatinine_units",
+    )
+
+
+class EgfrCockcroftGaultFormValidatorMixin(BaseEgfrFormValidatorMixin):
+    calculator_cls = EgfrCockcroftGault
+    formula_name = "cockcroft-gault"
+    required_fields = (
+        "gender",
+        "age_in_years",
+        "weight",
+        "creatinine_value",
+        "creatinine_units",
+    )
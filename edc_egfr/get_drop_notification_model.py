@@ -1,10 +1,19 @@
 from django.apps import apps as django_apps
 from django.conf import settings
 
+# {model label: model class}
+_model_classes: dict = {}
+
 
 def get_egfr_drop_notification_model():
     return getattr(settings, "EDC_EGFR_DROP_NOTIFICATION_MODEL")
 
 
 def get_egfr_drop_notification_model_cls():
-    return django_apps.get_model(get_egfr_drop_notification_model())
+    """Returns the model class, resolved once per model label."""
+    model = get_egfr_drop_notification_model()
+    try:
+        return _model_classes[model]
+    except KeyError:
+        model_cls = _model_classes[model] = django_apps.get_model(model)
+        return model_cls
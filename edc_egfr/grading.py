@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from edc_reportable import BoundariesOverlap, NotEvaluated, site_reportables
+
+if TYPE_CHECKING:
+    from edc_reportable import ValueReferenceGroup
+
+
+class CompiledGradingError(Exception):
+    pass
+
+
+def get_grading_cache_dir() -> str | None:
+    """Returns the folder of the grading cache files.
+
+    Set `EDC_EGFR_GRADING_CACHE_DIR`, default None (off).
+    """
+    return getattr(settings, "EDC_EGFR_GRADING_CACHE_DIR", None)
+
+
+@dataclass(frozen=True)
+class CompiledGradeReference:
+    """A flattened `GradeReference` with plain bounds for fast
+    evaluation.
+    """
+
+    grade: int
+    gender: str
+    units: str
+    lower: float | None
+    upper: float | None
+    lower_inclusive: bool
+    upper_inclusive: bool
+    age_lower: float | None
+    age_upper: float | None
+    age_lower_inclusive: bool
+    age_upper_inclusive: bool
+
+    @classmethod
+    def from_grade_reference(cls, grade_reference) -> CompiledGradeReference:
+        evaluator = grade_reference.evaluator
+        age_evaluator = grade_reference.age_evaluator
+        if age_evaluator.units != "years":
+            raise CompiledGradingError(
+                f"Unable to compile grade reference. Expected age units in years. "
+                f"Got {repr(grade_reference)}"
+            )
+        return cls(
+            grade=int(grade_reference.grade),
+            gender=grade_reference.gender,
+            units=grade_reference.units,
+            lower=evaluator.lower,
+            upper=evaluator.upper,
+            lower_inclusive=evaluator.lower_inclusive is True,
+            upper_inclusive=evaluator.upper_inclusive is True,
+            age_lower=age_evaluator.lower,
+            age_upper=age_evaluator.upper,
+            age_lower_inclusive=age_evaluator.lower_inclusive is True,
+            age_upper_inclusive=age_evaluator.upper_inclusive is True,
+        )
+
+    def age_match(self, age_in_years: int | float) -> bool:
+        return self._in_bounds(
+            age_in_years,
+            self.age_lower,
+            self.age_upper,
+            self.age_lower_inclusive,
+            self.age_upper_inclusive,
+        )
+
+    def in_bounds(self, value: int | float) -> bool:
+        return self._in_bounds(
+            value, self.lower, self.upper, self.lower_inclusive, self.upper_inclusive
+        )
+
+    @staticmethod
+    def _in_bounds(value, lower, upper, lower_inclusive, upper_inclusive) -> bool:
+        value = float(value)
+        if lower is not None and not (lower <= value if lower_inclusive else lower < value):
+            return False
+        if upper is not None and not (value <= upper if upper_inclusive else value < upper):
+            return False
+        return True
+
+
+class CompiledGradingTable:
+    """The grade references of one `ValueReferenceGroup`, e.g.
+    "egfr", flattened and sorted by grade, highest first, as
+    `ValueReferenceGroup.get_grade` evaluates them.
+
+    Where `ValueReferenceGroup.get_grade` raises on overlapping
+    boundaries or if no reference applies, this returns the highest
+    matching grade or None, unless `strict`.
+    """
+
+    def __init__(self, name: str, references: list[CompiledGradeReference]):
+        self.name = name
+        self.references = sorted(references, key=lambda x: x.grade, reverse=True)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name})"
+
+    @classmethod
+    def from_reference_group(cls, reference_group: ValueReferenceGroup):
+        return cls(
+            name=reference_group.name,
+            references=[
+                CompiledGradeReference.from_grade_reference(grade_reference)
+                for grade_references in reference_group.grading.values()
+                for grade_reference in grade_references
+            ],
+        )
+
+    @classmethod
+    def from_collection(cls, reference_range_collection_name: str, utest_id: str):
+        """Returns a compiled table for `utest_id`, e.g. "egfr" or
+        "egfr_drop", from a collection registered with
+        `site_reportables`.
+        """
+        reference_range_collection = site_reportables.get(reference_range_collection_name)
+        if not reference_range_collection:
+            raise CompiledGradingError(
+                "Reference range collection not registered. "
+                f"Got {reference_range_collection_name}."
+            )
+        reference_group = reference_range_collection.get(utest_id)
+        if not reference_group:
+            raise CompiledGradingError(
+                f"Reference group not found. Got {utest_id} "
+                f"in {reference_range_collection_name}."
+            )
+        return cls.from_reference_group(reference_group)
+
+    def get_references(
+        self, gender: str, age_in_years: int | float, units: str
+    ) -> list[CompiledGradeReference]:
+        return [
+            ref
+            for ref in self.references
+            if gender in ref.gender and ref.units == units and ref.age_match(age_in_years)
+        ]
+
+    def get_grade(
+        self,
+        value: int | float,
+        gender: str,
+        age_in_years: int | float,
+        units: str,
+        strict: bool | None = None,
+    ) -> int | None:
+        """Returns the grade or None.
+
+        If `strict`, raises `NotEvaluated` or `BoundariesOverlap`
+        as `ValueReferenceGroup.get_grade` would.
+        """
+        references = self.get_references(gender, age_in_years, units)
+        if strict and not references:
+            raise NotEvaluated(
+                f"{self.name} value not graded. No reference range found for "
+                f"gender={gender}, age_in_years={age_in_years}, units={units}. "
+                f"See {repr(self)}."
+            )
+        grades = [ref.grade for ref in references if ref.in_bounds(value)]
+        if strict and len(grades) > 1:
+            raise BoundariesOverlap(
+                f"{self.name} value {value} matches more than one grade. "
+                f"Got grades {grades}. Check your definitions."
+            )
+        return grades[0] if grades else None
+
+
+# {(reference_range_collection_name, utest_id): (reference group, compiled table)}
+_compiled_tables: dict[tuple[str, str], tuple[ValueReferenceGroup, CompiledGradingTable]] = {}
+
+# {(reference_range_collection_name, utest_id): compiled table}, see `load_grading_cache`
+_loaded_tables: dict[tuple[str, str], CompiledGradingTable] = {}
+
+
+def get_compiled_grading_table(
+    reference_range_collection_name: str, utest_id: str
+) -> CompiledGradingTable:
+    """Returns the compiled table for `utest_id` of a registered
+    collection, compiled once and cached until the reference group
+    is registered again.
+
+    If the collection is not registered in this process, the table
+    loaded from a grading cache file, if any, is returned instead.
+    """
+    reference_range_collection = site_reportables.get(reference_range_collection_name)
+    reference_group = reference_range_collection and reference_range_collection.get(utest_id)
+    key = (reference_range_collection_name, utest_id)
+    if not reference_range_collection and key in _loaded_tables:
+        return _loaded_tables[key]
+    cached = _compiled_tables.get(key)
+    if not cached or not reference_group or cached[0] is not reference_group:
+        table = CompiledGradingTable.from_collection(reference_range_collection_name, utest_id)
+        cached = _compiled_tables[key] = (reference_group, table)
+    return cached[1]
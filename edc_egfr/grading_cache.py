@@ -0,0 +1,189 @@
+"""A versioned cache file of the compiled "egfr" and "egfr_drop"
+grading tables of a reference range collection.
+
+`write_grading_cache` compiles the tables from `site_reportables`
+and saves them as a NumPy `.npy` file named by the collection, the
+cache version and a hash of the compiled references. If the file
+for the hash exists it is used as is. If the references change, the
+hash changes, a new file is written and the old one is removed.
+
+`load_grading_cache` reads the file, checks its hash and makes the
+tables available to `get_compiled_grading_table` in a process where
+the collection is not registered, e.g. a process-pool child:
+
+    path = write_grading_cache("my_reference_list")
+    with ProcessPoolExecutor(initializer=load_grading_cache, initargs=(path,)) as pool:
+        ...
+
+Requires `numpy`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from .grading import (
+    CompiledGradeReference,
+    CompiledGradingTable,
+    _loaded_tables,
+    get_grading_cache_dir,
+)
+
+GRADING_CACHE_VERSION = 1
+
+utest_ids = ["egfr", "egfr_drop"]
+
+grading_cache_dtype = np.dtype(
+    [
+        ("utest_id", "U16"),
+        ("grade", "i1"),
+        ("gender", "U16"),
+        ("units", "U32"),
+        ("lower", "f8"),
+        ("upper", "f8"),
+        ("lower_inclusive", "?"),
+        ("upper_inclusive", "?"),
+        ("age_lower", "f8"),
+        ("age_upper", "f8"),
+        ("age_lower_inclusive", "?"),
+        ("age_upper_inclusive", "?"),
+    ]
+)
+
+file_prefix = "egfr-grading"
+file_pattern = re.compile(
+    rf"^{file_prefix}-(?P<name>.+)-v(?P<version>\d+)-(?P<digest>[0-9a-f]{{16}})\.npy$"
+)
+
+# {path: tables} of the files loaded by this process
+_loaded_files: dict[str, dict[str, CompiledGradingTable]] = {}
+
+
+class GradingCacheError(Exception):
+    pass
+
+
+def to_records(tables: dict[str, CompiledGradingTable]) -> np.ndarray:
+    """Returns the references of the tables as a structured array,
+    `None` bounds as NaN.
+    """
+    rows = []
+    for utest_id, table in tables.items():
+        for ref in table.references:
+            rows.append(
+                (
+                    utest_id,
+                    ref.grade,
+                    ref.gender,
+                    ref.units,
+                    np.nan if ref.lower is None else ref.lower,
+                    np.nan if ref.upper is None else ref.upper,
+                    ref.lower_inclusive,
+                    ref.upper_inclusive,
+                    np.nan if ref.age_lower is None else ref.age_lower,
+                    np.nan if ref.age_upper is None else ref.age_upper,
+                    ref.age_lower_inclusive,
+                    ref.age_upper_inclusive,
+                )
+            )
+    return np.array(rows, dtype=grading_cache_dtype)
+
+
+def from_records(records: np.ndarray) -> dict[str, CompiledGradingTable]:
+    """Returns the tables, by utest_id, of a structured array
+    written by `to_records`.
+    """
+    references = {}
+    for record in records.tolist():
+        values = {
+            name: None if isinstance(value, float) and np.isnan(value) else value
+            for name, value in zip(records.dtype.names, record)
+        }
+        utest_id = values.pop("utest_id")
+        references.setdefault(utest_id, []).append(CompiledGradeReference(**values))
+    return {
+        utest_id: CompiledGradingTable(name=utest_id, references=refs)
+        for utest_id, refs in references.items()
+    }
+
+
+def get_grading_digest(records: np.ndarray) -> str:
+    """Returns the hash of the compiled references and the cache
+    version.
+    """
+    digest = hashlib.sha256(f"{GRADING_CACHE_VERSION}:{records.dtype.descr}".encode())
+    digest.update(np.ascontiguousarray(records).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def write_grading_cache(
+    reference_range_collection_name: str, cache_dir: str | Path | None = None
+) -> Path:
+    """Returns the path of the cache file of a registered collection,
+    written if there is no file for the current references.
+
+    `cache_dir` defaults to `EDC_EGFR_GRADING_CACHE_DIR`.
+    """
+    cache_dir = cache_dir or get_grading_cache_dir()
+    if not cache_dir:
+        raise GradingCacheError(
+            "Grading cache folder not set. See settings.EDC_EGFR_GRADING_CACHE_DIR."
+        )
+    cache_dir = Path(cache_dir)
+    records = to_records(
+        {
+            utest_id: CompiledGradingTable.from_collection(
+                reference_range_collection_name, utest_id
+            )
+            for utest_id in utest_ids
+        }
+    )
+    digest = get_grading_digest(records)
+    name = f"{file_prefix}-{reference_range_collection_name}-v{GRADING_CACHE_VERSION}"
+    path = cache_dir / f"{name}-{digest}.npy"
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            np.save(f, records, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    for stale_path in cache_dir.glob(f"{name}-*.npy"):
+        if stale_path != path:
+            stale_path.unlink(missing_ok=True)
+    return path
+
+
+def load_grading_cache(path: str | Path) -> dict[str, CompiledGradingTable]:
+    """Returns the tables, by utest_id, of a cache file and makes
+    them available to `get_compiled_grading_table` in this process.
+
+    The file is small and read in full. Each path is loaded once
+    per process.
+    """
+    path = Path(path)
+    if str(path) in _loaded_files:
+        return _loaded_files[str(path)]
+    match = file_pattern.match(path.name)
+    if not match:
+        raise GradingCacheError(f"Invalid grading cache file name. Got {path.name}.")
+    if int(match.group("version")) != GRADING_CACHE_VERSION:
+        raise GradingCacheError(
+            f"Grading cache version mismatch. Expected v{GRADING_CACHE_VERSION}. "
+            f"Got {path.name}."
+        )
+    records = np.load(path, allow_pickle=False)
+    digest = records.dtype == grading_cache_dtype and get_grading_digest(records)
+    if digest != match.group("digest"):
+        raise GradingCacheError(f"Grading cache file is corrupt or stale. Got {path}.")
+    tables = from_records(records)
+    for utest_id, table in tables.items():
+        _loaded_tables[(match.group("name"), utest_id)] = table
+    _loaded_files[str(path)] = tables
+    return tables
@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import color_style
+
+from edc_egfr.safety_listing import EgfrSafetyListing, default_listing_state_path
+
+style = color_style()
+
+
+class Command(BaseCommand):
+    help = "Update the eGFR safety listing from rows changed since the last run and write it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            dest="output_path",
+            default=None,
+            help="CSV file for the listing. Default: stdout",
+        )
+        parser.add_argument(
+            "--state",
+            dest="state_path",
+            default=None,
+            help=f"SQLite file of the listing state. Default: {default_listing_state_path}",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            default=False,
+            help="Discard the listing state and fetch all rows",
+        )
+        parser.add_argument(
+            "--sweep",
+            action="store_true",
+            default=None,
+            help=(
+                "Remove rows deleted from the database, reading all primary keys. "
+                "Default: if the last sweep is older than EDC_EGFR_LISTING_SWEEP_INTERVAL"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        listing = EgfrSafetyListing(path=options["state_path"], rebuild=options["rebuild"])
+        try:
+            summary = listing.update(sweep=options["sweep"])
+            for model, fetched in summary.fetched.items():
+                sys.stderr.write(
+                    f"  * {model}: {fetched} fetched, {summary.deleted[model]} deleted\n"
+                )
+            if options["output_path"]:
+                with open(options["output_path"], "w", newline="") as output:
+                    count = listing.write_csv(output)
+            else:
+                count = listing.write_csv(sys.stdout)
+        finally:
+            listing.close()
+        sys.stderr.write(style.MIGRATE_HEADING(f"Done. Listed {count} rows.\n"))
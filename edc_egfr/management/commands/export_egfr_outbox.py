@@ -0,0 +1,70 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import color_style
+
+from edc_egfr.batch_runner import MB
+from edc_egfr.outbox import EgfrOutboxExporter
+
+style = color_style()
+
+
+class Command(BaseCommand):
+    help = "Export and delete the eGFR outbox events as JSON Lines files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            dest="output_dir",
+            required=True,
+            help="Folder for the JSON Lines files",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            dest="chunk_size",
+            type=int,
+            default=None,
+            help="Events per file before compaction. Default: 1000",
+        )
+        parser.add_argument(
+            "--no-compact",
+            dest="compact",
+            action="store_false",
+            default=True,
+            help="Export every event, including those superseded by a later event",
+        )
+        parser.add_argument(
+            "--memory-budget",
+            dest="memory_budget",
+            type=int,
+            default=None,
+            help=(
+                "Peak memory, in MB, per chunk. Chunks start at --chunk-size "
+                "and are resized to stay within it"
+            ),
+        )
+        parser.add_argument(
+            "--database",
+            dest="using",
+            default=None,
+            help="Database alias of the outbox. Default: default routing",
+        )
+
+    def handle(self, *args, **options):
+        export = EgfrOutboxExporter(
+            output_dir=options["output_dir"],
+            chunk_size=options["chunk_size"],
+            compact=options["compact"],
+            using=options["using"],
+            memory_budget=options["memory_budget"] and options["memory_budget"] * MB,
+        ).export()
+        for path in export.files:
+            sys.stderr.write(f"  * {path}\n")
+        if export.batch_report:
+            sys.stderr.write(f"  {export.batch_report}\n")
+        sys.stderr.write(
+            style.MIGRATE_HEADING(
+                f"Done. Exported {export.exported} events to {len(export.files)} files, "
+                f"compacted {export.compacted}.\n"
+            )
+        )
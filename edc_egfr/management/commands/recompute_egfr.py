@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from edc_egfr.batch_runner import MB
+from edc_egfr.recompute.checkpoint import default_checkpoint_path
+from edc_egfr.recompute.dry_run_egfr_command import dry_run_egfr_command
+from edc_egfr.recompute.recompute_egfr_command import recompute_egfr_command
+
+
+class Command(BaseCommand):
+    help = "Recompute eGFR for EgfrModelMixin models, site by site"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sites",
+            nargs="*",
+            type=int,
+            dest="site_ids",
+            help="Site ids to recompute. Default: all sites with eGFR data",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            dest="max_workers",
+            help="Number of sites to process in parallel",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            dest="chunk_size",
+            help="Rows saved per transaction",
+        )
+        parser.add_argument(
+            "--memory-budget",
+            type=int,
+            default=None,
+            dest="memory_budget",
+            help=(
+                "Peak memory, in MB, per chunk. Chunks start at --chunk-size "
+                "and are resized to stay within it. Requires --workers 1"
+            ),
+        )
+        parser.add_argument(
+            "--checkpoint",
+            dest="checkpoint_path",
+            default=None,
+            help=(
+                "SQLite file to save progress to. "
+                f"Default with --resume: {default_checkpoint_path}"
+            ),
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            default=False,
+            help="Resume from the last completed chunk saved in the checkpoint file",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="Write the changes a recompute would make as JSON lines. Saves nothing",
+        )
+        parser.add_argument(
+            "--output",
+            dest="output_path",
+            default=None,
+            help="File for the --dry-run report. Default: stdout",
+        )
+        parser.add_argument(
+            "--include-unchanged",
+            action="store_true",
+            default=False,
+            help="With --dry-run, also report rows that would not change",
+        )
+
+    def handle(self, *args, **options):
+        if options["memory_budget"] and options["max_workers"] > 1:
+            raise CommandError("--memory-budget requires --workers 1.")
+        if options["dry_run"]:
+            dry_run_egfr_command(
+                output_path=options["output_path"],
+                site_ids=options["site_ids"],
+                chunk_size=options["chunk_size"],
+                include_unchanged=options["include_unchanged"],
+            )
+            return
+        if not recompute_egfr_command(
+            site_ids=options["site_ids"],
+            max_workers=options["max_workers"],
+            chunk_size=options["chunk_size"],
+            checkpoint_path=options["checkpoint_path"],
+            resume=options["resume"],
+            memory_budget=options["memory_budget"] and options["memory_budget"] * MB,
+        ):
+            raise CommandError("One or more sites failed. See report above.")
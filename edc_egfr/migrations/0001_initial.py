@@ -0,0 +1,39 @@
+import django.core.serializers.json
+import edc_utils.date
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="EgfrOutboxEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("created", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+                ("event_type", models.CharField(max_length=50)),
+                ("model", models.CharField(max_length=100)),
+                ("object_id", models.CharField(max_length=36)),
+                ("subject_identifier", models.CharField(max_length=50, null=True)),
+                (
+                    "payload",
+                    models.JSONField(
+                        default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "eGFR Outbox Event",
+                "verbose_name_plural": "eGFR Outbox Events",
+                "indexes": [
+                    models.Index(
+                        fields=["model", "object_id", "id"],
+                        name="edc_egfr_outbox_key_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+import django.core.serializers.json
+import edc_utils.date
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("edc_egfr", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EgfrDropNotificationFailure",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("created", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+                ("model", models.CharField(max_length=100)),
+                ("related_visit_id", models.CharField(max_length=36)),
+                (
+                    "values",
+                    models.JSONField(
+                        default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                (
+                    "create_values",
+                    models.JSONField(
+                        default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                ("error", models.TextField()),
+            ],
+            options={
+                "verbose_name": "eGFR Drop Notification Failure",
+                "verbose_name_plural": "eGFR Drop Notification Failures",
+                "indexes": [
+                    models.Index(
+                        fields=["model", "related_visit_id"],
+                        name="edc_egfr_failure_visit_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models, transaction
+from django.db import models, router, transaction
 from edc_lab_panel.model_mixin_factory import reportable_result_model_mixin_factory
 from edc_registration.models import RegisteredSubject
 from edc_reportable.units import EGFR_UNITS, PERCENT
 from edc_reportable.utils import get_reference_range_collection_name
 
+from ..baseline_resolver import BaselineEgfrResolver
 from ..calculators import EgfrCalculatorError
 from ..egfr import Egfr
+from ..outbox import EGFR_RESULT, get_egfr_outbox, write_egfr_outbox_event
+from ..read_database import get_egfr_read_database, get_from_read_database
+from ..weight_resolver import WeightResolver
 
 
 class EgfrModelMixin(
@@ -42,10 +47,24 @@ class EgfrModelMixin(
 
     percent_drop_threshold: float = 20.0
     baseline_timepoint: int = 0
+    # if set, use the as-of baseline; see `get_as_of_baseline_egfr_value`
+    egfr_baseline_window: timedelta | None = None
+    egfr_baseline_resolver_cls = BaselineEgfrResolver
     egfr_formula_name: str = None
     egfr_cls = Egfr
+    egfr_weight_model: str | None = None
+    egfr_weight_field: str = "weight"
+    egfr_weight_resolver_cls = WeightResolver
 
     def save(self, *args, **kwargs):
+        if not get_egfr_outbox():
+            return self.save_egfr(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            self.save_egfr(*args, **kwargs)
+            write_egfr_outbox_event(EGFR_RESULT, self, using=using)
+
+    def save_egfr(self, *args, **kwargs):
         if self.creatinine_value:
             self.set_egfr_value_or_raise()
         super().save(*args, **kwargs)
@@ -72,8 +91,9 @@ class EgfrModelMixin(
 
     @property
     def egfr_options(self) -> dict:
-        rs = RegisteredSubject.objects.get(
-            subject_identifier=self.related_visit.subject_identifier
+        rs = get_from_read_database(
+            RegisteredSubject.objects.all(),
+            subject_identifier=self.related_visit.subject_identifier,
         )
         return dict(
             calling_crf=self,
@@ -93,27 +113,129 @@ class EgfrModelMixin(
         """Returns a baseline or reference eGFR value.
 
         Expects a longitudinal / CRF model with attrs `subject_visit`.
+
+        If `EDC_EGFR_READ_DATABASE` is set, the baseline visit is read
+        from there. The baseline CRF is read from the primary if in a
+        transaction, since the baseline may have just been saved.
+
+        If `egfr_baseline_window` is set, returns the as-of baseline
+        instead.
         """
+        if self.egfr_baseline_window is not None:
+            return self.get_as_of_baseline_egfr_value()
         egfr_value = None
-        with transaction.atomic():
-            baseline_visit = self.related_visit.__class__.objects.get(
+        try:
+            baseline_visit = get_from_read_database(
+                self.related_visit.__class__.objects.all(),
                 appointment__subject_identifier=self.related_visit.subject_identifier,
                 appointment__visit_schedule_name=self.related_visit.visit_schedule_name,
                 appointment__schedule_name=self.related_visit.schedule_name,
                 appointment__timepoint=self.baseline_timepoint,
                 visit_code_sequence=0,
             )
-        with transaction.atomic():
-            try:
-                egfr_value = self.__class__.objects.get(
-                    subject_visit=baseline_visit
-                ).egfr_value
-            except ObjectDoesNotExist:
-                pass
+            egfr_value = get_from_read_database(
+                self.__class__.objects.all(), consistent=True, subject_visit=baseline_visit
+            ).egfr_value
+        except ObjectDoesNotExist:
+            pass
         return egfr_value
 
+    def get_as_of_baseline_egfr_value(self) -> float | None:
+        """Returns the most recent eGFR value of the subject at or
+        before `get_egfr_baseline_datetime()` and within
+        `egfr_baseline_window` of it, or None.
+
+        Rows of unscheduled visits are included, so a baseline is
+        found even if the baseline visit is missing.
+        """
+        baseline_datetime = self.get_egfr_baseline_datetime()
+        if baseline_datetime:
+            return self.get_egfr_baseline_resolver().get_egfr_value(
+                self.related_visit.subject_identifier, baseline_datetime
+            )
+        return None
+
+    def get_egfr_baseline_datetime(self) -> datetime | None:
+        """Returns the reference datetime of the as-of baseline.
+
+        Defaults to the report datetime of the scheduled visit at
+        `baseline_timepoint` or, if the visit is missing, the datetime
+        of its appointment. Override to use another reference, e.g.
+        the randomization datetime.
+        """
+        try:
+            baseline_visit = get_from_read_database(
+                self.related_visit.__class__.objects.all(),
+                appointment__subject_identifier=self.related_visit.subject_identifier,
+                appointment__visit_schedule_name=self.related_visit.visit_schedule_name,
+                appointment__schedule_name=self.related_visit.schedule_name,
+                appointment__timepoint=self.baseline_timepoint,
+                visit_code_sequence=0,
+            )
+        except ObjectDoesNotExist:
+            pass
+        else:
+            return baseline_visit.report_datetime
+        try:
+            appointment = get_from_read_database(
+                self.related_visit.appointment.__class__.objects.all(),
+                subject_identifier=self.related_visit.subject_identifier,
+                visit_schedule_name=self.related_visit.visit_schedule_name,
+                schedule_name=self.related_visit.schedule_name,
+                timepoint=self.baseline_timepoint,
+                visit_code_sequence=0,
+            )
+        except ObjectDoesNotExist:
+            return None
+        return appointment.appt_datetime
+
+    def get_egfr_baseline_resolver(self) -> BaselineEgfrResolver:
+        """Returns the as-of baseline resolver.
+
+        A batch job may set a shared, prefetched resolver on the
+        instance as `_egfr_baseline_resolver`.
+        """
+        try:
+            return self._egfr_baseline_resolver
+        except AttributeError:
+            return self.make_egfr_baseline_resolver()
+
+    @classmethod
+    def make_egfr_baseline_resolver(cls) -> BaselineEgfrResolver:
+        return cls.egfr_baseline_resolver_cls(
+            model=cls._meta.label_lower,
+            window=cls.egfr_baseline_window,
+            using=get_egfr_read_database(cls, consistent=True),
+        )
+
     def get_weight_in_kgs_for_egfr(self) -> Decimal | None:
+        """Returns the most recent weight at or before this visit if
+        `egfr_weight_model` is set, otherwise None.
+        """
+        if self.egfr_weight_model:
+            return self.get_egfr_weight_resolver().get_weight(
+                self.related_visit.subject_identifier, self.related_visit.report_datetime
+            )
         return None
 
+    def get_egfr_weight_resolver(self) -> WeightResolver:
+        """Returns the weight resolver.
+
+        A batch job may set a shared, prefetched resolver on the
+        instance as `_egfr_weight_resolver`.
+        """
+        try:
+            return self._egfr_weight_resolver
+        except AttributeError:
+            return self.make_egfr_weight_resolver()
+
+    @classmethod
+    def make_egfr_weight_resolver(cls) -> WeightResolver:
+        return cls.egfr_weight_resolver_cls(
+            model=cls.egfr_weight_model,
+            field_name=cls.egfr_weight_field,
+            using=get_egfr_read_database(cls, consistent=True),
+        )
+
     class Meta:
         abstract = True
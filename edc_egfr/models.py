@@ -0,0 +1,73 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from edc_utils import get_utcnow
+
+
+class EgfrOutboxEvent(models.Model):
+    """An eGFR result or drop notification as saved, written in the
+    same transaction as the save.
+
+    See `edc_egfr.outbox`.
+    """
+
+    # the export order
+    id = models.BigAutoField(primary_key=True)
+
+    created = models.DateTimeField(default=get_utcnow)
+
+    event_type = models.CharField(max_length=50)
+
+    # label_lower of the model saved
+    model = models.CharField(max_length=100)
+
+    object_id = models.CharField(max_length=36)
+
+    subject_identifier = models.CharField(max_length=50, null=True)
+
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+
+    def __str__(self):
+        return f"{self.event_type} {self.model} {self.object_id}"
+
+    class Meta:
+        verbose_name = "eGFR Outbox Event"
+        verbose_name_plural = "eGFR Outbox Events"
+        indexes = [
+            models.Index(fields=["model", "object_id", "id"], name="edc_egfr_outbox_key_idx")
+        ]
+
+
+class EgfrDropNotificationFailure(models.Model):
+    """The last drop notification write for a visit that failed, or
+    was rejected, in the background executor.
+
+    Removed once a write for the visit succeeds. See
+    `edc_egfr.drop_notification_writer.retry_egfr_drop_notifications`.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+
+    created = models.DateTimeField(default=get_utcnow)
+
+    # label_lower of the drop notification model
+    model = models.CharField(max_length=100)
+
+    related_visit_id = models.CharField(max_length=36)
+
+    values = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+
+    create_values = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+
+    error = models.TextField()
+
+    def __str__(self):
+        return f"{self.model} {self.related_visit_id}"
+
+    class Meta:
+        verbose_name = "eGFR Drop Notification Failure"
+        verbose_name_plural = "eGFR Drop Notification Failures"
+        indexes = [
+            models.Index(
+                fields=["model", "related_visit_id"], name="edc_egfr_failure_visit_idx"
+            )
+        ]
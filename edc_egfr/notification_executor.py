@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import abc
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .read_database import egfr_read_from_primary
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor: NotificationExecutor | None = None
+
+# called with the exception of a job that failed or was rejected
+OnFailure = Callable[[Exception], Any]
+
+
+class NotificationQueueFull(Exception):
+    pass
+
+
+class NotificationExecutor(abc.ABC):
+    """Runs drop notification writes handed off after commit.
+
+    Jobs are keyed, e.g. by model and visit. A job submitted for a
+    key that has not yet run replaces the queued job, and jobs of the
+    same key never run at the same time, so the last values
+    submitted for a visit are the ones written.
+
+    A job that raises is retried up to `retries` times, waiting
+    `retry_delay` seconds, doubled after each attempt. A job that
+    still fails, or is rejected, is logged, kept in `failed` as
+    (key, exception) and passed to its `on_failure` callback, if any,
+    e.g. to record it in the database.
+    """
+
+    def __init__(self, retries: int | None = None, retry_delay: float | None = None):
+        self.retries = 3 if retries is None else retries
+        self.retry_delay = 0.5 if retry_delay is None else retry_delay
+        self.failed: list[tuple[Hashable, Exception]] = []
+        self._lock = threading.Lock()
+        # {key: (job, on_failure)} not yet started
+        self._pending: dict[Hashable, tuple[Callable[[], Any], OnFailure | None]] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(retries={self.retries})"
+
+    @abc.abstractmethod
+    def submit(
+        self, key: Hashable, job: Callable[[], Any], on_failure: OnFailure | None = None
+    ) -> None:
+        """Queues the job, replacing any job of `key` not yet started."""
+
+    @abc.abstractmethod
+    def drain(self, timeout: float | None = None) -> list[tuple[Hashable, Exception]]:
+        """Runs or waits for all submitted jobs and returns, and
+        clears, the jobs that failed.
+        """
+
+    def shutdown(self) -> None:
+        self.drain()
+
+    def run(
+        self, key: Hashable, job: Callable[[], Any], on_failure: OnFailure | None = None
+    ) -> None:
+        """Runs the job, retrying on failure.
+
+        The write that submitted the job was just committed and may
+        not yet have replicated, so reads are pinned to the primary.
+        """
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                with egfr_read_from_primary():
+                    job()
+            except Exception as e:
+                if attempt < self.retries:
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                logger.exception(f"eGFR drop notification failed. Got key={key}.")
+                self.fail(key, e, on_failure)
+            return
+
+    def fail(self, key: Hashable, exception: Exception, on_failure: OnFailure | None) -> None:
+        with self._lock:
+            self.failed.append((key, exception))
+        if on_failure:
+            try:
+                with egfr_read_from_primary():
+                    on_failure(exception)
+            except Exception:
+                logger.exception(
+                    f"Unable to record failed eGFR drop notification. Got key={key}."
+                )
+
+    def pop_failed(self) -> list[tuple[Hashable, Exception]]:
+        with self._lock:
+            failed, self.failed = self.failed, []
+        return failed
+
+
+class LocalNotificationExecutor(NotificationExecutor):
+    """Queues jobs in memory and runs them in the calling thread on
+    `drain()`. For tests.
+    """
+
+    def submit(
+        self, key: Hashable, job: Callable[[], Any], on_failure: OnFailure | None = None
+    ) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = (job, on_failure)
+
+    def drain(self, timeout: float | None = None) -> list[tuple[Hashable, Exception]]:
+        while self._pending:
+            with self._lock:
+                key = next(iter(self._pending))
+                job, on_failure = self._pending.pop(key)
+            self.run(key, job, on_failure)
+        return self.pop_failed()
+
+    @property
+    def pending(self) -> list[Hashable]:
+        return list(self._pending)
+
+
+class ThreadPoolNotificationExecutor(NotificationExecutor):
+    """Runs jobs in a pool of `max_workers` threads.
+
+    At most `max_queued` keys are queued or running. Beyond that a
+    job is rejected, as a failure with `NotificationQueueFull`,
+    rather than growing the queue or blocking the calling thread.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        max_queued: int | None = None,
+        retries: int | None = None,
+        retry_delay: float | None = None,
+    ):
+        super().__init__(retries=retries, retry_delay=retry_delay)
+        self.max_workers = max_workers or 2
+        self.max_queued = max_queued or 100
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="edc_egfr_notification"
+        )
+        # keys with a job queued in, or running on, the pool
+        self._scheduled: set[Hashable] = set()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(
+        self, key: Hashable, job: Callable[[], Any], on_failure: OnFailure | None = None
+    ) -> None:
+        with self._lock:
+            if key in self._scheduled:
+                self._pending[key] = (job, on_failure)
+                return
+            rejected = len(self._scheduled) >= self.max_queued
+            if not rejected:
+                self._pending[key] = (job, on_failure)
+                self._scheduled.add(key)
+        if rejected:
+            exception = NotificationQueueFull(f"{self.max_queued} already queued")
+            logger.error(f"eGFR drop notification rejected, {exception}. Got key={key}.")
+            self.fail(key, exception, on_failure)
+        else:
+            self._pool.submit(self._run_key, key)
+
+    def _run_key(self, key: Hashable) -> None:
+        try:
+            while True:
+                with self._lock:
+                    try:
+                        job, on_failure = self._pending.pop(key)
+                    except KeyError:
+                        self._scheduled.discard(key)
+                        self._idle.notify_all()
+                        return
+                self.run(key, job, on_failure)
+        finally:
+            close_old_connections()
+
+    def drain(self, timeout: float | None = None) -> list[tuple[Hashable, Exception]]:
+        with self._lock:
+            if not self._idle.wait_for(lambda: not self._scheduled, timeout=timeout):
+                raise TimeoutError(
+                    f"eGFR drop notifications still running after {timeout}s. "
+                    f"Got {len(self._scheduled)} queued."
+                )
+        return self.pop_failed()
+
+    def shutdown(self) -> None:
+        self.drain()
+        self._pool.shutdown(wait=True)
+
+
+def get_egfr_notification_executor() -> NotificationExecutor | None:
+    """Returns the executor drop notification writes are handed to
+    after commit, or None to write in the saving thread.
+
+    Set `EDC_EGFR_DROP_NOTIFICATION_EXECUTOR` to the dotted path of a
+    `NotificationExecutor` class, with keyword arguments in
+    `EDC_EGFR_DROP_NOTIFICATION_EXECUTOR_OPTIONS`. Default None.
+    """
+    global _executor
+    path = getattr(settings, "EDC_EGFR_DROP_NOTIFICATION_EXECUTOR", None)
+    if not path:
+        return None
+    with _lock:
+        if _executor is None:
+            options = getattr(settings, "EDC_EGFR_DROP_NOTIFICATION_EXECUTOR_OPTIONS", {})
+            _executor = import_string(path)(**options)
+        return _executor
+
+
+def drain_egfr_notifications(timeout: float | None = None) -> list[tuple[Hashable, Exception]]:
+    """Waits for, or runs, all handed off notification writes and
+    returns those that failed.
+    """
+    executor = _executor
+    return executor.drain(timeout=timeout) if executor else []
+
+
+def shutdown_egfr_notification_executor() -> None:
+    """Drains and discards the executor, e.g. on shutdown or when
+    the settings change.
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor:
+        executor.shutdown()
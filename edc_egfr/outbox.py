@@ -0,0 +1,223 @@
+"""Transactional outbox of computed eGFR results and drop
+notifications, exported as a JSON Lines change feed.
+
+If `EDC_EGFR_OUTBOX` is set, `EgfrModelMixin.save()` and the drop
+notification writer add an `EgfrOutboxEvent` in the same
+transaction as the row they save. Nothing is written if the
+transaction is rolled back.
+
+`EgfrOutboxExporter` drains the outbox in `id` order, a chunk at a
+time. Each chunk is written to a new file, synced to disk, and only
+then deleted from the outbox. Delivery is at least once: if the
+export stops between the two steps, the chunk is exported again by
+the next run.
+
+Events of a row superseded by a later event, in the same chunk or
+still in the outbox, are compacted away. Transactions may commit
+out of `id` order, so a consumer should keep the event with the
+highest `id` for each (`model`, `object_id`).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+
+from .batch_runner import AdaptiveBatchRunner
+
+if TYPE_CHECKING:
+    from .batch_runner import BatchRunReport
+    from .models import EgfrOutboxEvent
+
+EGFR_RESULT = "egfr_result"
+EGFR_DROP_NOTIFICATION = "egfr_drop_notification"
+
+# fields copied to the event payload, by event type
+payload_fields = {
+    EGFR_RESULT: [
+        "report_datetime",
+        "creatinine_value",
+        "creatinine_units",
+        "egfr_value",
+        "egfr_units",
+        "egfr_grade",
+        "egfr_drop_value",
+        "egfr_drop_units",
+        "egfr_drop_grade",
+    ],
+    EGFR_DROP_NOTIFICATION: [
+        "report_datetime",
+        "creatinine_date",
+        "creatinine_value",
+        "creatinine_units",
+        "egfr_value",
+        "egfr_percent_change",
+        "report_status",
+    ],
+}
+
+
+def get_egfr_outbox() -> bool:
+    """Returns True if saves of eGFR results and drop notifications
+    add an outbox event.
+
+    Set `EDC_EGFR_OUTBOX`, default False.
+    """
+    return getattr(settings, "EDC_EGFR_OUTBOX", False)
+
+
+def write_egfr_outbox_event(
+    event_type: str, obj: models.Model, using: str | None = None
+) -> EgfrOutboxEvent | None:
+    """Adds an outbox event for `obj`, if the outbox is on, and
+    returns it.
+
+    Call within the transaction that saved `obj`.
+    """
+    from .models import EgfrOutboxEvent
+
+    if not get_egfr_outbox():
+        return None
+    subject_visit = obj.subject_visit
+    payload = {name: getattr(obj, name, None) for name in payload_fields[event_type]}
+    payload.update(
+        visit_code=subject_visit.visit_code,
+        visit_code_sequence=subject_visit.visit_code_sequence,
+    )
+    return EgfrOutboxEvent.objects.using(using).create(
+        event_type=event_type,
+        model=obj._meta.label_lower,
+        object_id=str(obj.pk),
+        subject_identifier=subject_visit.subject_identifier,
+        payload=payload,
+    )
+
+
+@dataclass
+class OutboxExport:
+    files: list[Path] = field(default_factory=list)
+    # events written to files
+    exported: int = 0
+    # superseded events removed without writing
+    compacted: int = 0
+    # chunk sizes and peak memory, if exported with a memory budget
+    batch_report: BatchRunReport | None = None
+
+
+class EgfrOutboxExporter:
+    """Drains the eGFR outbox to JSON Lines files in `output_dir`.
+
+    Files are named by the first and last event id so that they sort
+    in export order, e.g. `egfr-outbox-000000000001-000000001000.jsonl`.
+    Each line is one event with `id`, `created`, `event_type`,
+    `model`, `object_id`, `subject_identifier` and `payload`.
+
+    If a `memory_budget`, in bytes, is given, chunks start at
+    `chunk_size` events and are resized by an `AdaptiveBatchRunner`.
+    """
+
+    file_prefix = "egfr-outbox"
+
+    def __init__(
+        self,
+        output_dir: str | Path,
+        chunk_size: int | None = None,
+        compact: bool | None = None,
+        using: str | None = None,
+        memory_budget: int | None = None,
+    ):
+        self.output_dir = Path(output_dir)
+        self.chunk_size = chunk_size or 1000
+        self.compact = True if compact is None else compact
+        self.using = using
+        self.memory_budget = memory_budget
+
+    @property
+    def queryset(self):
+        from .models import EgfrOutboxEvent
+
+        return EgfrOutboxEvent.objects.using(self.using).order_by("id")
+
+    def export(self) -> OutboxExport:
+        """Exports and deletes all events in the outbox, a chunk at
+        a time.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        result = OutboxExport()
+        if not self.memory_budget:
+            while self.export_chunk(self.chunk_size, result):
+                pass
+            return result
+        runner = AdaptiveBatchRunner(self.memory_budget, initial_chunk_size=self.chunk_size)
+        result.batch_report = runner.report
+        exported = True
+        while exported:
+            with runner.measure() as chunk:
+                exported = chunk.rows = self.export_chunk(runner.chunk_size, result)
+        return result
+
+    def export_chunk(self, chunk_size: int, result: OutboxExport) -> int:
+        """Exports and deletes the next `chunk_size` events and
+        returns the number of events read.
+        """
+        events = list(self.queryset[:chunk_size])
+        if events:
+            rows = self.get_compacted(events) if self.compact else events
+            if rows:
+                result.files.append(self.write_file(rows))
+            result.exported += len(rows)
+            result.compacted += len(events) - len(rows)
+            with transaction.atomic(using=self.using):
+                self.queryset.filter(id__in=[event.id for event in events]).delete()
+        return len(events)
+
+    def get_compacted(self, events: list[EgfrOutboxEvent]) -> list[EgfrOutboxEvent]:
+        """Returns the events of the chunk not superseded by a later
+        event of the same row.
+        """
+        latest = {(event.model, event.object_id): event for event in events}
+        superseded = set(
+            self.queryset.filter(
+                id__gt=events[-1].id,
+                object_id__in={object_id for _, object_id in latest},
+            ).values_list("model", "object_id")
+        )
+        return sorted(
+            [event for key, event in latest.items() if key not in superseded],
+            key=lambda event: event.id,
+        )
+
+    def write_file(self, events: list[EgfrOutboxEvent]) -> Path:
+        """Writes the events to a new file, synced to disk before it
+        is given its final name.
+        """
+        path = self.output_dir / (
+            f"{self.file_prefix}-{events[0].id:012d}-{events[-1].id:012d}.jsonl"
+        )
+        tmp_path = path.with_suffix(".jsonl.tmp")
+        with tmp_path.open("w") as f:
+            for event in events:
+                f.write(json.dumps(self.to_dict(event), cls=DjangoJSONEncoder) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def to_dict(event: EgfrOutboxEvent) -> dict:
+        return dict(
+            id=event.id,
+            created=event.created,
+            event_type=event.event_type,
+            model=event.model,
+            object_id=event.object_id,
+            subject_identifier=event.subject_identifier,
+            payload=event.payload,
+        )
@@ -0,0 +1,263 @@
+"""Registers a `DataFrame.egfr` accessor for vectorized eGFR
+calculation, grading and percent drop.
+
+Requires pandas (pip install edc-egfr[pandas]). Import this module
+to register the accessor:
+
+    import edc_egfr.pandas_accessor  # noqa
+
+    df["egfr_value"] = df.egfr.calculate("ckd-epi")
+    df["egfr_grade"] = df.egfr.grade("my_reference_list")
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from edc_constants.constants import FEMALE, MALE
+from edc_reportable.units import EGFR_UNITS, PERCENT
+
+from .calculators import batch, vectorized
+from .grading import get_compiled_grading_table
+from .staging import ckd_stages, get_ckd_stage_indexes
+
+
+@pd.api.extensions.register_dataframe_accessor("egfr")
+class EgfrAccessor:
+    """Column names default to the names used by `Egfr` and
+    `EgfrModelMixin`.
+
+    Age is taken from the `age_in_years` column or, if the column
+    does not exist, calculated from the `dob` and `report_datetime`
+    columns.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+
+    def calculate(
+        self,
+        formula_name: str,
+        gender: str = "gender",
+        ethnicity: str = "ethnicity",
+        weight: str = "weight",
+        age_in_years: str = "age_in_years",
+        creatinine_value: str = "creatinine_value",
+        creatinine_units: str = "creatinine_units",
+        dob: str = "dob",
+        report_datetime: str = "report_datetime",
+    ) -> pd.Series:
+        """Returns a Series of eGFR values. Rows that cannot be
+        calculated are NaN.
+        """
+        inputs = self.get_inputs(
+            gender,
+            ethnicity,
+            weight,
+            age_in_years,
+            creatinine_value,
+            creatinine_units,
+            dob,
+            report_datetime,
+        )
+        values = vectorized.calculate(formula_name, inputs)
+        return pd.Series(values, index=self._df.index, name="egfr_value")
+
+    def errors(
+        self,
+        formula_name: str,
+        gender: str = "gender",
+        ethnicity: str = "ethnicity",
+        weight: str = "weight",
+        age_in_years: str = "age_in_years",
+        creatinine_value: str = "creatinine_value",
+        creatinine_units: str = "creatinine_units",
+        dob: str = "dob",
+        report_datetime: str = "report_datetime",
+    ) -> pd.Series:
+        """Returns a categorical Series with the reason each row
+        cannot be calculated, or "ok".
+
+        See `edc_egfr.calculators.batch.error_reasons`.
+        """
+        inputs = self.get_inputs(
+            gender,
+            ethnicity,
+            weight,
+            age_in_years,
+            creatinine_value,
+            creatinine_units,
+            dob,
+            report_datetime,
+        )
+        result = batch.evaluate_batch(formula_name, inputs)
+        return pd.Series(
+            pd.Categorical.from_codes(
+                result.error_codes, categories=list(batch.error_reasons.values())
+            ),
+            index=self._df.index,
+            name="egfr_error",
+        )
+
+    def stage(self, egfr_value: str = "egfr_value") -> pd.Series:
+        """Returns a categorical Series of KDIGO CKD stages, G1-G5,
+        NaN where the eGFR value is missing.
+        """
+        return pd.Series(
+            pd.Categorical.from_codes(
+                get_ckd_stage_indexes(self._floats(egfr_value)), categories=ckd_stages
+            ),
+            index=self._df.index,
+            name="ckd_stage",
+        )
+
+    def percent_drop(
+        self,
+        egfr_value: str = "egfr_value",
+        baseline_egfr_value: str = "baseline_egfr_value",
+    ) -> pd.Series:
+        """Returns a Series of the percent drop from baseline.
+
+        The drop is 0 if there is no baseline column.
+        """
+        values = vectorized.percent_drop(
+            self._floats(egfr_value),
+            (self._floats(baseline_egfr_value) if baseline_egfr_value in self._df else np.nan),
+        )
+        return pd.Series(values, index=self._df.index, name="egfr_drop_value")
+
+    def grade(
+        self,
+        reference_range_collection_name: str,
+        egfr_value: str = "egfr_value",
+        gender: str = "gender",
+        age_in_years: str = "age_in_years",
+        dob: str = "dob",
+        report_datetime: str = "report_datetime",
+    ) -> pd.Series:
+        """Returns a nullable integer Series of eGFR grades."""
+        return self._grade(
+            reference_range_collection_name,
+            "egfr",
+            EGFR_UNITS,
+            egfr_value,
+            gender,
+            age_in_years,
+            dob,
+            report_datetime,
+        ).rename("egfr_grade")
+
+    def drop_grade(
+        self,
+        reference_range_collection_name: str,
+        egfr_drop_value: str = "egfr_drop_value",
+        gender: str = "gender",
+        age_in_years: str = "age_in_years",
+        dob: str = "dob",
+        report_datetime: str = "report_datetime",
+    ) -> pd.Series:
+        """Returns a nullable integer Series of eGFR drop grades."""
+        return self._grade(
+            reference_range_collection_name,
+            "egfr_drop",
+            PERCENT,
+            egfr_drop_value,
+            gender,
+            age_in_years,
+            dob,
+            report_datetime,
+        ).rename("egfr_drop_grade")
+
+    def evaluate(
+        self,
+        formula_name: str,
+        reference_range_collection_name: str,
+        baseline_egfr_value: str = "baseline_egfr_value",
+        **columns,
+    ) -> pd.DataFrame:
+        """Returns a copy of the DataFrame with `egfr_value`,
+        `egfr_grade`, `egfr_drop_value` and `egfr_drop_grade`
+        columns added.
+
+        `columns` maps the argument names of `calculate()` to
+        column names.
+        """
+        df = self._df.copy()
+        df["egfr_value"] = df.egfr.calculate(formula_name, **columns)
+        grade_columns = {
+            k: v
+            for k, v in columns.items()
+            if k in ["gender", "age_in_years", "dob", "report_datetime"]
+        }
+        df["egfr_grade"] = df.egfr.grade(reference_range_collection_name, **grade_columns)
+        df["egfr_drop_value"] = df.egfr.percent_drop(baseline_egfr_value=baseline_egfr_value)
+        df["egfr_drop_grade"] = df.egfr.drop_grade(
+            reference_range_collection_name, **grade_columns
+        )
+        return df
+
+    def get_inputs(
+        self,
+        gender: str,
+        ethnicity: str,
+        weight: str,
+        age_in_years: str,
+        creatinine_value: str,
+        creatinine_units: str,
+        dob: str,
+        report_datetime: str,
+    ) -> vectorized.EgfrInputs:
+        return vectorized.EgfrInputs.from_values(
+            gender=self._objects(gender),
+            age_in_years=self.get_age_in_years(age_in_years, dob, report_datetime),
+            creatinine_value=self._floats(creatinine_value),
+            creatinine_units=self._objects(creatinine_units),
+            ethnicity=self._objects(ethnicity) if ethnicity in self._df else None,
+            weight=self._floats(weight) if weight in self._df else None,
+        )
+
+    def get_age_in_years(
+        self,
+        age_in_years: str = "age_in_years",
+        dob: str = "dob",
+        report_datetime: str = "report_datetime",
+    ) -> np.ndarray:
+        if age_in_years in self._df:
+            return self._floats(age_in_years)
+        report_datetimes = pd.to_datetime(self._df[report_datetime], utc=True)
+        return vectorized.age_in_years(
+            pd.to_datetime(self._df[dob]).to_numpy(dtype="datetime64[D]"),
+            report_datetimes.dt.tz_localize(None).to_numpy(dtype="datetime64[D]"),
+        )
+
+    def _grade(
+        self,
+        reference_range_collection_name: str,
+        utest_id: str,
+        units: str,
+        value: str,
+        gender: str,
+        age_in_years: str,
+        dob: str,
+        report_datetime: str,
+    ) -> pd.Series:
+        genders = self._objects(gender)
+        grades = vectorized.grade(
+            get_compiled_grading_table(reference_range_collection_name, utest_id),
+            self._floats(value),
+            male=genders == MALE,
+            female=genders == FEMALE,
+            age_in_years=self.get_age_in_years(age_in_years, dob, report_datetime),
+            units=units,
+        )
+        series = pd.Series(grades, index=self._df.index, dtype="Int64")
+        return series.mask(series == vectorized.NOT_GRADED)
+
+    def _floats(self, column: str) -> np.ndarray:
+        return pd.to_numeric(self._df[column], errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+
+    def _objects(self, column: str) -> np.ndarray:
+        series = self._df[column].astype(object)
+        return series.where(series.notna(), None).to_numpy(dtype=object)
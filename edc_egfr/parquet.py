@@ -0,0 +1,214 @@
+"""Batch eGFR calculation for Parquet files.
+
+Requires pyarrow (pip install edc-egfr[parquet]).
+
+Row groups are read, processed and written one at a time so peak
+memory is bounded by one row group. String columns are evaluated
+with `pyarrow.compute` into boolean masks and numeric columns are
+read as numpy buffers, so values are never converted to Python
+objects.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from edc_constants.constants import BLACK, FEMALE, MALE
+from edc_reportable import MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER
+from edc_reportable.units import EGFR_UNITS, PERCENT
+
+from .calculators import batch, vectorized
+from .grading import get_compiled_grading_table
+
+default_columns = dict(
+    gender="gender",
+    ethnicity="ethnicity",
+    weight="weight",
+    age_in_years="age_in_years",
+    dob="dob",
+    report_datetime="report_datetime",
+    creatinine_value="creatinine_value",
+    creatinine_units="creatinine_units",
+    baseline_egfr_value="baseline_egfr_value",
+)
+
+
+@dataclass
+class ParquetEgfrSummary:
+    row_groups: int = 0
+    rows: int = 0
+    calculated: int = 0
+    errors: batch.ErrorReport = field(default_factory=batch.ErrorReport)
+
+
+class ParquetEgfrProcessor:
+    """Adds `egfr_value`, `egfr_error`, `egfr_grade`,
+    `egfr_drop_value` and `egfr_drop_grade` columns to each row
+    group of a Parquet file.
+
+    `egfr_error` is the uint8 error code for the row, see
+    `edc_egfr.calculators.batch.error_reasons`.
+
+    `columns` maps the input names in `default_columns` to column
+    names in the file. Age is read from the `age_in_years` column
+    or, if the file has no such column, calculated from `dob` and
+    `report_datetime`. Grades are only added if a
+    `reference_range_collection_name` is given.
+    """
+
+    def __init__(
+        self,
+        formula_name: str,
+        reference_range_collection_name: str | None = None,
+        columns: dict[str, str] | None = None,
+    ):
+        if formula_name not in vectorized.calculators:
+            raise ValueError(
+                f"Invalid formula_name. Expected one of {list(vectorized.calculators)}. "
+                f"Got {formula_name}."
+            )
+        self.formula_name = formula_name
+        self.columns = {**default_columns, **(columns or {})}
+        self.egfr_grading_table = None
+        self.egfr_drop_grading_table = None
+        if reference_range_collection_name:
+            self.egfr_grading_table = get_compiled_grading_table(
+                reference_range_collection_name, "egfr"
+            )
+            self.egfr_drop_grading_table = get_compiled_grading_table(
+                reference_range_collection_name, "egfr_drop"
+            )
+
+    def process(self, source: str | Path, destination: str | Path) -> ParquetEgfrSummary:
+        """Reads `source` one row group at a time and writes each
+        processed row group to `destination`.
+        """
+        summary = ParquetEgfrSummary()
+        parquet_file = pq.ParquetFile(source)
+        writer = None
+        try:
+            for index in range(parquet_file.num_row_groups):
+                table = self.process_table(parquet_file.read_row_group(index))
+                if writer is None:
+                    writer = pq.ParquetWriter(destination, table.schema)
+                writer.write_table(table, row_group_size=table.num_rows)
+                summary.row_groups += 1
+                summary.rows += table.num_rows
+                summary.calculated += table.num_rows - table["egfr_value"].null_count
+                summary.errors = summary.errors.merge(
+                    self.get_error_report(table["egfr_error"])
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+        return summary
+
+    def process_table(self, table: pa.Table) -> pa.Table:
+        """Returns the table with the calculated columns appended."""
+        inputs = self.get_inputs(table)
+        result = batch.evaluate_batch(self.formula_name, inputs)
+        egfr_value = result.values
+        baseline_column = self.columns["baseline_egfr_value"]
+        if baseline_column in table.column_names:
+            baseline_egfr_value = self.to_floats(table[baseline_column])
+        else:
+            baseline_egfr_value = np.nan
+        egfr_drop_value = vectorized.percent_drop(egfr_value, baseline_egfr_value)
+        table = table.append_column("egfr_value", self.from_floats(egfr_value))
+        table = table.append_column("egfr_error", pa.array(result.error_codes))
+        table = table.append_column("egfr_drop_value", self.from_floats(egfr_drop_value))
+        if self.egfr_grading_table:
+            for name, grading_table, values, units in [
+                ("egfr_grade", self.egfr_grading_table, egfr_value, EGFR_UNITS),
+                ("egfr_drop_grade", self.egfr_drop_grading_table, egfr_drop_value, PERCENT),
+            ]:
+                grades = vectorized.grade(
+                    grading_table,
+                    values,
+                    male=inputs.male,
+                    female=inputs.female,
+                    age_in_years=inputs.age_in_years,
+                    units=units,
+                )
+                table = table.append_column(
+                    name, pa.array(grades, mask=grades == vectorized.NOT_GRADED)
+                )
+        return table
+
+    def get_inputs(self, table: pa.Table) -> vectorized.EgfrInputs:
+        columns = self.columns
+        names = table.column_names
+        gender = table[columns["gender"]]
+        creatinine_units = table[columns["creatinine_units"]]
+        ethnicity = table[columns["ethnicity"]] if columns["ethnicity"] in names else None
+        return vectorized.EgfrInputs(
+            male=self.equals(gender, MALE),
+            female=self.equals(gender, FEMALE),
+            age_in_years=self.get_age_in_years(table),
+            creatinine_value=self.to_floats(table[columns["creatinine_value"]]),
+            umol_l=self.equals(creatinine_units, MICROMOLES_PER_LITER),
+            mg_dl=self.equals(creatinine_units, MILLIGRAMS_PER_DECILITER),
+            has_units=self.to_bools(pc.not_equal(pc.utf8_length(creatinine_units), 0)),
+            black=None if ethnicity is None else self.equals(ethnicity, BLACK),
+            has_ethnicity=(
+                None
+                if ethnicity is None
+                else self.to_bools(pc.not_equal(pc.utf8_length(ethnicity), 0))
+            ),
+            weight=(
+                self.to_floats(table[columns["weight"]])
+                if columns["weight"] in names
+                else None
+            ),
+        )
+
+    def get_age_in_years(self, table: pa.Table) -> np.ndarray:
+        if self.columns["age_in_years"] in table.column_names:
+            return self.to_floats(table[self.columns["age_in_years"]])
+        return vectorized.age_in_years(
+            self.to_dates(table[self.columns["dob"]]),
+            self.to_dates(table[self.columns["report_datetime"]]),
+        )
+
+    @staticmethod
+    def get_error_report(column: pa.ChunkedArray) -> batch.ErrorReport:
+        counts = pc.value_counts(column)
+        return batch.ErrorReport(
+            total=len(column),
+            counts={
+                batch.error_reasons[code]: count
+                for code, count in zip(
+                    counts.field("values").to_pylist(), counts.field("counts").to_pylist()
+                )
+            },
+        )
+
+    @staticmethod
+    def equals(column: pa.ChunkedArray, value: str) -> np.ndarray:
+        return ParquetEgfrProcessor.to_bools(pc.equal(column, value))
+
+    @staticmethod
+    def to_bools(column: pa.ChunkedArray) -> np.ndarray:
+        return pc.fill_null(column, False).to_numpy()
+
+    @staticmethod
+    def to_floats(column: pa.ChunkedArray) -> np.ndarray:
+        column = pc.fill_null(pc.cast(column, pa.float64()), np.nan)
+        return column.to_numpy()
+
+    @staticmethod
+    def to_dates(column: pa.ChunkedArray) -> np.ndarray:
+        """Returns datetime64[D], timestamps are taken as UTC."""
+        if pa.types.is_timestamp(column.type) and column.type.tz:
+            column = pc.cast(column, pa.timestamp(column.type.unit, tz="UTC"))
+            column = pc.cast(column, pa.timestamp(column.type.unit))
+        return pc.cast(column, pa.date32()).to_numpy().astype("datetime64[D]")
+
+    @staticmethod
+    def from_floats(values: np.ndarray) -> pa.Array:
+        return pa.array(values, mask=np.isnan(values))
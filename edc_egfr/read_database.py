@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Type
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router, transaction
+
+if TYPE_CHECKING:
+    from django.db import models
+    from django.db.models import QuerySet
+
+_local = threading.local()
+
+
+def get_egfr_read_database(
+    model_cls: Type[models.Model] | None = None, consistent: bool | None = None
+) -> str | None:
+    """Returns the database alias for read-only eGFR lookups, or None
+    for the default routing.
+
+    Set `EDC_EGFR_READ_DATABASE` to the alias of a read replica.
+
+    Returns None within `egfr_read_from_primary()` and, if
+    `consistent`, while the write database for `model_cls` is in a
+    transaction since rows read may have been written but not yet
+    committed.
+    """
+    using = getattr(settings, "EDC_EGFR_READ_DATABASE", None)
+    if not using or getattr(_local, "primary", 0):
+        return None
+    if (
+        consistent
+        and transaction.get_connection(router.db_for_write(model_cls)).in_atomic_block
+    ):
+        return None
+    return using
+
+
+@contextmanager
+def egfr_read_from_primary():
+    """Pins eGFR lookups in this thread to the primary, e.g. when
+    reading rows just committed that may not have replicated yet.
+    """
+    _local.primary = getattr(_local, "primary", 0) + 1
+    try:
+        yield
+    finally:
+        _local.primary -= 1
+
+
+def get_from_read_database(queryset: QuerySet, consistent: bool | None = None, **lookups):
+    """Returns `queryset.get(**lookups)` from the read database.
+
+    If not found there, for example if not yet replicated, retries on
+    the write database.
+    """
+    using = get_egfr_read_database(queryset.model, consistent=consistent)
+    try:
+        return queryset.using(using).get(**lookups)
+    except ObjectDoesNotExist:
+        if not using:
+            raise
+        return queryset.using(router.db_for_write(queryset.model)).get(**lookups)
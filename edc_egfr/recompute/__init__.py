@@ -0,0 +1,10 @@
+from .checkpoint import RecomputeCheckpoint
+from .dry_run import DryRunSummary, dry_run_egfr
+from .queue import flush_egfr_recompute_queue, queue_egfr_recompute
+from .recompute import get_egfr_model_classes, recompute_egfr_for_subjects
+from .site_partitioned import (
+    SiteRecomputeResult,
+    get_egfr_site_ids,
+    recompute_egfr_by_site,
+    recompute_egfr_for_site,
+)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+default_checkpoint_path = "recompute_egfr.checkpoint.sqlite3"
+
+STARTED = "started"
+DONE = "done"
+FAILED = "failed"
+
+
+class RecomputeCheckpoint:
+    """A local SQLite store of recompute progress.
+
+    Progress is kept per unit, a model and site, as a subject
+    identifier watermark: the rows of all subjects at or below the
+    watermark have been recomputed and committed. Chunks hold whole
+    subjects in subject identifier order. The status of each chunk is
+    also kept for reporting.
+
+    The watermark only advances past a chunk once the chunk's
+    transaction has committed and all earlier chunks of the unit are
+    done. A chunk interrupted before its status is saved is
+    processed again on resume. Re-saving a row recalculates the same
+    values, so a chunk may safely be processed more than once.
+
+    The store may be shared by the threads of one process.
+    """
+
+    def __init__(self, path: str | Path | None = None, resume: bool | None = None):
+        self.path = str(path or default_checkpoint_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermark ("
+                "model TEXT, site_id INTEGER, subject_identifier TEXT, "
+                "blocked INTEGER DEFAULT 0, "
+                "PRIMARY KEY (model, site_id))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunk ("
+                "model TEXT, site_id INTEGER, first_subject_identifier TEXT, "
+                "last_subject_identifier TEXT, rows INTEGER, status TEXT, error TEXT, "
+                "updated TEXT, PRIMARY KEY (model, site_id, first_subject_identifier))"
+            )
+            if not resume:
+                connection.execute("DELETE FROM watermark")
+                connection.execute("DELETE FROM chunk")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path})"
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_watermark(self, model: str, site_id: int) -> str | None:
+        """Returns the last subject identifier committed for this
+        unit, or None.
+        """
+        row = self._fetchone(
+            "SELECT subject_identifier FROM watermark WHERE model=? AND site_id=?",
+            (model, site_id),
+        )
+        return row[0] if row else None
+
+    def start_unit(self, model: str, site_id: int) -> None:
+        """Unblocks the watermark of a unit at the start of a run."""
+        self._execute(
+            "INSERT INTO watermark (model, site_id, subject_identifier, blocked) "
+            "VALUES (?, ?, NULL, 0) "
+            "ON CONFLICT (model, site_id) DO UPDATE SET blocked=0",
+            (model, site_id),
+        )
+
+    def start_chunk(self, model: str, site_id: int, first: str, last: str, rows: int):
+        self._set_chunk(model, site_id, first, last, rows, STARTED)
+
+    def complete_chunk(self, model: str, site_id: int, first: str, last: str, rows: int):
+        """Marks the chunk done and, unless an earlier chunk of the
+        unit failed in this run, advances the watermark.
+        """
+        self._set_chunk(model, site_id, first, last, rows, DONE)
+        self._execute(
+            "UPDATE watermark SET subject_identifier=? "
+            "WHERE model=? AND site_id=? AND blocked=0",
+            (last, model, site_id),
+        )
+
+    def fail_chunk(
+        self, model: str, site_id: int, first: str, last: str, rows: int, error: str
+    ):
+        """Marks the chunk failed and holds the watermark below it."""
+        self._set_chunk(model, site_id, first, last, rows, FAILED, error)
+        self._execute(
+            "UPDATE watermark SET blocked=1 WHERE model=? AND site_id=?", (model, site_id)
+        )
+
+    def get_chunks(self, status: str | None = None) -> list[tuple]:
+        """Returns (model, site_id, first subject identifier, last
+        subject identifier, rows, status, error) for each chunk,
+        optionally filtered by status.
+        """
+        sql = (
+            "SELECT model, site_id, first_subject_identifier, last_subject_identifier, "
+            "rows, status, error FROM chunk"
+        )
+        params: tuple = ()
+        if status:
+            sql += " WHERE status=?"
+            params = (status,)
+        with self._lock:
+            return self._connection.execute(sql + " ORDER BY rowid", params).fetchall()
+
+    def _set_chunk(self, model, site_id, first, last, rows, status, error=None):
+        self._execute(
+            "INSERT OR REPLACE INTO chunk (model, site_id, first_subject_identifier, "
+            "last_subject_identifier, rows, status, error, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                model,
+                site_id,
+                first,
+                last,
+                rows,
+                status,
+                error,
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        with self._lock, self._connection as connection:
+            connection.execute(sql, params)
+
+    def _fetchone(self, sql: str, params: tuple) -> tuple | None:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchone()
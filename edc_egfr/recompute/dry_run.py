@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, TextIO, Type
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router, transaction
+
+from ..drop_notification_writer import EgfrDropNotificationWriter
+from ..egfr import Egfr
+from ..read_database import get_egfr_read_database
+from .recompute import get_egfr_model_classes
+from .site_partitioned import get_site_lookup
+
+if TYPE_CHECKING:
+    from ..model_mixins import EgfrModelMixin
+
+CREATE = "create"
+UPDATE = "update"
+UNCHANGED = "unchanged"
+
+compared_fields = ["egfr_value", "egfr_grade", "egfr_drop_value", "egfr_drop_grade"]
+grade_fields = ["egfr_grade", "egfr_drop_grade"]
+
+
+class DryRunEgfrMixin:
+    """Declared with an `Egfr` class to report, instead of write,
+    the drop notification.
+
+    Sets `dry_run_notification` to "create", "update", "unchanged",
+    or leaves it None if the percent drop threshold is not reached.
+    """
+
+    dry_run_notification: str | None = None
+
+    def create_or_update_egfr_drop_notification(self):
+        model_cls = self.egfr_drop_notification_model_cls
+        try:
+            obj = model_cls.objects.using(get_egfr_read_database()).get(
+                subject_visit__id=self.related_visit.id
+            )
+        except ObjectDoesNotExist:
+            self.dry_run_notification = CREATE
+        else:
+            writer = self.egfr_drop_notification_writer_cls(model_cls)
+            changed = writer.get_changed(obj, self.get_egfr_drop_notification_values())
+            self.dry_run_notification = UPDATE if changed else UNCHANGED
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_dry_run_egfr_cls(egfr_cls: Type[Egfr]) -> Type[Egfr]:
+    return type(f"DryRun{egfr_cls.__name__}", (DryRunEgfrMixin, egfr_cls), {})
+
+
+@dataclass
+class DryRunSummary:
+    rows: int = 0
+    changed: int = 0
+    errors: int = 0
+    # {(field, old, new): count}
+    grade_transitions: Counter = field(default_factory=Counter)
+    # {action: count}
+    notifications: Counter = field(default_factory=Counter)
+
+    def update(self, diff: dict) -> None:
+        self.rows += 1
+        if diff.get("error"):
+            self.errors += 1
+            return
+        for name in grade_fields:
+            old, new = diff["old"][name], diff["new"][name]
+            if old != new:
+                self.grade_transitions[(name, old, new)] += 1
+        if diff["notification"]:
+            self.notifications[diff["notification"]] += 1
+        if diff["changed"]:
+            self.changed += 1
+
+
+def dry_run_egfr(
+    output: TextIO,
+    model_classes: list[Type[EgfrModelMixin]] | None = None,
+    subject_identifiers: Iterable[str] | None = None,
+    site_ids: list[int] | None = None,
+    chunk_size: int | None = None,
+    include_unchanged: bool | None = None,
+) -> DryRunSummary:
+    """Writes a JSON line to `output` for each eGFR row whose stored
+    values or drop notification would change if recomputed.
+
+    Rows are read a chunk of subjects at a time, so memory does not
+    grow with the number of rows. A row's baseline eGFR is taken from
+    the recomputed, not stored, baseline row, except for models with
+    an as-of baseline (`egfr_baseline_window`). Nothing is written to
+    the database; each chunk is read in a transaction that is rolled
+    back.
+    """
+    chunk_size = chunk_size or 500
+    summary = DryRunSummary()
+    for model_cls in model_classes or get_egfr_model_classes():
+        queryset = model_cls._default_manager.using(get_egfr_read_database()).filter(
+            creatinine_value__isnull=False
+        )
+        if subject_identifiers is not None:
+            queryset = queryset.filter(
+                subject_visit__subject_identifier__in=list(subject_identifiers)
+            )
+        if site_ids:
+            queryset = queryset.filter(**{f"{get_site_lookup(model_cls)}__in": site_ids})
+        # writes, if any, are to the write database, roll them back
+        using = router.db_for_write(model_cls)
+        for chunk in _iter_subject_chunks(queryset, chunk_size):
+            with transaction.atomic(using=using):
+                rows = (
+                    queryset.filter(subject_visit__subject_identifier__in=chunk)
+                    .select_related("subject_visit__appointment")
+                    .order_by(
+                        "subject_visit__subject_identifier",
+                        "subject_visit__appointment__timepoint",
+                        "subject_visit__visit_code_sequence",
+                        "report_datetime",
+                    )
+                )
+                _dry_run_rows(rows, output, summary, include_unchanged)
+                transaction.set_rollback(True, using=using)
+    return summary
+
+
+def _iter_subject_chunks(queryset, chunk_size: int):
+    chunk = []
+    for subject_identifier in (
+        queryset.values_list("subject_visit__subject_identifier", flat=True)
+        .order_by("subject_visit__subject_identifier")
+        .distinct()
+        .iterator(chunk_size=chunk_size)
+    ):
+        chunk.append(subject_identifier)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dry_run_rows(rows, output: TextIO, summary: DryRunSummary, include_unchanged: bool):
+    subject_identifier = None
+    # {(visit_schedule_name, schedule_name): recomputed baseline egfr_value}
+    baselines: dict[tuple[str, str], Any] = {}
+    for obj in rows.iterator():
+        subject_visit = obj.subject_visit
+        if subject_visit.subject_identifier != subject_identifier:
+            subject_identifier = subject_visit.subject_identifier
+            baselines = {}
+        schedule = (subject_visit.visit_schedule_name, subject_visit.schedule_name)
+        try:
+            diff = get_diff(obj, baseline_egfr_value=baselines.get(schedule))
+        except Exception as e:
+            diff = get_row(obj, error=f"{e.__class__.__name__}: {e}")
+        else:
+            if (
+                obj.egfr_baseline_window is None
+                and subject_visit.visit_code_sequence == 0
+                and subject_visit.appointment.timepoint == obj.baseline_timepoint
+            ):
+                baselines[schedule] = diff["new"]["egfr_value"]
+        summary.update(diff)
+        if diff.get("error") or diff["changed"] or include_unchanged:
+            output.write(json.dumps(diff) + "\n")
+
+
+def get_row(obj: EgfrModelMixin, **kwargs) -> dict:
+    return dict(
+        model=obj._meta.label_lower,
+        id=str(obj.pk),
+        subject_identifier=obj.subject_visit.subject_identifier,
+        visit_code=obj.subject_visit.visit_code,
+        visit_code_sequence=obj.subject_visit.visit_code_sequence,
+        **kwargs,
+    )
+
+
+def get_diff(obj: EgfrModelMixin, baseline_egfr_value: Any = None) -> dict:
+    """Returns a dictionary of the stored and recomputed values of
+    a row, without saving.
+    """
+    options = obj.egfr_options
+    if baseline_egfr_value is not None:
+        options.update(baseline_egfr_value=baseline_egfr_value)
+    egfr = get_dry_run_egfr_cls(obj.egfr_cls)(**options)
+    old, new = {}, {}
+    for name in compared_fields:
+        model_field = obj._meta.get_field(name)
+        old[name] = _to_json(
+            EgfrDropNotificationWriter.to_stored(model_field, getattr(obj, name))
+        )
+        new[name] = _to_json(
+            EgfrDropNotificationWriter.to_stored(model_field, getattr(egfr, name))
+        )
+    changes = [name for name in compared_fields if old[name] != new[name]]
+    return get_row(
+        obj,
+        old=old,
+        new=new,
+        changes=changes,
+        notification=egfr.dry_run_notification,
+        changed=bool(changes) or egfr.dry_run_notification in [CREATE, UPDATE],
+    )
+
+
+def _to_json(value: Any) -> Any:
+    if value is None or isinstance(value, int):
+        return value
+    return float(value)
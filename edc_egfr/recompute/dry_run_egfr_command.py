@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.color import color_style
+
+from .dry_run import dry_run_egfr
+
+style = color_style()
+
+
+def dry_run_egfr_command(
+    output_path: str | None = None,
+    site_ids: list[int] | None = None,
+    chunk_size: int | None = None,
+    include_unchanged: bool | None = None,
+) -> None:
+    """Writes the dry-run diff as JSON lines to `output_path`, or
+    stdout, and a summary to stderr.
+    """
+    sys.stderr.write(style.MIGRATE_HEADING("Recomputing eGFR (dry run) ...\n"))
+    if output_path:
+        with open(output_path, "w") as output:
+            summary = dry_run_egfr(
+                output,
+                site_ids=site_ids,
+                chunk_size=chunk_size,
+                include_unchanged=include_unchanged,
+            )
+    else:
+        summary = dry_run_egfr(
+            sys.stdout,
+            site_ids=site_ids,
+            chunk_size=chunk_size,
+            include_unchanged=include_unchanged,
+        )
+    sys.stderr.write(
+        f"  * {summary.rows} rows, {summary.changed} would change, "
+        f"{summary.errors} errors\n"
+    )
+    for (name, old, new), count in sorted(
+        summary.grade_transitions.items(), key=lambda x: (x[0][0], str(x[0][1]), str(x[0][2]))
+    ):
+        sys.stderr.write(f"    - {name} {old} -> {new}: {count}\n")
+    for action, count in sorted(summary.notifications.items()):
+        sys.stderr.write(f"    - notification {action}: {count}\n")
+    sys.stderr.write(style.MIGRATE_HEADING("Done. Nothing was saved.\n"))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from ..read_database import egfr_read_from_primary
+from .recompute import recompute_egfr_for_subjects
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class _RecomputeBatch:
+    """Subjects queued in one transaction, flushed by its own
+    on_commit callback.
+
+    The queue only holds a weak reference to the batch. If the
+    transaction rolls back, Django discards the callback and, with
+    it, the batch, which is never flushed.
+    """
+
+    def __init__(self, using: str):
+        self.using = using
+        self.subject_identifiers: set[str] = set()
+
+    def __call__(self) -> None:
+        # the transaction is already committed, a failed recompute
+        # must not raise in the code that committed it.
+        try:
+            self.flush()
+        except Exception:
+            logger.exception(
+                "eGFR recompute failed. "
+                f"Got subject_identifiers={sorted(self.subject_identifiers)}."
+            )
+
+    def flush(self) -> int:
+        batches = _get_batches()
+        if _get_batch(self.using) is self:
+            del batches[self.using]
+        # the changes that queued these subjects were just committed
+        # and may not have replicated yet.
+        with egfr_read_from_primary():
+            return recompute_egfr_for_subjects(sorted(self.subject_identifiers))
+
+
+def _get_batches() -> dict[str, weakref.ref]:
+    try:
+        batches = _local.batches
+    except AttributeError:
+        batches = _local.batches = {}
+    return batches
+
+
+def _get_batch(using: str) -> _RecomputeBatch | None:
+    """Returns the batch of the current transaction, or None if it
+    was flushed or rolled back.
+    """
+    ref = _get_batches().get(using)
+    return ref and ref()
+
+
+def queue_egfr_recompute(subject_identifier: str, using: str | None = None) -> None:
+    """Queues a targeted eGFR recompute for this subject.
+
+    Subjects queued within the same transaction are recomputed
+    together, once, after the transaction commits. Outside of a
+    transaction the recompute runs immediately.
+
+    Subjects queued in a transaction that rolls back are not
+    recomputed. A subject queued in a savepoint that rolls back may
+    still be, which recalculates the values already saved.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    batch = _get_batch(using)
+    if batch is None:
+        batch = _RecomputeBatch(using)
+        _get_batches()[using] = weakref.ref(batch)
+        batch.subject_identifiers.add(subject_identifier)
+        transaction.on_commit(batch, using=using)
+    else:
+        batch.subject_identifiers.add(subject_identifier)
+
+
+def flush_egfr_recompute_queue(using: str | None = None) -> int:
+    """Recomputes eGFR for all queued subjects and empties the queue.
+
+    Returns the number of rows recomputed.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    batch = _get_batch(using) or _RecomputeBatch(using)
+    return batch.flush()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Type
+
+from django.apps import apps as django_apps
+
+if TYPE_CHECKING:
+    from ..model_mixins import EgfrModelMixin
+
+# each subject's rows in the order collected, so that a row is saved
+# after the baseline and earlier results it is compared to.
+egfr_recompute_ordering = (
+    "subject_visit__subject_identifier",
+    "subject_visit__visit_schedule_name",
+    "subject_visit__schedule_name",
+    "report_datetime",
+    "pk",
+)
+
+
+def get_egfr_model_classes() -> list[Type[EgfrModelMixin]]:
+    """Returns a list of concrete model classes declared with
+    `EgfrModelMixin`.
+    """
+    from ..model_mixins import EgfrModelMixin
+
+    return [
+        model_cls
+        for model_cls in django_apps.get_models()
+        if issubclass(model_cls, EgfrModelMixin) and not model_cls._meta.proxy
+    ]
+
+
+def recompute_egfr_for_subjects(
+    subject_identifiers: Iterable[str],
+    model_classes: list[Type[EgfrModelMixin]] | None = None,
+) -> int:
+    """Recomputes eGFR for the rows of the given subjects only.
+
+    Each row is re-saved so that `EgfrModelMixin.save()` recalculates
+    the eGFR value, grade, drop and drop grade (and updates the drop
+    notification, if any).
+
+    Returns the number of rows recomputed.
+    """
+    subject_identifiers = sorted(set(subject_identifiers))
+    count = 0
+    if subject_identifiers:
+        for model_cls in model_classes or get_egfr_model_classes():
+            queryset = (
+                model_cls._default_manager.filter(
+                    subject_visit__subject_identifier__in=subject_identifiers,
+                    creatinine_value__isnull=False,
+                )
+                .select_related("subject_visit")
+                .order_by(*egfr_recompute_ordering)
+            )
+            weight_resolver = None
+            if model_cls.egfr_weight_model:
+                weight_resolver = model_cls.make_egfr_weight_resolver()
+                weight_resolver.prefetch(subject_identifiers)
+            baseline_resolver = None
+            if model_cls.egfr_baseline_window is not None:
+                baseline_resolver = model_cls.make_egfr_baseline_resolver()
+                baseline_resolver.prefetch(subject_identifiers)
+            for obj in queryset:
+                if weight_resolver:
+                    obj._egfr_weight_resolver = weight_resolver
+                if baseline_resolver:
+                    obj._egfr_baseline_resolver = baseline_resolver
+                obj.save()
+                if baseline_resolver:
+                    baseline_resolver.update(
+                        obj.subject_visit.subject_identifier,
+                        obj.pk,
+                        obj.report_datetime,
+                        obj.egfr_value,
+                    )
+                count += 1
+    return count
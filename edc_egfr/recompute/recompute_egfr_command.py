@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.color import color_style
+
+from .checkpoint import RecomputeCheckpoint
+from .site_partitioned import recompute_egfr_by_site
+
+style = color_style()
+
+
+def recompute_egfr_command(
+    site_ids: list[int] | None = None,
+    max_workers: int | None = None,
+    chunk_size: int | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool | None = None,
+    memory_budget: int | None = None,
+) -> bool:
+    """Recomputes eGFR site by site and writes a report per site.
+
+    Progress is saved to `checkpoint_path` if given or if resuming.
+    If `resume`, rows already recomputed in an earlier run are
+    skipped. If a `memory_budget`, in bytes, is given, chunks are
+    resized to stay within it and the sizes and peak memory are
+    reported per site.
+
+    Returns True if all sites completed without errors.
+    """
+    checkpoint = None
+    if checkpoint_path or resume:
+        checkpoint = RecomputeCheckpoint(checkpoint_path, resume=resume)
+        verb = "Resuming from" if resume else "Saving progress to"
+        sys.stdout.write(f"{verb} checkpoint {checkpoint.path}\n")
+    sys.stdout.write(style.MIGRATE_HEADING("Recomputing eGFR by site ...\n"))
+    try:
+        results = recompute_egfr_by_site(
+            site_ids=site_ids,
+            max_workers=max_workers,
+            chunk_size=chunk_size,
+            checkpoint=checkpoint,
+            memory_budget=memory_budget,
+        )
+    finally:
+        if checkpoint:
+            checkpoint.close()
+    for site_id, result in results.items():
+        message = (
+            f"  * site {site_id}: {result.processed} processed, {result.failed} failed, "
+            f"notifications {result.notifications_before} -> {result.notifications_after} "
+            f"({result.elapsed:.1f}s)\n"
+        )
+        sys.stdout.write(style.SUCCESS(message) if result.ok else style.ERROR(message))
+        if result.batch_report:
+            sys.stdout.write(f"    {result.batch_report}\n")
+        for error in result.errors:
+            sys.stdout.write(style.ERROR(f"    - {error}\n"))
+    sys.stdout.write(style.MIGRATE_HEADING("Done\n"))
+    return all(result.ok for result in results.values())
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Type
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, transaction
+
+from ..batch_runner import AdaptiveBatchRunner
+from ..get_drop_notification_model import get_egfr_drop_notification_model_cls
+from ..read_database import get_egfr_read_database
+from .recompute import egfr_recompute_ordering, get_egfr_model_classes
+
+if TYPE_CHECKING:
+    from django.db import models
+
+    from ..batch_runner import BatchRunReport
+    from ..model_mixins import EgfrModelMixin
+    from .checkpoint import RecomputeCheckpoint
+
+
+@dataclass
+class SiteRecomputeResult:
+    site_id: int
+    processed: int = 0
+    failed: int = 0
+    notifications_before: int | None = None
+    notifications_after: int | None = None
+    elapsed: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    # chunk sizes and peak memory, if run with a memory budget
+    batch_report: BatchRunReport | None = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.errors
+
+
+def get_site_lookup(model_cls: Type[models.Model]) -> str:
+    """Returns the lookup for `site_id`, from the model or, if the
+    model has no `site` field, from its `subject_visit`.
+    """
+    try:
+        model_cls._meta.get_field("site")
+    except FieldDoesNotExist:
+        return "subject_visit__site_id"
+    return "site_id"
+
+
+def get_egfr_site_ids(model_classes: list[Type[EgfrModelMixin]] | None = None) -> list[int]:
+    """Returns the sorted site ids that have eGFR rows."""
+    site_ids = set()
+    for model_cls in model_classes or get_egfr_model_classes():
+        site_ids.update(
+            model_cls._default_manager.using(get_egfr_read_database())
+            .values_list(get_site_lookup(model_cls), flat=True)
+            .order_by()
+            .distinct()
+        )
+    return sorted(site_id for site_id in site_ids if site_id is not None)
+
+
+def get_site_queryset(
+    model_cls: Type[EgfrModelMixin],
+    site_id: int,
+    checkpoint: RecomputeCheckpoint | None = None,
+) -> models.QuerySet:
+    """Returns a queryset of the site's rows to recompute, ordered by
+    subject and report datetime and, if a `checkpoint` is given,
+    after the unit's watermark subject.
+    """
+    queryset = model_cls._default_manager.filter(
+        **{get_site_lookup(model_cls): site_id}, creatinine_value__isnull=False
+    ).order_by(*egfr_recompute_ordering)
+    if checkpoint:
+        watermark = checkpoint.get_watermark(model_cls._meta.label_lower, site_id)
+        if watermark is not None:
+            queryset = queryset.filter(subject_visit__subject_identifier__gt=watermark)
+    return queryset
+
+
+def get_chunk_end(subject_identifiers: list[str], start: int, chunk_size: int) -> int:
+    """Returns the end index of a chunk of at least `chunk_size` rows
+    from `start`, extended to the last row of its last subject.
+    """
+    end = min(start + chunk_size, len(subject_identifiers))
+    while end < len(subject_identifiers) and (
+        subject_identifiers[end] == subject_identifiers[end - 1]
+    ):
+        end += 1
+    return end
+
+
+def count_egfr_drop_notifications(site_id: int) -> int | None:
+    try:
+        model_cls = get_egfr_drop_notification_model_cls()
+    except (AttributeError, LookupError):
+        return None
+    return model_cls._default_manager.filter(**{get_site_lookup(model_cls): site_id}).count()
+
+
+def recompute_egfr_for_site(
+    site_id: int,
+    model_classes: list[Type[EgfrModelMixin]] | None = None,
+    chunk_size: int | None = None,
+    checkpoint: RecomputeCheckpoint | None = None,
+    memory_budget: int | None = None,
+) -> SiteRecomputeResult:
+    """Recomputes the eGFR rows of one site as an independent unit.
+
+    Rows are saved in chunks, each in its own short transaction.
+    A subject's rows are saved in order of report datetime, so that
+    a row is saved after its baseline, and are never split across
+    chunks. The rows to recompute are listed from
+    `EDC_EGFR_READ_DATABASE`, if set; rows are read for saving from
+    the primary.
+    Re-saving a row also creates or updates the site's drop
+    notifications. A failed chunk is rolled back and reported; the
+    remaining chunks are still processed.
+
+    If a `checkpoint` is given, only subjects after the unit's
+    watermark are recomputed and the status of each chunk is saved.
+
+    If a `memory_budget`, in bytes, is given, chunks start at
+    `chunk_size` rows and are resized by an `AdaptiveBatchRunner`.
+    A chunk may exceed its size by the rows of its last subject.
+    """
+    chunk_size = chunk_size or 500
+    result = SiteRecomputeResult(site_id=site_id)
+    runner = None
+    if memory_budget:
+        runner = AdaptiveBatchRunner(memory_budget, initial_chunk_size=chunk_size)
+        result.batch_report = runner.report
+    started = time.perf_counter()
+    result.notifications_before = count_egfr_drop_notifications(site_id)
+    for model_cls in model_classes or get_egfr_model_classes():
+        if checkpoint:
+            checkpoint.start_unit(model_cls._meta.label_lower, site_id)
+        queryset = get_site_queryset(model_cls, site_id, checkpoint)
+        rows = list(
+            queryset.using(get_egfr_read_database()).values_list(
+                "pk", "subject_visit__subject_identifier"
+            )
+        )
+        subject_identifiers = [subject_identifier for _, subject_identifier in rows]
+        index = 0
+        while index < len(rows):
+            end = get_chunk_end(
+                subject_identifiers, index, runner.chunk_size if runner else chunk_size
+            )
+            chunk = rows[index:end]
+            if runner:
+                with runner.measure(len(chunk)):
+                    _save_chunk(queryset, result, checkpoint, chunk)
+            else:
+                _save_chunk(queryset, result, checkpoint, chunk)
+            index = end
+    result.notifications_after = count_egfr_drop_notifications(site_id)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _save_chunk(
+    queryset: models.QuerySet,
+    result: SiteRecomputeResult,
+    checkpoint: RecomputeCheckpoint | None,
+    chunk: list[tuple[Any, str]],
+) -> None:
+    """Saves a chunk of (pk, subject identifier) rows in one
+    transaction, in the order of `queryset`.
+    """
+    label_lower = queryset.model._meta.label_lower
+    site_id = result.site_id
+    first, last = chunk[0][1], chunk[-1][1]
+    chunk_opts = dict(first=first, last=last, rows=len(chunk))
+    if checkpoint:
+        checkpoint.start_chunk(label_lower, site_id, **chunk_opts)
+    try:
+        with transaction.atomic():
+            pks = [pk for pk, _ in chunk]
+            for obj in queryset.filter(pk__in=pks).select_related("subject_visit"):
+                obj.save()
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+        result.failed += len(chunk)
+        result.errors.append(f"{label_lower} chunk {first}..{last}: {error}")
+        if checkpoint:
+            checkpoint.fail_chunk(label_lower, site_id, error=error, **chunk_opts)
+    else:
+        result.processed += len(chunk)
+        if checkpoint:
+            checkpoint.complete_chunk(label_lower, site_id, **chunk_opts)
+
+
+def recompute_egfr_by_site(
+    site_ids: list[int] | None = None,
+    model_classes: list[Type[EgfrModelMixin]] | None = None,
+    max_workers: int | None = None,
+    chunk_size: int | None = None,
+    checkpoint: RecomputeCheckpoint | None = None,
+    memory_budget: int | None = None,
+) -> dict[int, SiteRecomputeResult]:
+    """Recomputes eGFR rows site by site and returns a result per
+    site.
+
+    With more than one worker, sites are scheduled across a thread
+    pool, each worker using its own database connection. With one
+    worker, sites are processed in the calling thread.
+
+    `memory_budget`, in bytes, applies to each site; see
+    `recompute_egfr_for_site`. It needs a single worker, since peak
+    memory is measured for the whole process.
+    """
+    max_workers = max_workers or 1
+    if memory_budget and max_workers > 1:
+        raise ValueError(
+            "Invalid max_workers. A memory budget requires one worker. "
+            f"Got max_workers={max_workers}."
+        )
+    site_ids = site_ids or get_egfr_site_ids(model_classes)
+    results: dict[int, SiteRecomputeResult] = {}
+    if max_workers == 1:
+        for site_id in site_ids:
+            results[site_id] = recompute_egfr_for_site(
+                site_id, model_classes, chunk_size, checkpoint, memory_budget
+            )
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                site_id: executor.submit(
+                    _run_site_unit,
+                    site_id,
+                    model_classes,
+                    chunk_size,
+                    checkpoint,
+                    memory_budget,
+                )
+                for site_id in site_ids
+            }
+        for site_id, future in futures.items():
+            try:
+                results[site_id] = future.result()
+            except Exception as e:
+                results[site_id] = SiteRecomputeResult(
+                    site_id=site_id, errors=[f"{e.__class__.__name__}: {e}"]
+                )
+    return results
+
+
+def _run_site_unit(
+    site_id, model_classes, chunk_size, checkpoint, memory_budget
+) -> SiteRecomputeResult:
+    try:
+        return recompute_egfr_for_site(
+            site_id, model_classes, chunk_size, checkpoint, memory_budget
+        )
+    finally:
+        connections.close_all()
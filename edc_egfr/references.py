@@ -0,0 +1,132 @@
+"""Reference values and percent changes of eGFR results computed in
+SQL with window functions.
+
+For each result, the references are taken from the rows of the same
+subject and schedule, ordered by `report_datetime`:
+
+    baseline_egfr_value: at `baseline_timepoint`, `visit_code_sequence` 0
+    previous_egfr_value: the previous result
+    peak_egfr_value: the highest result up to and including this one
+    nadir_egfr_value: the lowest result up to and including this one
+
+`egfr_drop_from_<reference>` is the percent change from the
+reference as `egfr_percent_change` calculates it: positive for a
+drop, negative for a rise, None if there is no reference.
+
+Rows without an `egfr_value` are excluded. Filters applied before
+annotating restrict the history the references are taken from, so
+filter by subject or site first and by other fields afterwards.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.db import models
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    Max,
+    Min,
+    RowRange,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Cast, Lag, NullIf
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+references = ["baseline", "previous", "peak", "nadir"]
+
+partition_by = [
+    "subject_visit__subject_identifier",
+    "subject_visit__visit_schedule_name",
+    "subject_visit__schedule_name",
+]
+order_by = ["report_datetime", "pk"]
+
+
+def get_reference_expressions(baseline_timepoint: int) -> dict[str, Window]:
+    """Returns the window expressions of the reference eGFR values."""
+    partition = [F(name) for name in partition_by]
+    ordering = [F(name).asc() for name in order_by]
+    return dict(
+        baseline_egfr_value=Window(
+            Max(
+                Case(
+                    When(
+                        subject_visit__appointment__timepoint=baseline_timepoint,
+                        subject_visit__visit_code_sequence=0,
+                        then=F("egfr_value"),
+                    ),
+                )
+            ),
+            partition_by=partition,
+        ),
+        previous_egfr_value=Window(
+            Lag("egfr_value"), partition_by=partition, order_by=ordering
+        ),
+        peak_egfr_value=Window(
+            Max("egfr_value"),
+            partition_by=partition,
+            order_by=ordering,
+            frame=RowRange(start=None, end=0),
+        ),
+        nadir_egfr_value=Window(
+            Min("egfr_value"),
+            partition_by=partition,
+            order_by=ordering,
+            frame=RowRange(start=None, end=0),
+        ),
+    )
+
+
+def percent_change(reference: str) -> models.Expression:
+    """Returns the expression of the percent change of `egfr_value`
+    from the annotated reference value.
+    """
+    reference_value = NullIf(Cast(F(reference), FloatField()), Value(0.0))
+    return (
+        Value(100.0)
+        * (reference_value - Cast(F("egfr_value"), FloatField()))
+        / reference_value
+    )
+
+
+def annotate_egfr_references(
+    queryset: QuerySet, baseline_timepoint: int | None = None
+) -> QuerySet:
+    """Returns the queryset of an `EgfrModelMixin` model annotated
+    with reference eGFR values and the percent change from each.
+
+    `baseline_timepoint` defaults to the model's.
+    """
+    if baseline_timepoint is None:
+        baseline_timepoint = queryset.model.baseline_timepoint
+    return (
+        queryset.filter(egfr_value__isnull=False)
+        .annotate(**get_reference_expressions(baseline_timepoint))
+        .annotate(
+            **{
+                f"egfr_drop_from_{reference}": percent_change(f"{reference}_egfr_value")
+                for reference in references
+            }
+        )
+    )
+
+
+class EgfrQuerySetMixin:
+    """Declare with the QuerySet of an `EgfrModelMixin` model, e.g.:
+
+    class ResultQuerySet(EgfrQuerySetMixin, models.QuerySet):
+        pass
+    """
+
+    def with_egfr_references(self, baseline_timepoint: int | None = None) -> QuerySet:
+        """Returns the queryset annotated with reference eGFR values
+        and the percent change from each; see `annotate_egfr_references`.
+        """
+        return annotate_egfr_references(self, baseline_timepoint=baseline_timepoint)
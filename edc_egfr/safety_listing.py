@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, TextIO, Type
+
+from django.conf import settings
+from edc_utils import get_utcnow
+
+from .get_drop_notification_model import get_egfr_drop_notification_model_cls
+from .read_database import get_egfr_read_database
+from .recompute.recompute import get_egfr_model_classes
+
+if TYPE_CHECKING:
+    from django.db import models
+
+    from .model_mixins import EgfrDropNotificationModelMixin, EgfrModelMixin
+
+default_listing_state_path = "egfr_safety_listing.sqlite3"
+
+# {column: model field}
+result_columns = {
+    "subject_visit_id": "subject_visit_id",
+    "subject_identifier": "subject_visit__subject_identifier",
+    "visit_code": "subject_visit__visit_code",
+    "visit_code_sequence": "subject_visit__visit_code_sequence",
+    "report_datetime": "report_datetime",
+    "creatinine_value": "creatinine_value",
+    "creatinine_units": "creatinine_units",
+    "egfr_value": "egfr_value",
+    "egfr_grade": "egfr_grade",
+    "egfr_drop_value": "egfr_drop_value",
+    "egfr_drop_grade": "egfr_drop_grade",
+}
+notification_columns = {
+    "subject_visit_id": "subject_visit_id",
+    "report_status": "report_status",
+    "egfr_percent_change": "egfr_percent_change",
+}
+listing_fields = (
+    ["model", "id"]
+    + [name for name in result_columns if name != "subject_visit_id"]
+    + ["notification_id", "notification_report_status", "notification_egfr_percent_change"]
+)
+
+
+def get_listing_lag() -> int:
+    """Returns the number of seconds before the last `modified`
+    watermark from which rows are fetched again.
+
+    The overlap picks up rows saved, but not yet committed or
+    replicated, when the listing was last updated. Set
+    `EDC_EGFR_LISTING_LAG`, default 300.
+    """
+    return getattr(settings, "EDC_EGFR_LISTING_LAG", 300)
+
+
+def get_listing_sweep_interval() -> int | None:
+    """Returns the number of seconds after which `update()` sweeps
+    a model for deleted rows again, or None to sweep only when
+    asked to.
+
+    A sweep reads every primary key of the model, so runs in time
+    proportional to the table, not to the rows changed. Set
+    `EDC_EGFR_LISTING_SWEEP_INTERVAL`, default 86400 (a day).
+    """
+    return getattr(settings, "EDC_EGFR_LISTING_SWEEP_INTERVAL", 86400)
+
+
+@dataclass
+class ListingUpdate:
+    # {model: count}
+    fetched: dict[str, int] = field(default_factory=dict)
+    deleted: dict[str, int] = field(default_factory=dict)
+
+
+class EgfrSafetyListing:
+    """A listing of eGFR results, with their drop notification,
+    kept in a local SQLite file and updated incrementally.
+
+    On `update()`, only rows with a `modified` timestamp at or after
+    the last watermark, less `get_listing_lag()`, are fetched and
+    upserted. A deleted row has no `modified` timestamp, so deleted
+    rows are only removed by a sweep of all primary keys, run if
+    asked or every `get_listing_sweep_interval()` seconds. After a
+    sweep, the listing written is the same as if rebuilt from all
+    rows.
+
+    Lists rows graded at or above `min_grade`, or with a drop
+    notification. Set `min_grade` to None to list all rows.
+    """
+
+    min_grade: int | None = 3
+    chunk_size: int = 2000
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        model_classes: list[Type[EgfrModelMixin]] | None = None,
+        notification_model_cls: Type[EgfrDropNotificationModelMixin] | None = None,
+        rebuild: bool | None = None,
+    ):
+        self.path = str(path or default_listing_state_path)
+        self.model_classes = model_classes or get_egfr_model_classes()
+        self.notification_model_cls = (
+            notification_model_cls or get_egfr_drop_notification_model_cls()
+        )
+        self._connection = sqlite3.connect(self.path)
+        columns = ", ".join(f"{name} TEXT" for name in result_columns)
+        notification = ", ".join(f"{name} TEXT" for name in notification_columns)
+        with self._connection as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermark (model TEXT PRIMARY KEY, modified TEXT)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sweep (model TEXT PRIMARY KEY, swept TEXT)"
+            )
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS result (model TEXT, pk TEXT, {columns}, "
+                "PRIMARY KEY (model, pk))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS notification "
+                f"(pk TEXT PRIMARY KEY, {notification})"
+            )
+            connection.execute("CREATE TEMP TABLE live (pk TEXT PRIMARY KEY)")
+            if rebuild:
+                connection.execute("DELETE FROM watermark")
+                connection.execute("DELETE FROM sweep")
+                connection.execute("DELETE FROM result")
+                connection.execute("DELETE FROM notification")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path})"
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_watermark(self, model: str) -> datetime | None:
+        row = self._connection.execute(
+            "SELECT modified FROM watermark WHERE model=?", (model,)
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def get_last_sweep(self, model: str) -> datetime | None:
+        row = self._connection.execute(
+            "SELECT swept FROM sweep WHERE model=?", (model,)
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def update(self, sweep: bool | None = None) -> ListingUpdate:
+        """Fetches rows changed since the last update into the
+        listing state. Each model is updated in one SQLite
+        transaction together with its watermark.
+
+        If `sweep` is True, also removes rows deleted from the
+        database; if None, only if the last sweep of the model is
+        older than `get_listing_sweep_interval()`.
+        """
+        summary = ListingUpdate()
+        for model_cls in self.model_classes:
+            self._update_model(
+                model_cls, "result", result_columns, get_listing_lag(), sweep, summary
+            )
+        self._update_model(
+            self.notification_model_cls,
+            "notification",
+            notification_columns,
+            get_listing_lag(),
+            sweep,
+            summary,
+        )
+        return summary
+
+    def _sweep_due(self, label: str) -> bool:
+        interval = get_listing_sweep_interval()
+        last_sweep = self.get_last_sweep(label)
+        return interval is not None and (
+            not last_sweep or get_utcnow() - last_sweep >= timedelta(seconds=interval)
+        )
+
+    def _update_model(
+        self,
+        model_cls: Type[models.Model],
+        table: str,
+        columns: dict[str, str],
+        lag: int,
+        sweep: bool | None,
+        summary: ListingUpdate,
+    ) -> None:
+        label = model_cls._meta.label_lower
+        queryset = model_cls._default_manager.using(get_egfr_read_database())
+        watermark = last_modified = self.get_watermark(label)
+        changed = queryset
+        if watermark:
+            changed = queryset.filter(modified__gte=watermark - timedelta(seconds=lag))
+        model = [label] if table == "result" else []
+        placeholders = ", ".join("?" * (len(model) + len(columns) + 1))
+        sql = f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})"
+        count = 0
+        started = get_utcnow()
+        with self._connection as connection:
+            rows = []
+            for row in (
+                changed.values_list("pk", "modified", *columns.values())
+                .order_by()
+                .iterator(chunk_size=self.chunk_size)
+            ):
+                last_modified = max(last_modified or row[1], row[1])
+                rows.append(tuple(model) + (str(row[0]),) + tuple(map(_to_stored, row[2:])))
+                if len(rows) == self.chunk_size:
+                    connection.executemany(sql, rows)
+                    count, rows = count + len(rows), []
+            connection.executemany(sql, rows)
+            summary.fetched[label] = count + len(rows)
+            summary.deleted[label] = 0
+            if not watermark or sweep or (sweep is None and self._sweep_due(label)):
+                # all rows were fetched if there was no watermark, so
+                # nothing is missing
+                if watermark:
+                    summary.deleted[label] = self._delete_missing(
+                        connection, queryset, table, model
+                    )
+                connection.execute(
+                    "INSERT OR REPLACE INTO sweep VALUES (?, ?)", (label, _to_stored(started))
+                )
+            if last_modified:
+                connection.execute(
+                    "INSERT OR REPLACE INTO watermark VALUES (?, ?)",
+                    (label, _to_stored(last_modified)),
+                )
+
+    def _delete_missing(self, connection, queryset, table: str, model: list[str]) -> int:
+        connection.execute("DELETE FROM live")
+        pks = []
+        for pk in queryset.values_list("pk", flat=True).order_by().iterator(self.chunk_size):
+            pks.append((str(pk),))
+            if len(pks) == self.chunk_size:
+                connection.executemany("INSERT INTO live VALUES (?)", pks)
+                pks = []
+        connection.executemany("INSERT INTO live VALUES (?)", pks)
+        where = "model=? AND " if model else ""
+        return connection.execute(
+            f"DELETE FROM {table} WHERE {where}pk NOT IN (SELECT pk FROM live)", model
+        ).rowcount
+
+    def get_rows(self) -> Iterator[dict[str, Any]]:
+        """Yields the listing, a dictionary per row, ordered by
+        subject and visit.
+        """
+        columns = [f"r.{name}" for name in result_columns if name != "subject_visit_id"]
+        sql = (
+            f"SELECT r.model, r.pk, {', '.join(columns)}, "
+            "n.pk, n.report_status, n.egfr_percent_change "
+            "FROM result r LEFT JOIN notification n ON n.subject_visit_id=r.subject_visit_id"
+        )
+        params: tuple = ()
+        if self.min_grade is not None:
+            sql += (
+                " WHERE CAST(r.egfr_grade AS INTEGER)>=? "
+                "OR CAST(r.egfr_drop_grade AS INTEGER)>=? OR n.pk IS NOT NULL"
+            )
+            params = (self.min_grade, self.min_grade)
+        sql += (
+            " ORDER BY r.subject_identifier, r.visit_code, "
+            "CAST(r.visit_code_sequence AS INTEGER), r.report_datetime, r.model, r.pk"
+        )
+        for row in self._connection.execute(sql, params):
+            yield dict(zip(listing_fields, row))
+
+    def write_csv(self, output: TextIO) -> int:
+        """Writes the listing as CSV and returns the number of rows."""
+        writer = csv.DictWriter(output, fieldnames=listing_fields)
+        writer.writeheader()
+        count = 0
+        for count, row in enumerate(self.get_rows(), 1):
+            writer.writerow(row)
+        return count
+
+
+def _to_stored(value: Any) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return str(value)
@@ -0,0 +1,47 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from edc_registration.models import RegisteredSubject
+
+from .notification_executor import shutdown_egfr_notification_executor
+from .recompute import queue_egfr_recompute
+
+EGFR_DEMOGRAPHIC_FIELDS = ("dob", "gender", "ethnicity")
+
+
+def get_egfr_demographics(instance) -> tuple:
+    # read from __dict__ so that deferred fields are not fetched
+    return tuple(instance.__dict__.get(f) for f in EGFR_DEMOGRAPHIC_FIELDS)
+
+
+@receiver(
+    post_init,
+    sender=RegisteredSubject,
+    weak=False,
+    dispatch_uid="track_egfr_demographics_on_post_init",
+)
+def track_egfr_demographics_on_post_init(sender, instance, **kwargs):
+    instance._egfr_demographics = get_egfr_demographics(instance)
+
+
+@receiver(
+    post_save,
+    sender=RegisteredSubject,
+    weak=False,
+    dispatch_uid="queue_egfr_recompute_on_post_save",
+)
+def queue_egfr_recompute_on_post_save(sender, instance, raw, created, using, **kwargs):
+    """Queues a recompute of this subject's eGFR rows if dob, gender
+    or ethnicity changed.
+    """
+    if not raw and not created:
+        demographics = get_egfr_demographics(instance)
+        if demographics != getattr(instance, "_egfr_demographics", demographics):
+            queue_egfr_recompute(instance.subject_identifier, using=using)
+        instance._egfr_demographics = demographics
+
+
+@receiver(setting_changed, weak=False, dispatch_uid="reset_egfr_notification_executor")
+def reset_egfr_notification_executor(sender, setting, **kwargs):
+    if setting.startswith("EDC_EGFR_DROP_NOTIFICATION_EXECUTOR"):
+        shutdown_egfr_notification_executor()
@@ -0,0 +1,114 @@
+"""KDIGO CKD stages (G1-G5) by eGFR (mL/min/1.73 m2).
+
+    G1    >= 90
+    G2    60 - <90
+    G3a   45 - <60
+    G3b   30 - <45
+    G4    15 - <30
+    G5    < 15
+
+Stages are classified against sorted lower boundaries, with a scalar
+entry point, an array entry point (requires numpy) for use after the
+batch calculators, and a `Case/When` expression to annotate a
+queryset.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from math import isnan
+from typing import TYPE_CHECKING
+
+from django.db.models import CharField, Count, Q, QuerySet, Value
+from django.db.models.expressions import Case, When
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import ArrayLike
+
+G1 = "G1"
+G2 = "G2"
+G3A = "G3a"
+G3B = "G3b"
+G4 = "G4"
+G5 = "G5"
+
+# lower boundary of each stage, G4 upwards, in ascending order
+ckd_stage_boundaries = [15.0, 30.0, 45.0, 60.0, 90.0]
+# from lowest to highest eGFR
+ckd_stages = [G5, G4, G3B, G3A, G2, G1]
+
+
+def get_ckd_stage(egfr_value: float | None) -> str | None:
+    """Returns the CKD stage for an eGFR value or None."""
+    if egfr_value is None or isnan(float(egfr_value)):
+        return None
+    return ckd_stages[bisect_right(ckd_stage_boundaries, float(egfr_value))]
+
+
+def get_ckd_stage_indexes(egfr_values: ArrayLike) -> np.ndarray:
+    """Returns an int8 array of indexes into `ckd_stages`, -1 where
+    the eGFR value is missing.
+    """
+    import numpy as np
+
+    values = np.asarray(egfr_values, dtype=np.float64)
+    indexes = np.searchsorted(ckd_stage_boundaries, values, side="right").astype(np.int8)
+    indexes[np.isnan(values)] = -1
+    return indexes
+
+
+def get_ckd_stages(egfr_values: ArrayLike) -> np.ndarray:
+    """Returns an object array of CKD stages, None where the eGFR
+    value is missing.
+    """
+    import numpy as np
+
+    labels = np.array(ckd_stages + [None], dtype=object)
+    return labels[get_ckd_stage_indexes(egfr_values)]
+
+
+def count_ckd_stages(egfr_values: ArrayLike) -> dict[str | None, int]:
+    """Returns {stage: count} for all stages, with None counting
+    missing values.
+    """
+    import numpy as np
+
+    counts = np.bincount(get_ckd_stage_indexes(egfr_values) + 1, minlength=len(ckd_stages) + 1)
+    return {None: int(counts[0]), **{s: int(c) for s, c in zip(ckd_stages, counts[1:])}}
+
+
+def ckd_stage_expression(field_name: str | None = None) -> Case:
+    """Returns a `Case` expression of the CKD stage of `field_name`,
+    default "egfr_value", or NULL.
+    """
+    field_name = field_name or "egfr_value"
+    whens = [
+        When(Q(**{f"{field_name}__lt": boundary}), then=Value(stage))
+        for boundary, stage in zip(ckd_stage_boundaries, ckd_stages)
+    ]
+    return Case(
+        *whens,
+        When(
+            Q(**{f"{field_name}__gte": ckd_stage_boundaries[-1]}), then=Value(ckd_stages[-1])
+        ),
+        default=None,
+        output_field=CharField(max_length=3),
+    )
+
+
+def count_ckd_stages_by(
+    queryset: QuerySet, *group_by: str, field_name: str | None = None
+) -> QuerySet:
+    """Returns a values queryset of {*group_by, "ckd_stage", "count"}
+    in one query, e.g.:
+
+        count_ckd_stages_by(ResultCrf.objects.all(), "subject_visit__visit_code")
+    """
+    group_by = group_by or ("subject_visit__visit_code",)
+    return (
+        queryset.annotate(ckd_stage=ckd_stage_expression(field_name))
+        .values(*group_by, "ckd_stage")
+        .annotate(count=Count("pk"))
+        .order_by(*group_by, "ckd_stage")
+    )
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, NamedTuple
+from zoneinfo import ZoneInfo
+
+from edc_reportable import BoundariesOverlap, NotEvaluated
+from edc_reportable.units import EGFR_UNITS, PERCENT
+
+from .calculators import EgfrCalculatorError, egfr_percent_change
+from .egfr import Egfr, EgfrError
+from .grading import get_compiled_grading_table
+
+
+class SubjectEgfrResult(NamedTuple):
+    egfr_value: float | None
+    egfr_grade: int | None
+    egfr_drop_value: float | None
+    egfr_drop_grade: int | None
+    error: str | None = None
+
+
+class SubjectEgfr:
+    """Evaluates many creatinine results of one subject.
+
+    The formula, demographics, baseline and grading tables are
+    resolved once. Each result is then calculated as `Egfr` would,
+    without the per-instance set up. No drop notification is
+    created.
+
+        subject_egfr = SubjectEgfr(
+            gender=MALE,
+            ethnicity=BLACK,
+            dob=dob,
+            formula_name="ckd-epi",
+            reference_range_collection_name="my_reference_list",
+            baseline_egfr_value=98.1,
+        )
+        results = subject_egfr.evaluate_many(
+            [(report_datetime, 53.0, MICROMOLES_PER_LITER, None), ...]
+        )
+    """
+
+    calculators: dict = Egfr.calculators
+
+    def __init__(
+        self,
+        gender: str | None = None,
+        ethnicity: str | None = None,
+        dob: date | None = None,
+        age_in_years: int | None = None,
+        formula_name: str | None = None,
+        reference_range_collection_name: str | None = None,
+        baseline_egfr_value: Decimal | float | None = None,
+    ):
+        if formula_name not in self.calculators:
+            raise EgfrError(
+                f"Invalid formula_name. Expected one of {list(self.calculators.keys())}. "
+                f"Got {formula_name}."
+            )
+        if not dob and not age_in_years:
+            raise EgfrError("Expected `age_in_years` or `dob`. Got None for both.")
+        self.calculator_cls = self.calculators.get(formula_name)
+        self.gender = gender
+        self.ethnicity = ethnicity
+        self.dob = dob
+        self.age_in_years = age_in_years
+        self.baseline_egfr_value = float(baseline_egfr_value) if baseline_egfr_value else None
+        self.egfr_grading_table = get_compiled_grading_table(
+            reference_range_collection_name, "egfr"
+        )
+        self.egfr_drop_grading_table = get_compiled_grading_table(
+            reference_range_collection_name, "egfr_drop"
+        )
+        # {report date: age in years}
+        self._ages: dict[date, int] = {}
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(gender={self.gender}, "
+            f"calculator={self.calculator_cls.__name__})"
+        )
+
+    def get_age_in_years(self, report_datetime: datetime) -> int:
+        """Returns age in completed years at the UTC report date, as
+        `edc_utils.age(...).years`.
+        """
+        if not self.dob:
+            return self.age_in_years
+        report_date = report_datetime.astimezone(ZoneInfo("UTC")).date()
+        try:
+            return self._ages[report_date]
+        except KeyError:
+            dob_day = self.dob.day
+            # as with `relativedelta`, 29 Feb falls on 28 Feb in a non-leap year
+            if (self.dob.month, dob_day) == (2, 29) and not _is_leap(report_date.year):
+                dob_day = 28
+            age_in_years = self._ages[report_date] = (
+                report_date.year
+                - self.dob.year
+                - ((report_date.month, report_date.day) < (self.dob.month, dob_day))
+            )
+            return age_in_years
+
+    def evaluate(
+        self,
+        report_datetime: datetime,
+        creatinine_value: Decimal | float | None,
+        creatinine_units: str | None,
+        weight_in_kgs: Decimal | float | None = None,
+    ) -> SubjectEgfrResult:
+        """Returns the result of one creatinine value or raises
+        `EgfrCalculatorError`, or, if the value cannot be graded,
+        `NotEvaluated` or `BoundariesOverlap` as `Egfr` would.
+        """
+        age_in_years = self.get_age_in_years(report_datetime)
+        egfr_value = self.calculator_cls(
+            gender=self.gender,
+            ethnicity=self.ethnicity,
+            age_in_years=age_in_years,
+            creatinine_value=creatinine_value,
+            creatinine_units=creatinine_units,
+            weight=weight_in_kgs,
+        ).value
+        egfr_drop_value = 0.0
+        if self.baseline_egfr_value:
+            egfr_drop_value = max(
+                egfr_percent_change(float(egfr_value), self.baseline_egfr_value), 0.0
+            )
+        return SubjectEgfrResult(
+            egfr_value=egfr_value,
+            egfr_grade=self.egfr_grading_table.get_grade(
+                egfr_value, self.gender, age_in_years, EGFR_UNITS, strict=True
+            ),
+            egfr_drop_value=egfr_drop_value,
+            egfr_drop_grade=self.egfr_drop_grading_table.get_grade(
+                egfr_drop_value, self.gender, age_in_years, PERCENT, strict=True
+            ),
+        )
+
+    def evaluate_many(
+        self, rows: Iterable[tuple[datetime, Decimal | float | None, str | None, Any]]
+    ) -> list[SubjectEgfrResult]:
+        """Returns a result for each (report_datetime,
+        creatinine_value, creatinine_units, weight_in_kgs), in order.
+
+        A row that cannot be calculated has None values and the
+        error message.
+        """
+        results = []
+        for report_datetime, creatinine_value, creatinine_units, weight_in_kgs in rows:
+            try:
+                result = self.evaluate(
+                    report_datetime, creatinine_value, creatinine_units, weight_in_kgs
+                )
+            except (EgfrCalculatorError, NotEvaluated, BoundariesOverlap) as e:
+                result = SubjectEgfrResult(None, None, None, None, error=str(e))
+            results.append(result)
+        return results
+
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
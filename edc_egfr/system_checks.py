@@ -0,0 +1,42 @@
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.checks import Error, Warning
+
+
+def egfr_drop_notification_model_check(app_configs, **kwargs):
+    """Checks `EDC_EGFR_DROP_NOTIFICATION_MODEL` names an installed
+    model declared with `EgfrDropNotificationModelMixin`.
+    """
+    from .model_mixins import EgfrDropNotificationModelMixin
+
+    errors = []
+    model = getattr(settings, "EDC_EGFR_DROP_NOTIFICATION_MODEL", None)
+    if not model:
+        errors.append(
+            Warning(
+                "Setting EDC_EGFR_DROP_NOTIFICATION_MODEL is not set. eGFR drop "
+                "notifications cannot be created.",
+                hint="Set it to the label of your eGFR drop notification model.",
+                id="edc_egfr.W001",
+            )
+        )
+        return errors
+    try:
+        model_cls = django_apps.get_model(model)
+    except (LookupError, ValueError) as e:
+        errors.append(
+            Error(
+                f"Invalid EDC_EGFR_DROP_NOTIFICATION_MODEL. {e} Got {model}.",
+                id="edc_egfr.E001",
+            )
+        )
+    else:
+        if not issubclass(model_cls, EgfrDropNotificationModelMixin):
+            errors.append(
+                Error(
+                    "Invalid EDC_EGFR_DROP_NOTIFICATION_MODEL. Expected a model declared "
+                    f"with EgfrDropNotificationModelMixin. Got {model}.",
+                    id="edc_egfr.E002",
+                )
+            )
+    return errors
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from edc_appointment.constants import SCHEDULED_APPT, UNSCHEDULED_APPT
+from edc_appointment.models import Appointment
+from edc_constants.constants import BLACK, MALE
+from edc_lab.models import Panel
+from edc_lab_panel.panels import rft_panel
+from edc_registration.models import RegisteredSubject
+from edc_reportable import MICROMOLES_PER_LITER
+from edc_utils import get_utcnow
+from edc_visit_tracking.constants import SCHEDULED, UNSCHEDULED
+
+from egfr_app.models import ResultCrf, SubjectRequisition, SubjectVisit
+
+visit_codes = {0: "1000", 1: "2000", 2: "3000", 3: "4000"}
+
+
+class Helper:
+    """Creates subjects, visits and result CRFs for the
+    `egfr_app` visit schedule.
+    """
+
+    def __init__(self, base_datetime: datetime | None = None):
+        self.base_datetime = base_datetime or get_utcnow() - relativedelta(days=10)
+
+    @staticmethod
+    def make_registered_subject(
+        subject_identifier: str,
+        gender: str | None = None,
+        age_in_years: int | None = None,
+        ethnicity: str | None = None,
+        site_id: int | None = None,
+    ) -> RegisteredSubject:
+        opts = dict(site_id=site_id) if site_id else {}
+        return RegisteredSubject.objects.create(
+            subject_identifier=subject_identifier,
+            gender=gender or MALE,
+            dob=(get_utcnow() - relativedelta(years=age_in_years or 30)).date(),
+            ethnicity=ethnicity or BLACK,
+            **opts,
+        )
+
+    def make_subject_visit(
+        self,
+        subject_identifier: str,
+        timepoint: int = 0,
+        visit_code_sequence: int = 0,
+        report_datetime: datetime | None = None,
+        site_id: int | None = None,
+        appt_datetime: datetime | None = None,
+    ) -> SubjectVisit:
+        report_datetime = report_datetime or (
+            self.base_datetime + relativedelta(days=timepoint, hours=visit_code_sequence)
+        )
+        opts = dict(site_id=site_id) if site_id else {}
+        appointment = Appointment.objects.create(
+            subject_identifier=subject_identifier,
+            appt_datetime=appt_datetime or report_datetime,
+            timepoint=timepoint,
+            visit_code=visit_codes[timepoint],
+            visit_code_sequence=visit_code_sequence,
+            visit_schedule_name="visit_schedule",
+            schedule_name="schedule",
+            appt_reason=UNSCHEDULED_APPT if visit_code_sequence else SCHEDULED_APPT,
+            **opts,
+        )
+        return SubjectVisit.objects.create(
+            subject_identifier=subject_identifier,
+            appointment=appointment,
+            report_datetime=report_datetime,
+            visit_code=visit_codes[timepoint],
+            visit_code_sequence=visit_code_sequence,
+            visit_schedule_name="visit_schedule",
+            schedule_name="schedule",
+            reason=UNSCHEDULED if visit_code_sequence else SCHEDULED,
+            **opts,
+        )
+
+    @staticmethod
+    def make_result_crf(
+        subject_visit: SubjectVisit,
+        creatinine_value: float | Decimal | None = 53,
+        creatinine_units: str | None = MICROMOLES_PER_LITER,
+    ) -> ResultCrf:
+        requisition = SubjectRequisition.objects.create(
+            subject_identifier=subject_visit.subject_identifier,
+            subject_visit=subject_visit,
+            report_datetime=subject_visit.report_datetime,
+            panel=Panel.objects.get(name=rft_panel.name),
+        )
+        return ResultCrf.objects.create(
+            subject_visit=subject_visit,
+            requisition=requisition,
+            report_datetime=subject_visit.report_datetime,
+            assay_datetime=subject_visit.report_datetime,
+            creatinine_value=creatinine_value,
+            creatinine_units=creatinine_units,
+        )
@@ -0,0 +1,171 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+from edc_appointment.constants import SCHEDULED_APPT
+from edc_appointment.models import Appointment
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.baseline_resolver import BaselineEgfrResolver
+from edc_egfr.calculators import egfr_percent_change
+from edc_egfr.recompute import recompute_egfr_for_subjects
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+@patch.object(ResultCrf, "baseline_timepoint", 1)
+class TestBaselineResolver(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        self.crfs = {}
+        for subject_identifier in ["1234", "5678"]:
+            self.helper.make_registered_subject(subject_identifier)
+            # results at timepoint 0 and its unscheduled visit
+            self.crfs[subject_identifier] = [
+                self.helper.make_result_crf(
+                    self.helper.make_subject_visit(
+                        subject_identifier, timepoint=0, visit_code_sequence=sequence
+                    ),
+                    creatinine_value=creatinine_value,
+                )
+                for sequence, creatinine_value in [(0, 53), (1, 60)]
+            ]
+        # the baseline visit (timepoint 1) is missing
+        self.baseline_datetime = self.helper.base_datetime + relativedelta(days=1)
+        Appointment.objects.create(
+            subject_identifier="1234",
+            appt_datetime=self.baseline_datetime,
+            timepoint=1,
+            visit_code="2000",
+            visit_code_sequence=0,
+            visit_schedule_name="visit_schedule",
+            schedule_name="schedule",
+            appt_reason=SCHEDULED_APPT,
+        )
+
+    def test_latest_at_or_before(self):
+        resolver = BaselineEgfrResolver("egfr_app.resultcrf")
+        crf0, crf1 = self.crfs["1234"]
+        self.assertEqual(
+            resolver.get_egfr_value("1234", self.baseline_datetime), crf1.egfr_value
+        )
+        self.assertEqual(
+            resolver.get_egfr_value("1234", crf1.report_datetime), crf1.egfr_value
+        )
+        self.assertEqual(
+            resolver.get_egfr_value("1234", crf1.report_datetime - timedelta(seconds=1)),
+            crf0.egfr_value,
+        )
+        self.assertIsNone(
+            resolver.get_egfr_value("1234", crf0.report_datetime - timedelta(seconds=1))
+        )
+
+    def test_window(self):
+        resolver = BaselineEgfrResolver("egfr_app.resultcrf", window=timedelta(hours=1))
+        crf1 = self.crfs["1234"][1]
+        self.assertIsNone(resolver.get_egfr_value("1234", self.baseline_datetime))
+        self.assertEqual(
+            resolver.get_egfr_value("1234", crf1.report_datetime + timedelta(minutes=30)),
+            crf1.egfr_value,
+        )
+
+    def test_prefetch_with_one_query(self):
+        resolver = BaselineEgfrResolver("egfr_app.resultcrf")
+        with self.assertNumQueries(1):
+            resolver.prefetch(["1234", "5678", "9999"])
+            for subject_identifier in ["1234", "5678", "9999"]:
+                resolver.get_egfr_value(subject_identifier, self.baseline_datetime)
+        self.assertIsNone(resolver.get_egfr_value("9999", self.baseline_datetime))
+
+    def test_update(self):
+        resolver = BaselineEgfrResolver("egfr_app.resultcrf")
+        resolver.prefetch(["1234"])
+        crf1 = self.crfs["1234"][1]
+        resolver.update("1234", crf1.pk, crf1.report_datetime, 99.0)
+        self.assertEqual(resolver.get_egfr_value("1234", self.baseline_datetime), 99.0)
+        resolver.update("1234", crf1.pk, crf1.report_datetime, None)
+        self.assertEqual(
+            resolver.get_egfr_value("1234", self.baseline_datetime),
+            self.crfs["1234"][0].egfr_value,
+        )
+
+    def test_model_mixin_as_of_baseline(self):
+        subject_visit = self.helper.make_subject_visit("1234", timepoint=2)
+        crf = self.helper.make_result_crf(subject_visit, creatinine_value=150)
+        # timepoint baseline visit is missing
+        self.assertIsNone(crf.get_baseline_egfr_value())
+        self.assertEqual(crf.egfr_drop_value, 0)
+        with patch.object(ResultCrf, "egfr_baseline_window", timedelta(days=30)):
+            baseline_egfr_value = self.crfs["1234"][1].egfr_value
+            self.assertEqual(crf.get_egfr_baseline_datetime(), self.baseline_datetime)
+            self.assertEqual(crf.get_baseline_egfr_value(), baseline_egfr_value)
+            crf.save()
+            crf.refresh_from_db()
+            self.assertAlmostEqual(
+                float(crf.egfr_drop_value),
+                egfr_percent_change(float(crf.egfr_value), float(baseline_egfr_value)),
+                places=3,
+            )
+            # no baseline appointment
+            other_crf = self.helper.make_result_crf(
+                self.helper.make_subject_visit("5678", timepoint=2), creatinine_value=150
+            )
+            self.assertIsNone(other_crf.get_egfr_baseline_datetime())
+            self.assertIsNone(other_crf.get_baseline_egfr_value())
+        with patch.object(ResultCrf, "egfr_baseline_window", timedelta(hours=1)):
+            self.assertIsNone(crf.get_baseline_egfr_value())
+
+    def test_baseline_datetime_is_visit_report_datetime(self):
+        appt_datetime = self.helper.base_datetime + relativedelta(days=1)
+        baseline_visit = self.helper.make_subject_visit(
+            "5678",
+            timepoint=1,
+            report_datetime=appt_datetime + relativedelta(hours=2),
+            appt_datetime=appt_datetime,
+        )
+        baseline_crf = self.helper.make_result_crf(baseline_visit, creatinine_value=80)
+        crf = self.helper.make_result_crf(
+            self.helper.make_subject_visit("5678", timepoint=2), creatinine_value=150
+        )
+        self.assertEqual(crf.get_egfr_baseline_datetime(), baseline_visit.report_datetime)
+        with patch.object(ResultCrf, "egfr_baseline_window", timedelta(days=30)):
+            # not the result before the appointment datetime
+            self.assertNotEqual(baseline_crf.egfr_value, self.crfs["5678"][1].egfr_value)
+            self.assertEqual(crf.get_baseline_egfr_value(), baseline_crf.egfr_value)
+
+    def test_recompute_uses_prefetched_resolver(self):
+        self.helper.make_result_crf(
+            self.helper.make_subject_visit("1234", timepoint=2), creatinine_value=150
+        )
+        with patch.object(ResultCrf, "egfr_baseline_window", timedelta(days=30)):
+            with patch.object(
+                BaselineEgfrResolver,
+                "prefetch",
+                autospec=True,
+                side_effect=BaselineEgfrResolver.prefetch,
+            ) as prefetch:
+                self.assertEqual(recompute_egfr_for_subjects(["1234"]), 3)
+            self.assertEqual(prefetch.call_count, 1)
+        crf = ResultCrf.objects.get(
+            subject_visit__subject_identifier="1234", subject_visit__visit_code="3000"
+        )
+        self.assertGreater(crf.egfr_drop_value, 0)
@@ -0,0 +1,166 @@
+from itertools import product
+from unittest import skipIf
+
+from django.test import TestCase
+from edc_constants.constants import BLACK, FEMALE, MALE, NON_BLACK
+from edc_reportable import MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER
+from edc_reportable.units import GRAMS_PER_DECILITER
+
+from edc_egfr.calculators import EgfrCkdEpi, EgfrCockcroftGault
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from edc_egfr.calculators import batch
+
+
+@skipIf(np is None, "numpy not installed")
+class TestBatch(TestCase):
+    def setUp(self):
+        names = [
+            "gender",
+            "age_in_years",
+            "creatinine_value",
+            "creatinine_units",
+            "ethnicity",
+            "weight",
+        ]
+        self.rows = [
+            dict(zip(names, values))
+            for values in product(
+                [MALE, FEMALE, "UNKNOWN", None],
+                [17, 25, None],
+                [53.0, 0, None],
+                [MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER, GRAMS_PER_DECILITER, None],
+                [BLACK, NON_BLACK, None],
+                [65.0, None],
+            )
+        ]
+
+    def test_error_codes(self):
+        result = batch.evaluate_rows(
+            "ckd-epi",
+            [
+                dict(
+                    gender=MALE,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    ethnicity=BLACK,
+                ),
+                dict(
+                    gender=None,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    ethnicity=BLACK,
+                ),
+                dict(
+                    gender=MALE,
+                    age_in_years=17,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    ethnicity=BLACK,
+                ),
+                dict(
+                    gender=MALE,
+                    age_in_years=25,
+                    creatinine_value=None,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    ethnicity=BLACK,
+                ),
+                dict(
+                    gender=MALE,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=GRAMS_PER_DECILITER,
+                    ethnicity=BLACK,
+                ),
+                dict(
+                    gender=MALE,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    ethnicity=None,
+                ),
+            ],
+        )
+        self.assertEqual(result.error_codes.dtype, np.uint8)
+        self.assertEqual(
+            result.error_codes.tolist(),
+            [
+                batch.OK,
+                batch.INVALID_GENDER,
+                batch.INVALID_AGE,
+                batch.MISSING_CREATININE,
+                batch.CREATININE_UNITS_NOT_HANDLED,
+                batch.MISSING_ETHNICITY,
+            ],
+        )
+        self.assertFalse(np.isnan(result.values[0]))
+        self.assertTrue(np.isnan(result.values[1:]).all())
+
+    def test_missing_weight(self):
+        result = batch.evaluate_rows(
+            "cockcroft-gault",
+            [
+                dict(
+                    gender=FEMALE,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    weight=65.0,
+                ),
+                dict(
+                    gender=FEMALE,
+                    age_in_years=25,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                    weight=None,
+                ),
+            ],
+        )
+        self.assertEqual(result.error_codes.tolist(), [batch.OK, batch.MISSING_WEIGHT])
+
+    def test_matches_scalar_calculators(self):
+        for formula_name, calculator_cls in [
+            ("ckd-epi", EgfrCkdEpi),
+            ("cockcroft-gault", EgfrCockcroftGault),
+        ]:
+            with self.subTest(formula_name=formula_name):
+                result = batch.evaluate_rows(formula_name, self.rows)
+                for row, code, value in zip(self.rows, result.error_codes, result.values):
+                    try:
+                        expected = calculator_cls(**row).value
+                    except Exception:
+                        self.assertNotEqual(code, batch.OK, msg=row)
+                        self.assertTrue(np.isnan(value), msg=row)
+                    else:
+                        self.assertEqual(code, batch.OK, msg=row)
+                        self.assertEqual(value, expected, msg=row)
+
+    def test_error_report(self):
+        result = batch.evaluate_rows("ckd-epi", self.rows)
+        report = result.error_report
+        self.assertEqual(report.total, len(self.rows))
+        self.assertEqual(sum(report.counts.values()), len(self.rows))
+        self.assertEqual(
+            report.failed, len(self.rows) - report.counts[batch.error_reasons[batch.OK]]
+        )
+        self.assertEqual(
+            report.counts[batch.error_reasons[batch.INVALID_GENDER]], len(self.rows) // 2
+        )
+        reasons = [reason for reason, _ in report.as_rows()]
+        self.assertNotIn(batch.error_reasons[batch.OK], reasons)
+        self.assertEqual(reasons[0], batch.error_reasons[batch.INVALID_GENDER])
+
+    def test_error_report_merge(self):
+        report = batch.evaluate_rows("ckd-epi", self.rows[:10]).error_report.merge(
+            batch.evaluate_rows("ckd-epi", self.rows[10:]).error_report
+        )
+        self.assertEqual(report, batch.evaluate_rows("ckd-epi", self.rows).error_report)
+
+    def test_invalid_formula_name_raises(self):
+        self.assertRaises(ValueError, batch.evaluate_rows, "blah", self.rows)
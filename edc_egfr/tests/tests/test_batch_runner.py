@@ -0,0 +1,66 @@
+import tracemalloc
+
+from django.test import SimpleTestCase
+
+from edc_egfr.batch_runner import MB, AdaptiveBatchRunner, traced_peak
+
+row_bytes = 10_000
+
+
+def process(chunk):
+    return [bytearray(row_bytes) for _ in chunk]
+
+
+class TestBatchRunner(SimpleTestCase):
+    def test_grows_within_budget(self):
+        runner = AdaptiveBatchRunner(memory_budget=MB, initial_chunk_size=10)
+        report = runner.run(list(range(2000)), process)
+        self.assertEqual(report.rows, 2000)
+        self.assertEqual(report.chunk_sizes[:3], [10, 20, 40])
+        self.assertEqual(report.over_budget, 0)
+        self.assertLessEqual(report.peak, MB)
+        self.assertGreater(max(report.chunk_sizes) * row_bytes, 0.5 * MB)
+        self.assertIn("2000 rows in", str(report))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_shrinks_chunk_over_budget(self):
+        runner = AdaptiveBatchRunner(memory_budget=MB, initial_chunk_size=500)
+        report = runner.run(list(range(2000)), process)
+        self.assertEqual(report.chunk_sizes[0], 500)
+        self.assertEqual(report.over_budget, 1)
+        self.assertLess(report.chunk_sizes[1] * row_bytes, MB)
+        self.assertLessEqual(max(report.chunk_sizes[1:]), report.chunk_sizes[1])
+
+    def test_limits(self):
+        runner = AdaptiveBatchRunner(
+            memory_budget=100 * MB, min_chunk_size=5, max_chunk_size=50, initial_chunk_size=1
+        )
+        report = runner.run(list(range(500)), process)
+        self.assertEqual(report.chunk_sizes[0], 5)
+        self.assertEqual(max(report.chunk_sizes), 50)
+        self.assertRaises(ValueError, AdaptiveBatchRunner, memory_budget=0)
+
+    def test_stops_growing_if_slower(self):
+        runner = AdaptiveBatchRunner(memory_budget=MB, initial_chunk_size=100)
+        self.assertEqual(runner.get_next_chunk_size(100, peak=0, seconds=1.0), 200)
+        self.assertEqual(runner.get_next_chunk_size(200, peak=0, seconds=10.0), 100)
+        self.assertEqual(runner.get_next_chunk_size(100, peak=0, seconds=1.0), 100)
+
+    def test_measure_rows_set_in_block(self):
+        runner = AdaptiveBatchRunner(memory_budget=MB)
+        with runner.measure() as chunk:
+            chunk.rows = len(process(range(10)))
+        with self.assertRaises(ValueError):
+            with runner.measure(5):
+                raise ValueError
+        self.assertEqual(runner.report.chunk_sizes, [10, 5])
+
+    def test_traced_peak_keeps_tracing_on(self):
+        tracemalloc.start()
+        try:
+            with traced_peak() as peak:
+                bytearray(MB)
+            self.assertGreater(peak[0], 0.9 * MB)
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+from edc_constants import constants
+from edc_reportable import convert_units, units
+
+from edc_egfr.calculators import EgfrCkdEpi, EgfrCockcroftGault, core
+
+import_script = """
+import json, sys, time
+start = time.perf_counter()
+import edc_egfr.calculators
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestCalculatorCore(SimpleTestCase):
+    def test_imports_without_django(self):
+        output = subprocess.run(
+            [sys.executable, "-c", import_script],
+            capture_output=True,
+            check=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+            text=True,
+        ).stdout
+        result = json.loads(output)
+        for name in ["django", "edc_constants", "edc_reportable", "numpy"]:
+            with self.subTest(name=name):
+                self.assertNotIn(name, result["modules"])
+        sys.stderr.write(f"\nimport edc_egfr.calculators: {result['seconds'] * 1000:.1f}ms\n")
+
+    def test_constants(self):
+        self.assertEqual(core.BLACK, constants.BLACK)
+        self.assertEqual(core.FEMALE, constants.FEMALE)
+        self.assertEqual(core.MALE, constants.MALE)
+        self.assertEqual(core.MICROMOLES_PER_LITER, units.MICROMOLES_PER_LITER)
+        self.assertEqual(core.MILLIGRAMS_PER_DECILITER, units.MILLIGRAMS_PER_DECILITER)
+
+    def test_convert_creatinine(self):
+        for value in [0.5, 0.84, 1.21, 53.0, 74.3, 107, 1234.5678]:
+            for units_from in [core.MICROMOLES_PER_LITER, core.MILLIGRAMS_PER_DECILITER]:
+                for units_to in [core.MICROMOLES_PER_LITER, core.MILLIGRAMS_PER_DECILITER]:
+                    self.assertEqual(
+                        core.convert_creatinine(value, units_from, units_to),
+                        convert_units(value, units_from=units_from, units_to=units_to),
+                    )
+        with self.assertRaises(core.CreatinineConversionNotHandled):
+            core.convert_creatinine(1.0, units.MILLIMOLES_PER_LITER, core.MICROMOLES_PER_LITER)
+
+    def test_calculators_delegate_to_core(self):
+        opts = dict(gender=core.FEMALE, age_in_years=30, creatinine_units="mg/dL")
+        self.assertEqual(
+            EgfrCkdEpi(ethnicity=core.BLACK, creatinine_value=1.1, **opts).value,
+            core.ckd_epi(1.1, core.FEMALE, 30.0, core.BLACK),
+        )
+        self.assertEqual(
+            EgfrCockcroftGault(weight=65, creatinine_value=1.1, **opts).value,
+            core.cockcroft_gault(
+                core.convert_creatinine(1.1, "mg/dL", "umol/L"), core.FEMALE, 30.0, 65.0
+            ),
+        )
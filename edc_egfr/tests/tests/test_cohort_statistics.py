@@ -0,0 +1,149 @@
+import math
+import pickle
+import random
+from statistics import mean, stdev
+from unittest import skipIf
+
+from django.test import TestCase
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.cohort_statistics import (
+    EgfrCohortStatistics,
+    EgfrDistribution,
+    QuantileSketch,
+)
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestCohortStatistics(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        random.seed(1)
+        self.values = [random.lognormvariate(4, 0.4) for _ in range(2000)]
+
+    def assert_matches(self, data: dict, values: list[float]):
+        self.assertEqual(data["n"], len(values))
+        self.assertAlmostEqual(data["mean"], mean(values))
+        self.assertAlmostEqual(data["sd"], stdev(values))
+        # the sketch estimates the lower value at rank q * (n - 1)
+        for name, q in [("q1", 0.25), ("median", 0.5), ("q3", 0.75)]:
+            expected = sorted(values)[int(q * (len(values) - 1))]
+            self.assertLess(abs(data[name] - expected) / expected, 0.011)
+        self.assertAlmostEqual(
+            data["pct_below_60"], 100 * len([v for v in values if v < 60]) / len(values)
+        )
+        self.assertAlmostEqual(
+            data["pct_below_30"], 100 * len([v for v in values if v < 30]) / len(values)
+        )
+
+    def test_distribution(self):
+        distribution = EgfrDistribution()
+        for value in self.values + [None, float("nan")]:
+            distribution.add(value)
+        self.assertEqual(distribution.missing, 2)
+        self.assert_matches(distribution.as_dict(), self.values)
+
+    def test_empty(self):
+        data = EgfrDistribution().as_dict()
+        self.assertEqual(data["n"], 0)
+        self.assertIsNone(data["mean"])
+        self.assertIsNone(data["median"])
+        self.assertIsNone(data["pct_below_60"])
+
+    def test_merged_chunks_match_one_pass(self):
+        one_pass = EgfrDistribution()
+        merged = EgfrDistribution()
+        for index in range(0, len(self.values), 300):
+            chunk = EgfrDistribution()
+            for value in self.values[index : index + 300]:
+                one_pass.add(value)
+                chunk.add(value)
+            # as if returned from a worker process
+            merged.merge(pickle.loads(pickle.dumps(chunk)))
+        for name, value in one_pass.as_dict().items():
+            self.assertTrue(math.isclose(value, merged.as_dict()[name]), name)
+
+    def test_sketch_is_bounded(self):
+        sketch = QuantileSketch(max_buckets=50)
+        for value in self.values:
+            sketch.add(value)
+        self.assertLessEqual(len(sketch.buckets), 50)
+        self.assertEqual(sketch.count, len(self.values))
+        with self.assertRaises(ValueError):
+            sketch.merge(QuantileSketch(relative_accuracy=0.05))
+
+    @skipIf(np is None, "numpy not installed")
+    def test_array_matches_scalar(self):
+        keys = [index % 3 for index in range(len(self.values))]
+        from_arrays = EgfrCohortStatistics()
+        from_arrays.add_array(np.array(keys), np.array(self.values))
+        from_scalars = EgfrCohortStatistics()
+        for key, value in zip(keys, self.values):
+            from_scalars.add(key, value)
+        for row_a, row_b in zip(from_arrays.as_rows(), from_scalars.as_rows()):
+            for name, value in row_a.items():
+                self.assertTrue(math.isclose(value, row_b[name]), name)
+
+    def test_queryset(self):
+        helper = Helper()
+        for index, creatinine_value in enumerate([53, 100, 150, 200, 400, 900]):
+            helper.make_registered_subject(f"subject-{index}")
+            for timepoint in [0, 1]:
+                helper.make_result_crf(
+                    helper.make_subject_visit(f"subject-{index}", timepoint=timepoint),
+                    creatinine_value=creatinine_value,
+                )
+        stats = EgfrCohortStatistics()
+        stats.add_queryset(ResultCrf.objects.all(), chunk_size=5)
+        rows = stats.as_rows()
+        self.assertEqual(len(rows), 2)
+        for row in rows:
+            site_id, visit_code = row["group"]
+            values = [
+                float(obj.egfr_value)
+                for obj in ResultCrf.objects.filter(subject_visit__visit_code=visit_code)
+            ]
+            self.assert_matches(row, values)
+
+    @skipIf(np is None, "numpy not installed")
+    def test_array_merges_with_queryset(self):
+        helper = Helper()
+        for index, creatinine_value in enumerate([53, 100, 150]):
+            helper.make_registered_subject(f"subject-{index}")
+            helper.make_result_crf(
+                helper.make_subject_visit(f"subject-{index}", timepoint=0),
+                creatinine_value=creatinine_value,
+            )
+        stats = EgfrCohortStatistics()
+        stats.add_queryset(ResultCrf.objects.all())
+        [key] = stats.groups
+        values = [float(obj.egfr_value) for obj in ResultCrf.objects.all()]
+        # e.g. (1, "1000") with an int site id, and a row without a group
+        stats.add_array([key] * len(values) + [None], np.array(values + [90.0]))
+        self.assertEqual(len(stats.groups), 2)
+        self.assertEqual(stats.groups[key].moments.count, 2 * len(values))
+        self.assertEqual(stats.groups[None].moments.count, 1)
+        self.assertEqual([row["group"] for row in stats.as_rows()], [key, None])
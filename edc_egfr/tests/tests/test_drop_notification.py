@@ -1,4 +1,8 @@
+from decimal import Decimal
+from unittest.mock import patch
+
 from dateutil.relativedelta import relativedelta
+from django.db import DEFAULT_DB_ALIAS, transaction
 from django.test import TestCase, override_settings
 from edc_appointment.constants import SCHEDULED_APPT
 from edc_appointment.models import Appointment
@@ -15,6 +19,7 @@ from edc_visit_schedule.constants import DAY1
 from edc_visit_schedule.site_visit_schedules import site_visit_schedules
 from edc_visit_tracking.constants import SCHEDULED
 
+from edc_egfr.drop_notification_writer import EgfrDropNotificationWriter, _get_pending
 from edc_egfr.egfr import Egfr
 from egfr_app.lab_profiles import lab_profile
 from egfr_app.models import (
@@ -107,3 +112,79 @@ class TestEgfr(TestCase):
         obj.report_status = CLOSED
         obj.save()
         self.assertEqual(obj.crf_status, COMPLETE)
+
+    def get_egfr(self, creatinine_value=None) -> Egfr:
+        if creatinine_value is not None:
+            self.crf.creatinine_value = creatinine_value
+        return Egfr(
+            baseline_egfr_value=220.1,
+            percent_drop_threshold=20,
+            calling_crf=self.crf,
+            **self.opts,
+        )
+
+    @override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+    def test_unchanged_update_is_skipped(self):
+        self.get_egfr()
+        modified = EgfrDropNotification.objects.get(subject_visit=self.subject_visit).modified
+        with patch.object(EgfrDropNotification, "save") as save:
+            self.get_egfr()
+        save.assert_not_called()
+        obj = EgfrDropNotification.objects.get(subject_visit=self.subject_visit)
+        self.assertEqual(obj.modified, modified)
+
+    @override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+    def test_changed_update_is_saved(self):
+        self.get_egfr()
+        modified = EgfrDropNotification.objects.get(subject_visit=self.subject_visit).modified
+        egfr = self.get_egfr(creatinine_value=60)
+        obj = EgfrDropNotification.objects.get(subject_visit=self.subject_visit)
+        self.assertGreater(obj.modified, modified)
+        self.assertEqual(obj.creatinine_value, Decimal("60.00"))
+        self.assertEqual(obj.egfr_value, Decimal(str(round(egfr.egfr_value, 4))))
+
+    @override_settings(
+        EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification",
+        EDC_EGFR_DROP_NOTIFICATION_COALESCE_TRANSACTION=True,
+    )
+    def test_updates_within_transaction_are_coalesced(self):
+        with patch.object(
+            EgfrDropNotificationWriter,
+            "write_now",
+            autospec=True,
+            side_effect=EgfrDropNotificationWriter.write_now,
+        ) as write_now:
+            with self.captureOnCommitCallbacks(execute=True):
+                for creatinine_value in [60, 61, 62]:
+                    self.get_egfr(creatinine_value=creatinine_value)
+                self.assertFalse(
+                    EgfrDropNotification.objects.filter(
+                        subject_visit=self.subject_visit
+                    ).exists()
+                )
+        self.assertEqual(write_now.call_count, 1)
+        obj = EgfrDropNotification.objects.get(subject_visit=self.subject_visit)
+        self.assertEqual(obj.creatinine_value, Decimal("62.00"))
+
+    @override_settings(
+        EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification",
+        EDC_EGFR_DROP_NOTIFICATION_COALESCE_TRANSACTION=True,
+    )
+    def test_rolled_back_update_is_not_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get_egfr(creatinine_value=60)
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    self.get_egfr(creatinine_value=62)
+                    raise ValueError
+        obj = EgfrDropNotification.objects.get(subject_visit=self.subject_visit)
+        self.assertEqual(obj.creatinine_value, Decimal("60.00"))
+        self.assertEqual(_get_pending(DEFAULT_DB_ALIAS), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    self.get_egfr(creatinine_value=62)
+                    raise ValueError
+        obj = EgfrDropNotification.objects.get(subject_visit=self.subject_visit)
+        self.assertEqual(obj.creatinine_value, Decimal("60.00"))
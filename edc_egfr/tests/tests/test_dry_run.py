@@ -0,0 +1,120 @@
+import json
+import os
+from io import StringIO
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from edc_constants.constants import NON_BLACK
+from edc_lab import site_labs
+from edc_registration.models import RegisteredSubject
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.recompute import dry_run_egfr, recompute_egfr_for_subjects
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import EgfrDropNotification, ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+@override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+class TestDryRun(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        helper = Helper()
+        helper.make_registered_subject("1234")
+        self.baseline_crf = helper.make_result_crf(helper.make_subject_visit("1234"))
+        # a drop from baseline of more than 20%, creates a notification
+        self.crf = helper.make_result_crf(
+            helper.make_subject_visit("1234", timepoint=1), creatinine_value=100
+        )
+
+    def get_stored(self) -> dict:
+        return {
+            str(obj.pk): (obj.egfr_value, obj.egfr_grade, obj.egfr_drop_value)
+            for obj in ResultCrf.objects.all()
+        }
+
+    def dry_run(self, **kwargs) -> tuple:
+        output = StringIO()
+        summary = dry_run_egfr(output, **kwargs)
+        return summary, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_nothing_changed(self):
+        self.assertEqual(EgfrDropNotification.objects.count(), 1)
+        summary, rows = self.dry_run()
+        self.assertEqual(summary.rows, 2)
+        self.assertEqual(summary.changed, 0)
+        self.assertEqual(rows, [])
+        self.assertEqual(summary.notifications["unchanged"], 1)
+        summary, rows = self.dry_run(include_unchanged=True)
+        self.assertEqual(len(rows), 2)
+
+    def test_changes_are_reported_not_saved(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        stored = self.get_stored()
+        notification = EgfrDropNotification.objects.get()
+        with patch.object(ResultCrf, "save") as save:
+            summary, rows = self.dry_run()
+        save.assert_not_called()
+        self.assertEqual(self.get_stored(), stored)
+        self.assertEqual(EgfrDropNotification.objects.get().modified, notification.modified)
+        self.assertEqual(summary.changed, 2)
+        self.assertEqual(
+            [row["id"] for row in rows], [str(self.baseline_crf.pk), str(self.crf.pk)]
+        )
+        for row in rows:
+            self.assertIn("egfr_value", row["changes"])
+            self.assertEqual(row["old"]["egfr_value"], float(stored[row["id"]][0]))
+        self.assertEqual(rows[1]["notification"], "update")
+
+    def test_new_values_match_recompute(self):
+        # the stored baseline is stale, follow-up drop is from the
+        # recomputed baseline
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        ResultCrf.objects.filter(pk=self.baseline_crf.pk).update(creatinine_value=60)
+        summary, rows = self.dry_run()
+        recompute_egfr_for_subjects(["1234"])
+        for row in rows:
+            obj = ResultCrf.objects.get(pk=row["id"])
+            self.assertEqual(
+                row["new"],
+                dict(
+                    egfr_value=float(obj.egfr_value),
+                    egfr_grade=obj.egfr_grade,
+                    egfr_drop_value=float(obj.egfr_drop_value),
+                    egfr_drop_grade=obj.egfr_drop_grade,
+                ),
+            )
+
+    def test_errors_are_reported(self):
+        RegisteredSubject.objects.update(gender="X")
+        summary, rows = self.dry_run()
+        self.assertEqual(summary.errors, 2)
+        self.assertIn("EgfrCalculatorError", rows[0]["error"])
+
+    def test_command(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        path = os.path.join(mkdtemp(), "diff.jsonl")
+        err = StringIO()
+        with patch("sys.stderr", err):
+            call_command("recompute_egfr", "--dry-run", f"--output={path}")
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertIn("2 rows, 2 would change, 0 errors", err.getvalue())
+        self.assertIn("Nothing was saved", err.getvalue())
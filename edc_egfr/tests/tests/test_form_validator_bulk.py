@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+from django import forms
+from django.test import TestCase
+from edc_constants.constants import BLACK, FEMALE, MALE
+from edc_form_validators import FormValidator
+from edc_reportable.units import (
+    GRAMS_PER_DECILITER,
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+)
+
+from edc_egfr.calculators import EgfrCalculatorError
+from edc_egfr.form_validator_mixins import (
+    EgfrCkdEpiFormValidatorMixin,
+    EgfrCockcroftGaultFormValidatorMixin,
+)
+
+
+class EgfrCkdEpiFormValidator(EgfrCkdEpiFormValidatorMixin, FormValidator):
+    pass
+
+
+class EgfrCockcroftGaultFormValidator(EgfrCockcroftGaultFormValidatorMixin, FormValidator):
+    pass
+
+
+class TestFormValidatorBulk(TestCase):
+    def setUp(self):
+        opts = dict(gender=MALE, ethnicity=BLACK, age_in_years=30, weight=72)
+        self.rows = [
+            dict(opts),
+            dict(opts, creatinine_value=1.3, creatinine_units=MICROMOLES_PER_LITER),
+            dict(opts, creatinine_value=1.3, creatinine_units=GRAMS_PER_DECILITER),
+            dict(
+                opts,
+                creatinine_value=Decimal("1.30"),
+                creatinine_units=MILLIGRAMS_PER_DECILITER,
+            ),
+            dict(opts, creatinine_value=114.94, creatinine_units=MICROMOLES_PER_LITER),
+            dict(
+                opts,
+                gender=FEMALE,
+                ethnicity=None,
+                creatinine_value=80.0,
+                creatinine_units=MICROMOLES_PER_LITER,
+            ),
+            dict(
+                opts, weight=None, creatinine_value=80.0, creatinine_units=MICROMOLES_PER_LITER
+            ),
+        ]
+
+    def test_matches_validate_egfr(self):
+        for form_validator_cls in [EgfrCkdEpiFormValidator, EgfrCockcroftGaultFormValidator]:
+            with self.subTest(form_validator_cls=form_validator_cls):
+                result = form_validator_cls.validate_egfr_many(self.rows)
+                self.assertEqual(len(result.values), len(self.rows))
+                self.assertEqual(list(result.errors), [2])
+                for index, cleaned_data in enumerate(self.rows):
+                    form_validator = form_validator_cls(cleaned_data=cleaned_data)
+                    try:
+                        value = form_validator.validate_egfr()
+                    except forms.ValidationError as e:
+                        self.assertIsNone(result.values[index])
+                        self.assertEqual(result.errors[index].messages, e.messages)
+                    else:
+                        self.assertEqual(result.values[index], value)
+                self.assertIsNone(result.values[0])
+                self.assertIsNotNone(result.values[3])
+
+    def test_empty(self):
+        result = EgfrCkdEpiFormValidator.validate_egfr_many([])
+        self.assertEqual(result.values, [])
+        self.assertEqual(result.errors, {})
+
+    def test_calculator_errors_by_row(self):
+        rows = (
+            self.rows[:2]
+            + [dict(self.rows[4], gender="blah"), dict(self.rows[4], age_in_years=17)]
+            + self.rows[2:]
+        )
+        for row in rows[2:4]:
+            self.assertRaises(
+                EgfrCalculatorError,
+                EgfrCkdEpiFormValidator(cleaned_data=row).validate_egfr,
+            )
+        result = EgfrCkdEpiFormValidator.validate_egfr_many(rows)
+        self.assertEqual(sorted(result.errors), [2, 3, 4])
+        self.assertIn("Invalid gender", result.errors[2].messages[0])
+        self.assertIn("Invalid age", result.errors[3].messages[0])
+        self.assertIsNone(result.values[2])
+        self.assertIsNone(result.values[3])
+        # the rest of the batch is calculated
+        self.assertEqual(
+            result.values[6],
+            EgfrCkdEpiFormValidator(cleaned_data=rows[6]).validate_egfr(),
+        )
@@ -0,0 +1,80 @@
+import os
+from tempfile import mkdtemp
+
+from django.test import TestCase, override_settings
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+
+from edc_egfr.grading import _loaded_tables, get_compiled_grading_table
+from edc_egfr.grading_cache import (
+    GradingCacheError,
+    _loaded_files,
+    load_grading_cache,
+    write_grading_cache,
+)
+from edc_egfr.warm_up import warm_up_egfr
+
+
+class TestGradingCache(TestCase):
+    def setUp(self) -> None:
+        self.register(grading_data)
+        self.cache_dir = mkdtemp()
+
+    def tearDown(self) -> None:
+        _loaded_tables.clear()
+        _loaded_files.clear()
+
+    @staticmethod
+    def register(data: dict) -> None:
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=data
+        )
+
+    def test_write_and_load(self):
+        path = write_grading_cache("my_reference_list", self.cache_dir)
+        self.assertTrue(path.name.startswith("egfr-grading-my_reference_list-v1-"))
+        tables = load_grading_cache(path)
+        for utest_id in ["egfr", "egfr_drop"]:
+            with self.subTest(utest_id=utest_id):
+                self.assertEqual(
+                    tables[utest_id].references,
+                    get_compiled_grading_table("my_reference_list", utest_id).references,
+                )
+
+    def test_rewritten_only_if_references_change(self):
+        path = write_grading_cache("my_reference_list", self.cache_dir)
+        modified = os.path.getmtime(path)
+        self.assertEqual(write_grading_cache("my_reference_list", self.cache_dir), path)
+        self.assertEqual(os.path.getmtime(path), modified)
+        self.register({**grading_data, "egfr": grading_data["egfr"][:1]})
+        new_path = write_grading_cache("my_reference_list", self.cache_dir)
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(os.listdir(self.cache_dir), [new_path.name])
+
+    def test_used_if_collection_not_registered(self):
+        path = write_grading_cache("my_reference_list", self.cache_dir)
+        table = get_compiled_grading_table("my_reference_list", "egfr")
+        site_reportables._registry = {}
+        load_grading_cache(path)
+        self.assertEqual(
+            get_compiled_grading_table("my_reference_list", "egfr").references,
+            table.references,
+        )
+
+    def test_invalid_file(self):
+        path = write_grading_cache("my_reference_list", self.cache_dir)
+        self.assertRaises(GradingCacheError, load_grading_cache, path.with_name("blah.npy"))
+        renamed = path.with_name(path.name[:-20] + "0" * 16 + ".npy")
+        os.rename(path, renamed)
+        self.assertRaises(GradingCacheError, load_grading_cache, renamed)
+
+    def test_cache_dir_not_set(self):
+        self.assertRaises(GradingCacheError, write_grading_cache, "my_reference_list")
+
+    def test_warm_up_writes_cache(self):
+        with override_settings(EDC_EGFR_GRADING_CACHE_DIR=self.cache_dir):
+            report = warm_up_egfr(["my_reference_list"])
+        self.assertEqual(len(report.grading_cache_files), 1)
+        self.assertTrue(os.path.exists(report.grading_cache_files[0]))
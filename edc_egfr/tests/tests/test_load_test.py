@@ -0,0 +1,99 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from edc_lab import site_labs
+from edc_registration.models import RegisteredSubject
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from egfr_app.cohort import SyntheticCohort
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.load_test import EgfrLoadTest, LoadTestReport
+from egfr_app.models import EgfrDropNotification, ResultCrf, SubjectConsent
+from egfr_app.visit_schedules import visit_schedule
+
+
+@override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+class TestLoadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+
+    def test_cohort(self):
+        summary = SyntheticCohort(subjects=25, seed=1, batch_size=10).make()
+        self.assertEqual(summary.subjects, 25)
+        self.assertEqual(summary.results, 100)
+        self.assertEqual(
+            RegisteredSubject.objects.filter(subject_identifier__startswith="SYN-").count(), 25
+        )
+        self.assertEqual(SubjectConsent.objects.count(), 25)
+        self.assertEqual(ResultCrf.objects.filter(egfr_value__isnull=True).count(), 100)
+
+    def test_cohort_is_reproducible(self):
+        SyntheticCohort(subjects=5, seed=1, prefix="A").make()
+        SyntheticCohort(subjects=5, seed=1, prefix="B").make()
+        values = {
+            prefix: list(
+                ResultCrf.objects.filter(subject_visit__subject_identifier__startswith=prefix)
+                .order_by("subject_visit__subject_identifier", "report_datetime")
+                .values_list("creatinine_value", flat=True)
+            )
+            for prefix in ["A", "B"]
+        }
+        self.assertEqual(values["A"], values["B"])
+        self.assertEqual(SyntheticCohort(prefix="A").delete(), 5)
+        self.assertFalse(
+            ResultCrf.objects.filter(
+                subject_visit__subject_identifier__startswith="A"
+            ).exists()
+        )
+
+    def test_load_test(self):
+        SyntheticCohort(subjects=40, seed=2).make()
+        report = EgfrLoadTest(subjects=30).run()
+        self.assertEqual(report.subjects, 30)
+        self.assertEqual(report.saves, 120)
+        self.assertEqual(report.errors, {})
+        self.assertEqual(report.notifications_before, 0)
+        self.assertEqual(report.notifications_after, EgfrDropNotification.objects.count())
+        self.assertGreater(report.notifications_after, 0)
+        self.assertEqual(ResultCrf.objects.filter(egfr_value__isnull=True).count(), 40)
+        self.assertIn("saves/s", str(report))
+
+    def test_errors_are_counted(self):
+        SyntheticCohort(subjects=2, seed=3).make()
+        with patch.object(ResultCrf, "save", side_effect=ValueError("Boom")):
+            report = EgfrLoadTest().run()
+        self.assertEqual(report.saves, 0)
+        self.assertEqual(report.errors, {"ValueError": 8})
+
+    def test_percentiles(self):
+        report = LoadTestReport(latencies=[n / 1000 for n in range(100, 0, -1)])
+        self.assertEqual(report.get_percentile(50), 0.05)
+        self.assertEqual(report.get_percentile(99), 0.099)
+        self.assertEqual(report.get_percentile(100), 0.1)
+        self.assertEqual(LoadTestReport().get_percentile(50), 0.0)
+
+    def test_commands(self):
+        err = StringIO()
+        out = StringIO()
+        with patch("sys.stderr", err), patch("sys.stdout", out):
+            call_command("make_egfr_cohort", "--subjects=3", "--seed=4")
+            call_command("make_egfr_cohort", "--subjects=3", "--seed=4", "--delete")
+            call_command("egfr_load_test", "--workers=1")
+        self.assertIn("deleted 3 subjects", err.getvalue())
+        self.assertIn("Created 3 subjects", err.getvalue())
+        self.assertIn("12 saves of 3 subjects", out.getvalue())
@@ -0,0 +1,171 @@
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.drop_notification_writer import (
+    EgfrDropNotificationWriter,
+    retry_egfr_drop_notifications,
+)
+from edc_egfr.models import EgfrDropNotificationFailure
+from edc_egfr.notification_executor import (
+    LocalNotificationExecutor,
+    NotificationExecutor,
+    NotificationQueueFull,
+    ThreadPoolNotificationExecutor,
+    drain_egfr_notifications,
+    get_egfr_notification_executor,
+)
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import EgfrDropNotification
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+class TestNotificationExecutor(TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            NotificationExecutor()
+
+    def test_local_runs_last_job_per_key_on_drain(self):
+        calls = []
+        executor = LocalNotificationExecutor()
+        executor.submit("a", lambda: calls.append("a1"))
+        executor.submit("b", lambda: calls.append("b"))
+        executor.submit("a", lambda: calls.append("a2"))
+        self.assertEqual(calls, [])
+        self.assertEqual(executor.drain(), [])
+        self.assertEqual(calls, ["b", "a2"])
+
+    def test_retry(self):
+        calls = []
+
+        def job():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RuntimeError("database unavailable")
+
+        executor = LocalNotificationExecutor(retries=2, retry_delay=0)
+        executor.submit("a", job)
+        self.assertEqual(executor.drain(), [])
+        self.assertEqual(len(calls), 3)
+        on_failure = []
+        executor.submit("a", lambda: 1 / 0, on_failure=on_failure.append)
+        with self.assertLogs("edc_egfr.notification_executor"):
+            failed = executor.drain()
+        self.assertEqual([key for key, _ in failed], ["a"])
+        self.assertIsInstance(failed[0][1], ZeroDivisionError)
+        self.assertEqual(on_failure, [failed[0][1]])
+        self.assertEqual(executor.drain(), [])
+
+    def test_thread_pool(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def job(name):
+            started.set()
+            release.wait(5)
+            calls.append(name)
+
+        executor = ThreadPoolNotificationExecutor(max_workers=2, max_queued=1)
+        self.addCleanup(executor.shutdown)
+        executor.submit("a", lambda: job("a1"))
+        started.wait(5)
+        # queued behind the running job for the same key, replaced
+        executor.submit("a", lambda: job("a2"))
+        executor.submit("a", lambda: job("a3"))
+        # over `max_queued`, rejected
+        on_failure = []
+        with self.assertLogs("edc_egfr.notification_executor", "ERROR"):
+            executor.submit("b", lambda: calls.append("b"), on_failure=on_failure.append)
+        self.assertEqual(calls, [])
+        self.assertIsInstance(on_failure[0], NotificationQueueFull)
+        with self.assertRaises(TimeoutError):
+            executor.drain(timeout=0.01)
+        release.set()
+        self.assertEqual(executor.drain(timeout=5), [("b", on_failure[0])])
+        self.assertEqual(calls, ["a1", "a3"])
+
+
+@override_settings(
+    EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification",
+    EDC_EGFR_DROP_NOTIFICATION_EXECUTOR=(
+        "edc_egfr.notification_executor.LocalNotificationExecutor"
+    ),
+    EDC_EGFR_DROP_NOTIFICATION_EXECUTOR_OPTIONS=dict(retry_delay=0),
+)
+class TestBackgroundNotification(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        self.helper.make_registered_subject("1234")
+        self.helper.make_result_crf(self.helper.make_subject_visit("1234"))
+
+    def test_written_after_commit_on_drain(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # a drop from baseline of more than 20%
+            crf = self.helper.make_result_crf(
+                self.helper.make_subject_visit("1234", timepoint=1), creatinine_value=100
+            )
+            self.assertEqual(get_egfr_notification_executor().pending, [])
+        self.assertFalse(EgfrDropNotification.objects.exists())
+        self.assertEqual(len(get_egfr_notification_executor().pending), 1)
+        self.assertEqual(drain_egfr_notifications(), [])
+        notification = EgfrDropNotification.objects.get()
+        self.assertEqual(notification.subject_visit, crf.subject_visit)
+        self.assertGreaterEqual(notification.egfr_percent_change, 20)
+
+    def test_not_written_if_rolled_back(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.helper.make_result_crf(
+                self.helper.make_subject_visit("1234", timepoint=1), creatinine_value=100
+            )
+        self.assertTrue(callbacks)
+        self.assertEqual(get_egfr_notification_executor().pending, [])
+        drain_egfr_notifications()
+        self.assertFalse(EgfrDropNotification.objects.exists())
+
+    def test_failure_kept_until_written(self):
+        with patch.object(
+            EgfrDropNotificationWriter, "write_now", side_effect=RuntimeError("unavailable")
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                crf = self.helper.make_result_crf(
+                    self.helper.make_subject_visit("1234", timepoint=1),
+                    creatinine_value=100,
+                )
+            with self.assertLogs("edc_egfr.notification_executor"):
+                failed = drain_egfr_notifications()
+        self.assertEqual(len(failed), 1)
+        self.assertFalse(EgfrDropNotification.objects.exists())
+        failure = EgfrDropNotificationFailure.objects.get()
+        self.assertEqual(failure.model, "egfr_app.egfrdropnotification")
+        self.assertEqual(failure.related_visit_id, str(crf.subject_visit.id))
+        self.assertEqual(failure.error, "RuntimeError: unavailable")
+
+        with patch.object(EgfrDropNotificationWriter, "write_now", side_effect=RuntimeError):
+            with self.assertLogs("edc_egfr.drop_notification_writer"):
+                self.assertEqual(retry_egfr_drop_notifications(), 0)
+        self.assertEqual(EgfrDropNotificationFailure.objects.count(), 1)
+
+        self.assertEqual(retry_egfr_drop_notifications(), 1)
+        self.assertFalse(EgfrDropNotificationFailure.objects.exists())
+        notification = EgfrDropNotification.objects.get()
+        self.assertEqual(notification.subject_visit, crf.subject_visit)
+        self.assertGreaterEqual(notification.egfr_percent_change, 20)
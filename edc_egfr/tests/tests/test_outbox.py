@@ -0,0 +1,134 @@
+import json
+from io import StringIO
+from pathlib import Path
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.models import EgfrOutboxEvent
+from edc_egfr.outbox import EGFR_DROP_NOTIFICATION, EGFR_RESULT, EgfrOutboxExporter
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import EgfrDropNotification, ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+@override_settings(EDC_EGFR_OUTBOX=True)
+class TestOutbox(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        self.helper.make_registered_subject("1234")
+
+    def make_crf(self, timepoint: int = 0, creatinine_value: float = 53) -> ResultCrf:
+        subject_visit = self.helper.make_subject_visit("1234", timepoint=timepoint)
+        return self.helper.make_result_crf(subject_visit, creatinine_value=creatinine_value)
+
+    @staticmethod
+    def read_lines(output_dir: str) -> list[dict]:
+        lines = []
+        for path in sorted(Path(output_dir).glob("*.jsonl")):
+            lines.extend(json.loads(line) for line in path.read_text().splitlines())
+        return lines
+
+    def test_save_adds_event(self):
+        crf = self.make_crf()
+        event = EgfrOutboxEvent.objects.get(event_type=EGFR_RESULT)
+        self.assertEqual(event.model, "egfr_app.resultcrf")
+        self.assertEqual(event.object_id, str(crf.pk))
+        self.assertEqual(event.subject_identifier, "1234")
+        self.assertEqual(event.payload["visit_code"], "1000")
+        self.assertEqual(float(event.payload["egfr_value"]), float(crf.egfr_value))
+
+    @override_settings(EDC_EGFR_OUTBOX=False)
+    def test_off_by_default(self):
+        self.make_crf()
+        self.assertEqual(EgfrOutboxEvent.objects.count(), 0)
+
+    def test_rollback_adds_no_event(self):
+        crf = self.make_crf()
+        count = EgfrOutboxEvent.objects.count()
+        try:
+            with transaction.atomic():
+                crf.creatinine_value = 60
+                crf.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(EgfrOutboxEvent.objects.count(), count)
+
+    @override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+    def test_drop_notification_adds_event(self):
+        self.make_crf(timepoint=0, creatinine_value=53)
+        self.make_crf(timepoint=1, creatinine_value=150)
+        notification = EgfrDropNotification.objects.get()
+        event = EgfrOutboxEvent.objects.get(event_type=EGFR_DROP_NOTIFICATION)
+        self.assertEqual(event.object_id, str(notification.pk))
+        self.assertEqual(event.payload["visit_code"], "2000")
+
+    def test_export_compacts_and_deletes(self):
+        crf = self.make_crf()
+        other = self.make_crf(timepoint=1)
+        for creatinine_value in [60, 61, 62]:
+            crf.creatinine_value = creatinine_value
+            crf.save()
+        output_dir = mkdtemp()
+        result = EgfrOutboxExporter(output_dir, chunk_size=2).export()
+        self.assertEqual(EgfrOutboxEvent.objects.count(), 0)
+        self.assertEqual(result.exported, 2)
+        self.assertEqual(result.compacted, 3)
+        lines = self.read_lines(output_dir)
+        self.assertEqual([line["object_id"] for line in lines], [str(other.pk), str(crf.pk)])
+        crf.refresh_from_db()
+        self.assertEqual(float(lines[-1]["payload"]["egfr_value"]), float(crf.egfr_value))
+        self.assertEqual([line["id"] for line in lines], sorted(line["id"] for line in lines))
+
+    def test_export_without_compact(self):
+        crf = self.make_crf()
+        crf.save()
+        output_dir = mkdtemp()
+        result = EgfrOutboxExporter(output_dir, compact=False).export()
+        self.assertEqual(result.exported, 2)
+        self.assertEqual(len(self.read_lines(output_dir)), 2)
+
+    def test_export_is_at_least_once(self):
+        self.make_crf()
+        output_dir = mkdtemp()
+        exporter = EgfrOutboxExporter(output_dir)
+        with patch("django.db.models.QuerySet.delete", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                exporter.export()
+        # written but not deleted, so exported again
+        self.assertEqual(len(self.read_lines(output_dir)), 1)
+        self.assertEqual(EgfrOutboxEvent.objects.count(), 1)
+        self.assertEqual(exporter.export().exported, 1)
+        self.assertEqual(EgfrOutboxEvent.objects.count(), 0)
+        self.assertEqual(len(self.read_lines(output_dir)), 1)
+
+    def test_command(self):
+        self.make_crf()
+        output_dir = mkdtemp()
+        err = StringIO()
+        with patch("sys.stderr", err):
+            call_command("export_egfr_outbox", f"--output={output_dir}")
+        self.assertIn("Exported 1 events to 1 files", err.getvalue())
+        self.assertEqual(len(self.read_lines(output_dir)), 1)
@@ -0,0 +1,129 @@
+from datetime import date
+from unittest import skipIf
+
+from django.test import TestCase
+from edc_constants.constants import BLACK, FEMALE, MALE, NON_BLACK
+from edc_reportable import (
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+    site_reportables,
+)
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_utils import get_utcnow
+
+from edc_egfr.calculators import EgfrCkdEpi, EgfrCockcroftGault
+from edc_egfr.egfr import Egfr
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+else:
+    import edc_egfr.pandas_accessor  # noqa
+
+
+@skipIf(pd is None, "pandas not installed")
+class TestPandasAccessor(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+
+    def setUp(self):
+        self.rows = [
+            dict(
+                gender=gender,
+                ethnicity=ethnicity,
+                age_in_years=age_in_years,
+                creatinine_value=creatinine_value,
+                creatinine_units=units,
+                weight=65.0,
+            )
+            for gender in [MALE, FEMALE]
+            for ethnicity in [BLACK, NON_BLACK]
+            for age_in_years in [18, 30, 59, 60, 119]
+            for creatinine_value, units in [
+                (53.0, MICROMOLES_PER_LITER),
+                (150.8, MICROMOLES_PER_LITER),
+                (275, MICROMOLES_PER_LITER),
+                (0.9, MILLIGRAMS_PER_DECILITER),
+                (10.15, MILLIGRAMS_PER_DECILITER),
+            ]
+        ]
+
+    def test_ckd_epi_matches_scalar_calculator(self):
+        df = pd.DataFrame(self.rows)
+        values = df.egfr.calculate("ckd-epi")
+        for row, value in zip(self.rows, values):
+            self.assertEqual(value, EgfrCkdEpi(**row).value)
+
+    def test_cockcroft_gault_matches_scalar_calculator(self):
+        df = pd.DataFrame(self.rows)
+        values = df.egfr.calculate("cockcroft-gault")
+        for row, value in zip(self.rows, values):
+            self.assertEqual(value, EgfrCockcroftGault(**row).value)
+
+    def test_invalid_rows_are_nan(self):
+        df = pd.DataFrame(
+            [
+                dict(gender="X", ethnicity=BLACK, age_in_years=30),
+                dict(gender=MALE, ethnicity=None, age_in_years=30),
+                dict(gender=MALE, ethnicity=BLACK, age_in_years=17),
+                dict(gender=MALE, ethnicity=BLACK, age_in_years=None),
+            ]
+        ).assign(creatinine_value=53.0, creatinine_units=MICROMOLES_PER_LITER)
+        self.assertTrue(df.egfr.calculate("ckd-epi").isna().all())
+        self.assertEqual(
+            list(df.egfr.errors("ckd-epi")),
+            ["invalid_gender", "missing_ethnicity", "invalid_age", "invalid_age"],
+        )
+        df = pd.DataFrame([dict(creatinine_value=None), dict(creatinine_value=0)]).assign(
+            gender=MALE,
+            ethnicity=BLACK,
+            age_in_years=30,
+            creatinine_units=MICROMOLES_PER_LITER,
+        )
+        self.assertTrue(df.egfr.calculate("ckd-epi").isna().all())
+
+    def test_age_from_dob(self):
+        report_datetime = get_utcnow()
+        df = pd.DataFrame(
+            [
+                dict(
+                    gender=MALE,
+                    ethnicity=BLACK,
+                    dob=date(report_datetime.year - 30, 1, 1),
+                    report_datetime=report_datetime,
+                    creatinine_value=53.0,
+                    creatinine_units=MICROMOLES_PER_LITER,
+                )
+            ]
+        )
+        self.assertEqual(list(df.egfr.get_age_in_years()), [30.0])
+
+    def test_evaluate_matches_egfr(self):
+        report_datetime = get_utcnow()
+        rows = [
+            dict(row, report_datetime=report_datetime, baseline_egfr_value=baseline)
+            for row in self.rows
+            for baseline in [None, 23.0, 220.1]
+        ]
+        df = pd.DataFrame(rows).egfr.evaluate("ckd-epi", "my_reference_list")
+        for row, result in zip(rows, df.itertuples()):
+            egfr = Egfr(
+                formula_name="ckd-epi",
+                reference_range_collection_name="my_reference_list",
+                **{k: v for k, v in row.items() if k != "weight"},
+            )
+            self.assertEqual(result.egfr_value, egfr.egfr_value)
+            self.assertEqual(result.egfr_drop_value, egfr.egfr_drop_value)
+            self.assertEqual(
+                None if pd.isna(result.egfr_grade) else result.egfr_grade, egfr.egfr_grade
+            )
+            self.assertEqual(
+                None if pd.isna(result.egfr_drop_grade) else result.egfr_drop_grade,
+                egfr.egfr_drop_grade,
+            )
@@ -0,0 +1,122 @@
+import os
+from datetime import date
+from tempfile import mkdtemp
+from unittest import skipIf
+
+from django.test import TestCase
+from edc_constants.constants import BLACK, FEMALE, MALE, NON_BLACK
+from edc_reportable import (
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+    site_reportables,
+)
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_utils import get_utcnow
+
+from edc_egfr.egfr import Egfr
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+else:
+    from edc_egfr.calculators import batch
+    from edc_egfr.parquet import ParquetEgfrProcessor
+
+
+@skipIf(pa is None, "pyarrow not installed")
+class TestParquet(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+
+    def setUp(self):
+        report_datetime = get_utcnow()
+        self.rows = [
+            dict(
+                gender=gender,
+                ethnicity=ethnicity,
+                dob=date(report_datetime.year - age_in_years, 1, 1),
+                report_datetime=report_datetime,
+                creatinine_value=creatinine_value,
+                creatinine_units=units,
+                weight=65.0,
+                baseline_egfr_value=baseline_egfr_value,
+            )
+            for gender in [MALE, FEMALE]
+            for ethnicity in [BLACK, NON_BLACK, None]
+            for age_in_years in [30, 60]
+            for creatinine_value, units in [
+                (53.0, MICROMOLES_PER_LITER),
+                (275, MICROMOLES_PER_LITER),
+                (10.15, MILLIGRAMS_PER_DECILITER),
+                (None, MILLIGRAMS_PER_DECILITER),
+            ]
+            for baseline_egfr_value in [None, 220.1]
+        ]
+        path = mkdtemp()
+        self.source = os.path.join(path, "source.parquet")
+        self.destination = os.path.join(path, "destination.parquet")
+        pq.write_table(pa.Table.from_pylist(self.rows), self.source, row_group_size=25)
+
+    def get_expected(self, row: dict, formula_name: str) -> tuple:
+        try:
+            egfr = Egfr(
+                formula_name=formula_name,
+                reference_range_collection_name="my_reference_list",
+                weight_in_kgs=row["weight"],
+                **{k: v for k, v in row.items() if k != "weight"},
+            )
+            return (
+                egfr.egfr_value,
+                egfr.egfr_grade,
+                egfr.egfr_drop_value,
+                egfr.egfr_drop_grade,
+            )
+        except Exception:
+            return None, None, None, None
+
+    def test_process_by_row_group(self):
+        for formula_name in ["ckd-epi", "cockcroft-gault"]:
+            with self.subTest(formula_name=formula_name):
+                summary = ParquetEgfrProcessor(formula_name, "my_reference_list").process(
+                    self.source, self.destination
+                )
+                self.assertEqual(summary.rows, len(self.rows))
+                self.assertEqual(
+                    summary.row_groups, pq.ParquetFile(self.source).num_row_groups
+                )
+                self.assertEqual(
+                    pq.ParquetFile(self.destination).num_row_groups, summary.row_groups
+                )
+                results = pq.read_table(self.destination).to_pylist()
+                self.assertEqual(summary.errors.total, len(self.rows))
+                self.assertEqual(summary.errors.failed, len(self.rows) - summary.calculated)
+                self.assertEqual(
+                    summary.errors.failed,
+                    len([r for r in results if r["egfr_error"] != batch.OK]),
+                )
+                for row, result in zip(self.rows, results):
+                    self.assertEqual(
+                        (
+                            result["egfr_value"],
+                            result["egfr_grade"],
+                            result["egfr_drop_value"],
+                            result["egfr_drop_grade"],
+                        ),
+                        self.get_expected(row, formula_name),
+                    )
+
+    def test_without_grading(self):
+        ParquetEgfrProcessor("ckd-epi").process(self.source, self.destination)
+        column_names = pq.read_table(self.destination).column_names
+        self.assertIn("egfr_value", column_names)
+        self.assertNotIn("egfr_grade", column_names)
+
+    def test_invalid_formula_name(self):
+        self.assertRaises(ValueError, ParquetEgfrProcessor, "blah")
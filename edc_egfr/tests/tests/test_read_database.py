@@ -0,0 +1,100 @@
+from unittest.mock import patch
+
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from edc_lab import site_labs
+from edc_registration.models import RegisteredSubject
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.read_database import egfr_read_from_primary, get_egfr_read_database
+from edc_egfr.recompute import flush_egfr_recompute_queue
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf, SubjectVisit, SubjectVitals
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+original_using = QuerySet.using
+
+
+class TestReadDatabase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        self.helper.make_registered_subject("1234")
+        self.subject_visit = self.helper.make_subject_visit("1234")
+        self.crf = self.helper.make_result_crf(self.subject_visit)
+        self.reads = []
+
+    def using(self, queryset, alias, replicated=True):
+        """Records the alias and reads "replica" from the default
+        database, or, if not `replicated`, finds nothing there.
+        """
+        self.reads.append((queryset.model, alias))
+        if alias == "replica":
+            queryset = original_using(queryset, None)
+            return queryset if replicated else queryset.none()
+        return original_using(queryset, alias)
+
+    def test_read_database(self):
+        self.assertIsNone(get_egfr_read_database())
+        with override_settings(EDC_EGFR_READ_DATABASE="replica"):
+            self.assertEqual(get_egfr_read_database(), "replica")
+            with egfr_read_from_primary():
+                self.assertIsNone(get_egfr_read_database())
+            self.assertEqual(get_egfr_read_database(), "replica")
+            # TestCase runs in a transaction
+            self.assertIsNone(get_egfr_read_database(ResultCrf, consistent=True))
+
+    @override_settings(EDC_EGFR_READ_DATABASE="replica")
+    def test_lookups_read_from_replica(self):
+        with patch.object(QuerySet, "using", lambda qs, alias: self.using(qs, alias)):
+            self.crf.save()
+        self.assertIn((RegisteredSubject, "replica"), self.reads)
+        self.assertIn((SubjectVisit, "replica"), self.reads)
+        # baseline CRF may have been written in this transaction
+        self.assertIn((ResultCrf, None), self.reads)
+        self.assertNotIn((ResultCrf, "replica"), self.reads)
+
+    @override_settings(EDC_EGFR_READ_DATABASE="replica")
+    def test_weight_lookup_reads_from_primary(self):
+        with patch.object(ResultCrf, "egfr_weight_model", "egfr_app.subjectvitals"):
+            with patch.object(QuerySet, "using", lambda qs, alias: self.using(qs, alias)):
+                self.crf.save()
+        # weight may have been written in this transaction
+        self.assertIn((SubjectVitals, None), self.reads)
+        self.assertNotIn((SubjectVitals, "replica"), self.reads)
+
+    @override_settings(EDC_EGFR_READ_DATABASE="replica")
+    def test_lookups_not_replicated_read_from_primary(self):
+        with patch.object(
+            QuerySet, "using", lambda qs, alias: self.using(qs, alias, replicated=False)
+        ):
+            self.crf.save()
+        self.assertIn((RegisteredSubject, "replica"), self.reads)
+        self.assertIn((RegisteredSubject, "default"), self.reads)
+        self.crf.refresh_from_db()
+        self.assertIsNotNone(self.crf.egfr_value)
+
+    @override_settings(EDC_EGFR_READ_DATABASE="replica")
+    def test_recompute_queue_reads_from_primary(self):
+        aliases = []
+        with patch(
+            "edc_egfr.recompute.queue.recompute_egfr_for_subjects",
+            side_effect=lambda *args: aliases.append(get_egfr_read_database()),
+        ):
+            flush_egfr_recompute_queue()
+        self.assertEqual(aliases, [None])
@@ -0,0 +1,301 @@
+import os
+from io import StringIO
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+from edc_constants.constants import FEMALE, NON_BLACK
+from edc_lab import site_labs
+from edc_registration.models import RegisteredSubject
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_utils.round_up import round_half_away_from_zero
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.batch_runner import MB
+from edc_egfr.recompute import (
+    RecomputeCheckpoint,
+    get_egfr_model_classes,
+    get_egfr_site_ids,
+    recompute_egfr_by_site,
+    recompute_egfr_for_subjects,
+)
+from edc_egfr.recompute.site_partitioned import get_site_queryset
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+class TestRecompute(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        helper = Helper()
+        self.crfs = {}
+        for subject_identifier in ["1234", "5678"]:
+            helper.make_registered_subject(subject_identifier)
+            subject_visit = helper.make_subject_visit(subject_identifier)
+            self.crfs[subject_identifier] = helper.make_result_crf(subject_visit)
+
+    def get_egfr_value(self, subject_identifier: str) -> float:
+        crf = ResultCrf.objects.get(pk=self.crfs[subject_identifier].pk)
+        return round_half_away_from_zero(float(crf.egfr_value), 2)
+
+    def test_egfr_model_classes(self):
+        self.assertIn(ResultCrf, get_egfr_model_classes())
+
+    def test_demographics_change_recomputes_subject_after_commit(self):
+        self.assertEqual(self.get_egfr_value("1234"), 156.43)
+        rs = RegisteredSubject.objects.get(subject_identifier="1234")
+        rs.ethnicity = NON_BLACK
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            rs.save()
+        # not recomputed until the transaction commits
+        self.assertEqual(self.get_egfr_value("1234"), 156.43)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get_egfr_value("1234"), 134.97)
+        # other subjects are not touched
+        self.assertEqual(self.get_egfr_value("5678"), 156.43)
+
+    def test_demographics_changes_are_batched(self):
+        with patch(
+            "edc_egfr.recompute.queue.recompute_egfr_for_subjects",
+            wraps=recompute_egfr_for_subjects,
+        ) as recompute:
+            with self.captureOnCommitCallbacks(execute=True):
+                for subject_identifier in ["1234", "5678"]:
+                    rs = RegisteredSubject.objects.get(subject_identifier=subject_identifier)
+                    rs.gender = FEMALE
+                    rs.save()
+        recompute.assert_any_call(["1234", "5678"])
+        self.assertEqual(self.get_egfr_value("1234"), 141.81)
+        self.assertEqual(self.get_egfr_value("5678"), 141.81)
+
+    def test_rolled_back_demographics_change_is_not_recomputed(self):
+        with patch(
+            "edc_egfr.recompute.queue.recompute_egfr_for_subjects",
+            wraps=recompute_egfr_for_subjects,
+        ) as recompute:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(ValueError):
+                    with transaction.atomic():
+                        rs = RegisteredSubject.objects.get(subject_identifier="1234")
+                        rs.gender = FEMALE
+                        rs.save()
+                        raise ValueError
+                rs = RegisteredSubject.objects.get(subject_identifier="5678")
+                rs.gender = FEMALE
+                rs.save()
+        recompute.assert_called_once_with(["5678"])
+        self.assertEqual(self.get_egfr_value("1234"), 156.43)
+        self.assertEqual(self.get_egfr_value("5678"), 141.81)
+
+    def test_recompute_error_after_commit_is_logged(self):
+        rs = RegisteredSubject.objects.get(subject_identifier="1234")
+        rs.gender = FEMALE
+        with patch(
+            "edc_egfr.recompute.queue.recompute_egfr_for_subjects",
+            side_effect=ValueError("Boom"),
+        ):
+            with self.assertLogs("edc_egfr.recompute.queue", level="ERROR") as cm:
+                with self.captureOnCommitCallbacks(execute=True):
+                    rs.save()
+        self.assertIn("1234", cm.output[0])
+
+    def test_unrelated_change_does_not_recompute(self):
+        rs = RegisteredSubject.objects.get(subject_identifier="1234")
+        rs.initials = "XX"
+        with patch("edc_egfr.signals.queue_egfr_recompute") as queue_egfr_recompute:
+            rs.save()
+        queue_egfr_recompute.assert_not_called()
+
+    def test_recompute_for_subjects(self):
+        RegisteredSubject.objects.filter(subject_identifier="1234").update(ethnicity=NON_BLACK)
+        self.assertEqual(recompute_egfr_for_subjects(["1234"]), 1)
+        self.assertEqual(self.get_egfr_value("1234"), 134.97)
+        self.assertEqual(self.get_egfr_value("5678"), 156.43)
+
+    def test_egfr_site_ids(self):
+        self.assertEqual(get_egfr_site_ids(), [settings.SITE_ID])
+
+    def test_recompute_by_site(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        results = recompute_egfr_by_site(chunk_size=1)
+        self.assertEqual(list(results), [settings.SITE_ID])
+        result = results[settings.SITE_ID]
+        self.assertTrue(result.ok)
+        self.assertEqual(result.processed, 2)
+        self.assertGreaterEqual(result.elapsed, 0)
+        self.assertLess(result.elapsed, 60)
+        self.assertEqual(self.get_egfr_value("1234"), 134.97)
+        self.assertEqual(self.get_egfr_value("5678"), 134.97)
+
+    def test_recompute_by_site_with_memory_budget(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        result = recompute_egfr_by_site(chunk_size=1, memory_budget=64 * MB)[settings.SITE_ID]
+        self.assertTrue(result.ok)
+        self.assertEqual(result.processed, 2)
+        self.assertEqual(result.batch_report.rows, 2)
+        self.assertEqual(self.get_egfr_value("1234"), 134.97)
+        self.assertEqual(self.get_egfr_value("5678"), 134.97)
+        # peak memory is process-wide
+        with self.assertRaises(ValueError):
+            recompute_egfr_by_site(max_workers=2, memory_budget=64 * MB)
+
+    def test_recompute_by_site_reports_failed_chunks(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        original_save = ResultCrf.save
+
+        def save(obj, *args, **kwargs):
+            if obj.subject_visit.subject_identifier == "1234":
+                raise ValueError("Boom")
+            original_save(obj, *args, **kwargs)
+
+        with patch.object(ResultCrf, "save", save):
+            result = recompute_egfr_by_site(chunk_size=1)[settings.SITE_ID]
+        self.assertFalse(result.ok)
+        self.assertEqual(result.processed, 1)
+        self.assertEqual(result.failed, 1)
+        self.assertIn("Boom", result.errors[0])
+        # the failed chunk is rolled back, the other is not
+        self.assertEqual(self.get_egfr_value("1234"), 156.43)
+        self.assertEqual(self.get_egfr_value("5678"), 134.97)
+
+    def test_recompute_by_site_saves_baseline_first(self):
+        helper = Helper()
+        followup = helper.make_result_crf(helper.make_subject_visit("1234", timepoint=1))
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        saved = []
+        original_save = ResultCrf.save
+
+        def save(obj, *args, **kwargs):
+            saved.append(obj.pk)
+            original_save(obj, *args, **kwargs)
+
+        checkpoint = RecomputeCheckpoint(os.path.join(mkdtemp(), "checkpoint.sqlite3"))
+        with patch.object(ResultCrf, "save", save):
+            result = recompute_egfr_by_site(chunk_size=1, checkpoint=checkpoint)[
+                settings.SITE_ID
+            ]
+        self.assertEqual(result.processed, 3)
+        self.assertEqual(saved, [self.crfs["1234"].pk, followup.pk, self.crfs["5678"].pk])
+        # a subject's rows are not split across chunks
+        self.assertEqual([chunk[4] for chunk in checkpoint.get_chunks()], [2, 1])
+        checkpoint.close()
+        # the drop is from the recomputed baseline
+        followup.refresh_from_db()
+        self.assertEqual(float(followup.egfr_drop_value), 0.0)
+
+    def test_recompute_command(self):
+        out = StringIO()
+        with patch("sys.stdout", out):
+            call_command("recompute_egfr", "--chunk-size=10")
+        self.assertIn(f"site {settings.SITE_ID}: 2 processed, 0 failed", out.getvalue())
+        with patch.object(ResultCrf, "save", side_effect=ValueError("Boom")):
+            with patch("sys.stdout", out):
+                self.assertRaises(CommandError, call_command, "recompute_egfr")
+
+    def test_checkpoint_watermark(self):
+        path = os.path.join(mkdtemp(), "checkpoint.sqlite3")
+        checkpoint = RecomputeCheckpoint(path)
+        checkpoint.start_unit("egfr_app.resultcrf", 1)
+        self.assertIsNone(checkpoint.get_watermark("egfr_app.resultcrf", 1))
+        checkpoint.start_chunk("egfr_app.resultcrf", 1, first="1001", last="1010", rows=10)
+        # started but not completed, e.g. interrupted
+        self.assertIsNone(checkpoint.get_watermark("egfr_app.resultcrf", 1))
+        checkpoint.complete_chunk("egfr_app.resultcrf", 1, first="1001", last="1010", rows=10)
+        self.assertEqual(checkpoint.get_watermark("egfr_app.resultcrf", 1), "1010")
+        checkpoint.fail_chunk(
+            "egfr_app.resultcrf", 1, first="1011", last="1020", rows=10, error="Boom"
+        )
+        checkpoint.complete_chunk("egfr_app.resultcrf", 1, first="1021", last="1030", rows=10)
+        # held below the failed chunk
+        self.assertEqual(checkpoint.get_watermark("egfr_app.resultcrf", 1), "1010")
+        self.assertEqual([chunk[2] for chunk in checkpoint.get_chunks("failed")], ["1011"])
+        checkpoint.close()
+        checkpoint = RecomputeCheckpoint(path, resume=True)
+        self.assertEqual(checkpoint.get_watermark("egfr_app.resultcrf", 1), "1010")
+        checkpoint.close()
+        checkpoint = RecomputeCheckpoint(path)
+        self.assertIsNone(checkpoint.get_watermark("egfr_app.resultcrf", 1))
+        self.assertEqual(checkpoint.get_chunks(), [])
+        checkpoint.close()
+
+    def test_site_queryset_does_not_change_checkpoint(self):
+        checkpoint = RecomputeCheckpoint(os.path.join(mkdtemp(), "checkpoint.sqlite3"))
+        self.addCleanup(checkpoint.close)
+        checkpoint.start_unit("egfr_app.resultcrf", settings.SITE_ID)
+        checkpoint.complete_chunk(
+            "egfr_app.resultcrf", settings.SITE_ID, first="1234", last="1234", rows=1
+        )
+        checkpoint.fail_chunk(
+            "egfr_app.resultcrf", settings.SITE_ID, first="5678", last="5678", rows=1, error=""
+        )
+        queryset = get_site_queryset(ResultCrf, settings.SITE_ID, checkpoint)
+        self.assertEqual(queryset.count(), 1)
+        # still held below the failed chunk
+        checkpoint.complete_chunk(
+            "egfr_app.resultcrf", settings.SITE_ID, first="9999", last="9999", rows=1
+        )
+        self.assertEqual(
+            checkpoint.get_watermark("egfr_app.resultcrf", settings.SITE_ID), "1234"
+        )
+
+    def test_recompute_by_site_resumes_after_last_completed_chunk(self):
+        RegisteredSubject.objects.update(ethnicity=NON_BLACK)
+        path = os.path.join(mkdtemp(), "checkpoint.sqlite3")
+        original_save = ResultCrf.save
+
+        def save(obj, *args, **kwargs):
+            if obj.subject_visit.subject_identifier == "5678":
+                raise ValueError("Boom")
+            original_save(obj, *args, **kwargs)
+
+        checkpoint = RecomputeCheckpoint(path)
+        with patch.object(ResultCrf, "save", save):
+            result = recompute_egfr_by_site(chunk_size=1, checkpoint=checkpoint)[
+                settings.SITE_ID
+            ]
+        self.assertEqual(result.failed, 1)
+        checkpoint.close()
+
+        # resume after the last subject before the failed chunk
+        checkpoint = RecomputeCheckpoint(path, resume=True)
+        self.assertEqual(
+            checkpoint.get_watermark("egfr_app.resultcrf", settings.SITE_ID), "1234"
+        )
+        result = recompute_egfr_by_site(chunk_size=1, checkpoint=checkpoint)[settings.SITE_ID]
+        self.assertTrue(result.ok)
+        self.assertEqual(result.processed, 1)
+        self.assertEqual(self.get_egfr_value("1234"), 134.97)
+        self.assertEqual(self.get_egfr_value("5678"), 134.97)
+
+        # nothing left to do
+        result = recompute_egfr_by_site(chunk_size=1, checkpoint=checkpoint)[settings.SITE_ID]
+        self.assertEqual(result.processed, 0)
+        checkpoint.close()
+
+    def test_recompute_command_resume(self):
+        path = os.path.join(mkdtemp(), "checkpoint.sqlite3")
+        out = StringIO()
+        with patch("sys.stdout", out):
+            call_command("recompute_egfr", f"--checkpoint={path}")
+            call_command("recompute_egfr", f"--checkpoint={path}", "--resume")
+        self.assertIn(f"Resuming from checkpoint {path}", out.getvalue())
+        self.assertIn(f"site {settings.SITE_ID}: 0 processed, 0 failed", out.getvalue())
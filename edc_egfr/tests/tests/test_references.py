@@ -0,0 +1,109 @@
+from django.test import TestCase
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.calculators import egfr_percent_change
+from edc_egfr.references import annotate_egfr_references
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+class TestReferences(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        for subject_identifier, results in [
+            ("1234", [(0, 0, 53), (0, 1, 60), (1, 0, 45), (2, 0, 150), (3, 0, 90)]),
+            ("5678", [(1, 0, 70), (2, 0, 200)]),
+        ]:
+            self.helper.make_registered_subject(subject_identifier)
+            for timepoint, visit_code_sequence, creatinine_value in results:
+                self.helper.make_result_crf(
+                    self.helper.make_subject_visit(
+                        subject_identifier,
+                        timepoint=timepoint,
+                        visit_code_sequence=visit_code_sequence,
+                    ),
+                    creatinine_value=creatinine_value,
+                )
+
+    @staticmethod
+    def get_expected(egfr_values: list[float], baseline: float | None) -> list[dict]:
+        expected = []
+        for index, egfr_value in enumerate(egfr_values):
+            row = dict(
+                baseline=baseline,
+                previous=egfr_values[index - 1] if index else None,
+                peak=max(egfr_values[: index + 1]),
+                nadir=min(egfr_values[: index + 1]),
+            )
+            expected.append(
+                {
+                    k: None if v is None else egfr_percent_change(egfr_value, v)
+                    for k, v in row.items()
+                }
+            )
+        return expected
+
+    def test_references(self):
+        with self.assertNumQueries(1):
+            rows = list(
+                annotate_egfr_references(ResultCrf.objects.all()).order_by(
+                    "subject_visit__subject_identifier", "report_datetime"
+                )
+            )
+        self.assertEqual(len(rows), 7)
+        for subject_identifier in ["1234", "5678"]:
+            subject_rows = [
+                obj
+                for obj in rows
+                if obj.subject_visit.subject_identifier == subject_identifier
+            ]
+            egfr_values = [float(obj.egfr_value) for obj in subject_rows]
+            baseline = egfr_values[0] if subject_identifier == "1234" else None
+            expected = self.get_expected(egfr_values, baseline)
+            for obj, values in zip(subject_rows, expected):
+                for reference, value in values.items():
+                    with self.subTest(subject_identifier=subject_identifier, ref=reference):
+                        actual = getattr(obj, f"egfr_drop_from_{reference}")
+                        if value is None:
+                            self.assertIsNone(actual)
+                        else:
+                            self.assertAlmostEqual(actual, value, places=2)
+
+    def test_baseline_timepoint(self):
+        rows = list(
+            annotate_egfr_references(ResultCrf.objects.all(), baseline_timepoint=1)
+            .filter(subject_visit__subject_identifier="5678")
+            .order_by("report_datetime")
+        )
+        self.assertEqual(rows[0].baseline_egfr_value, rows[0].egfr_value)
+        self.assertAlmostEqual(
+            rows[1].egfr_drop_from_baseline,
+            egfr_percent_change(float(rows[1].egfr_value), float(rows[0].egfr_value)),
+            places=2,
+        )
+
+    def test_filter_on_references(self):
+        queryset = annotate_egfr_references(ResultCrf.objects.all()).filter(
+            egfr_drop_from_peak__gte=20
+        )
+        self.assertTrue(queryset.exists())
+        for obj in queryset:
+            self.assertGreaterEqual(obj.egfr_drop_from_peak, 20)
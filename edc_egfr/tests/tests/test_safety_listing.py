@@ -0,0 +1,159 @@
+import os
+from io import StringIO
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from edc_constants.constants import NON_BLACK
+from edc_lab import site_labs
+from edc_registration.models import RegisteredSubject
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.recompute import recompute_egfr_for_subjects
+from edc_egfr.safety_listing import EgfrSafetyListing
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import EgfrDropNotification, ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+@override_settings(
+    EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification",
+    EDC_EGFR_LISTING_LAG=0,
+)
+class TestSafetyListing(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.folder = mkdtemp()
+        helper = Helper()
+        for subject_identifier in ["1234", "5678"]:
+            helper.make_registered_subject(subject_identifier)
+            helper.make_result_crf(helper.make_subject_visit(subject_identifier))
+            # a drop from baseline of more than 20%, creates a notification
+            helper.make_result_crf(
+                helper.make_subject_visit(subject_identifier, timepoint=1),
+                creatinine_value=100,
+            )
+
+    def get_listing(self, name: str = "listing", rebuild=None) -> EgfrSafetyListing:
+        listing = EgfrSafetyListing(
+            path=os.path.join(self.folder, f"{name}.sqlite3"),
+            model_classes=[ResultCrf],
+            rebuild=rebuild,
+        )
+        listing.min_grade = None
+        self.addCleanup(listing.close)
+        return listing
+
+    def get_rebuilt_rows(self) -> list[dict]:
+        listing = self.get_listing("rebuilt", rebuild=True)
+        listing.update()
+        return list(listing.get_rows())
+
+    def test_listing(self):
+        listing = self.get_listing()
+        summary = listing.update()
+        self.assertEqual(
+            summary.fetched, {"egfr_app.resultcrf": 4, "egfr_app.egfrdropnotification": 2}
+        )
+        rows = list(listing.get_rows())
+        self.assertEqual(
+            [row["subject_identifier"] for row in rows], ["1234"] * 2 + ["5678"] * 2
+        )
+        self.assertEqual([bool(row["notification_id"]) for row in rows], [False, True] * 2)
+        listing.min_grade = 3
+        rows = list(listing.get_rows())
+        # both rows with a notification, and any graded 3 or above
+        self.assertGreaterEqual(len(rows), 2)
+        for row in rows:
+            self.assertTrue(
+                row["notification_id"]
+                or int(row["egfr_grade"] or 0) >= 3
+                or int(row["egfr_drop_grade"] or 0) >= 3
+            )
+
+    def test_update_fetches_changed_rows_only(self):
+        listing = self.get_listing()
+        listing.update()
+        RegisteredSubject.objects.filter(subject_identifier="1234").update(ethnicity=NON_BLACK)
+        recompute_egfr_for_subjects(["1234"])
+        summary = listing.update()
+        # rows at the watermark are fetched again
+        self.assertLess(summary.fetched["egfr_app.resultcrf"], 4)
+        self.assertEqual(list(listing.get_rows()), self.get_rebuilt_rows())
+
+    def test_update_removes_deleted_rows(self):
+        listing = self.get_listing()
+        listing.update()
+        EgfrDropNotification.objects.filter(subject_visit__subject_identifier="5678").delete()
+        ResultCrf.objects.filter(
+            subject_visit__subject_identifier="1234", subject_visit__visit_code="1000"
+        ).delete()
+        summary = listing.update(sweep=True)
+        self.assertEqual(summary.deleted["egfr_app.resultcrf"], 1)
+        self.assertEqual(summary.deleted["egfr_app.egfrdropnotification"], 1)
+        rows = list(listing.get_rows())
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows, self.get_rebuilt_rows())
+
+    def test_sweep_is_periodic(self):
+        listing = self.get_listing()
+        listing.update()
+        self.assertIsNotNone(listing.get_last_sweep("egfr_app.resultcrf"))
+        ResultCrf.objects.filter(
+            subject_visit__subject_identifier="1234", subject_visit__visit_code="1000"
+        ).delete()
+        # swept on the first update, so not due
+        summary = listing.update()
+        self.assertEqual(summary.deleted["egfr_app.resultcrf"], 0)
+        self.assertEqual(len(list(listing.get_rows())), 4)
+        with override_settings(EDC_EGFR_LISTING_SWEEP_INTERVAL=None):
+            summary = listing.update()
+        self.assertEqual(summary.deleted["egfr_app.resultcrf"], 0)
+        with override_settings(EDC_EGFR_LISTING_SWEEP_INTERVAL=0):
+            summary = listing.update()
+        self.assertEqual(summary.deleted["egfr_app.resultcrf"], 1)
+        self.assertEqual(list(listing.get_rows()), self.get_rebuilt_rows())
+
+    def test_state_persists(self):
+        self.get_listing().update()
+        listing = self.get_listing()
+        self.assertIsNotNone(listing.get_watermark("egfr_app.resultcrf"))
+        self.assertEqual(list(listing.get_rows()), self.get_rebuilt_rows())
+        listing = self.get_listing(rebuild=True)
+        self.assertIsNone(listing.get_watermark("egfr_app.resultcrf"))
+        self.assertEqual(list(listing.get_rows()), [])
+
+    def test_command(self):
+        path = os.path.join(self.folder, "listing.csv")
+        state_path = os.path.join(self.folder, "command.sqlite3")
+        stderr = StringIO()
+        with patch("sys.stderr", stderr):
+            call_command("egfr_safety_listing", f"--output={path}", f"--state={state_path}")
+        self.assertIn("egfr_app.resultcrf: 4 fetched, 0 deleted", stderr.getvalue())
+        ResultCrf.objects.filter(subject_visit__subject_identifier="1234").delete()
+        stderr = StringIO()
+        with patch("sys.stderr", stderr):
+            call_command(
+                "egfr_safety_listing", f"--output={path}", f"--state={state_path}", "--sweep"
+            )
+        self.assertRegex(stderr.getvalue(), r"egfr_app.resultcrf: \d+ fetched, 2 deleted")
+        listing = EgfrSafetyListing(path=state_path)
+        self.addCleanup(listing.close)
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()) - 1, len(list(listing.get_rows())))
@@ -0,0 +1,99 @@
+from unittest import skipIf
+
+from django.test import TestCase
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.staging import (
+    G1,
+    G2,
+    G3A,
+    G3B,
+    G4,
+    G5,
+    ckd_stage_expression,
+    count_ckd_stages_by,
+    get_ckd_stage,
+)
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from edc_egfr.staging import count_ckd_stages, get_ckd_stages
+
+
+class TestStaging(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.values = [None, 0.0, 14.9999, 15.0, 29.99, 30.0, 44.5, 45.0, 59.9, 60.0]
+        self.values += [89.9999, 90.0, 156.43]
+
+    def test_stage_boundaries(self):
+        self.assertEqual(
+            [get_ckd_stage(value) for value in self.values],
+            [None, G5, G5, G4, G4, G3B, G3B, G3A, G3A, G2, G2, G1, G1],
+        )
+        self.assertIsNone(get_ckd_stage(float("nan")))
+
+    @skipIf(np is None, "numpy not installed")
+    def test_array_matches_scalar(self):
+        values = np.array([np.nan if v is None else v for v in self.values])
+        self.assertEqual(
+            list(get_ckd_stages(values)), [get_ckd_stage(value) for value in self.values]
+        )
+        self.assertEqual(
+            count_ckd_stages(values),
+            {None: 1, G5: 2, G4: 2, G3B: 2, G3A: 2, G2: 2, G1: 2},
+        )
+
+    def test_queryset_expression(self):
+        helper = Helper()
+        for index, creatinine_value in enumerate([53, 100, 150, 200, 400, 900]):
+            helper.make_registered_subject(f"subject-{index}")
+            for timepoint in [0, 1]:
+                helper.make_result_crf(
+                    helper.make_subject_visit(f"subject-{index}", timepoint=timepoint),
+                    creatinine_value=creatinine_value,
+                )
+        queryset = ResultCrf.objects.annotate(ckd_stage=ckd_stage_expression())
+        stages = set()
+        for obj in queryset:
+            self.assertEqual(obj.ckd_stage, get_ckd_stage(obj.egfr_value))
+            stages.add(obj.ckd_stage)
+        self.assertGreater(len(stages), 3)
+        counts = list(count_ckd_stages_by(ResultCrf.objects.all()))
+        self.assertEqual(
+            sorted({row["subject_visit__visit_code"] for row in counts}), ["1000", "2000"]
+        )
+        for row in counts:
+            self.assertEqual(
+                row["count"],
+                len(
+                    [
+                        obj
+                        for obj in queryset
+                        if obj.subject_visit.visit_code == row["subject_visit__visit_code"]
+                        and obj.ckd_stage == row["ckd_stage"]
+                    ]
+                ),
+            )
@@ -0,0 +1,173 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+from edc_constants.constants import BLACK, FEMALE, MALE, NON_BLACK
+from edc_reportable import (
+    MICROMOLES_PER_LITER,
+    MILLIGRAMS_PER_DECILITER,
+    BoundariesOverlap,
+    NotEvaluated,
+    site_reportables,
+)
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_reportable.units import EGFR_UNITS
+
+from edc_egfr.egfr import Egfr, EgfrError
+from edc_egfr.grading import CompiledGradeReference, CompiledGradingTable
+from edc_egfr.subject_egfr import SubjectEgfr
+
+
+class TestSubjectEgfr(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+
+    def setUp(self) -> None:
+        first = datetime(2023, 2, 27, 23, 0, tzinfo=ZoneInfo("Africa/Dar_es_Salaam"))
+        self.rows = [
+            (first + relativedelta(days=days), creatinine_value, creatinine_units, 65.0)
+            for days, creatinine_value, creatinine_units in [
+                (0, 53.0, MICROMOLES_PER_LITER),
+                (1, 80.0, MICROMOLES_PER_LITER),
+                (2, 150.0, MICROMOLES_PER_LITER),
+                (370, 1.9, MILLIGRAMS_PER_DECILITER),
+                (400, 900.0, MICROMOLES_PER_LITER),
+            ]
+        ]
+
+    def assert_matches_egfr(self, subject_egfr: SubjectEgfr, **opts):
+        results = subject_egfr.evaluate_many(self.rows)
+        self.assertEqual(len(results), len(self.rows))
+        for row, result in zip(self.rows, results):
+            report_datetime, creatinine_value, creatinine_units, weight_in_kgs = row
+            egfr = Egfr(
+                report_datetime=report_datetime,
+                creatinine_value=creatinine_value,
+                creatinine_units=creatinine_units,
+                weight_in_kgs=weight_in_kgs,
+                reference_range_collection_name="my_reference_list",
+                **opts,
+            )
+            self.assertIsNone(result.error)
+            self.assertEqual(result.egfr_value, egfr.egfr_value)
+            self.assertEqual(result.egfr_grade, egfr.egfr_grade)
+            self.assertEqual(result.egfr_drop_value, egfr.egfr_drop_value)
+            self.assertEqual(result.egfr_drop_grade, egfr.egfr_drop_grade)
+        return results
+
+    def test_matches_egfr(self):
+        for opts in [
+            dict(gender=MALE, ethnicity=BLACK, dob=date(1990, 5, 1), formula_name="ckd-epi"),
+            dict(
+                gender=FEMALE,
+                ethnicity=NON_BLACK,
+                dob=date(1980, 1, 1),
+                formula_name="cockcroft-gault",
+                baseline_egfr_value=110.0,
+            ),
+            dict(
+                gender=MALE,
+                ethnicity=BLACK,
+                age_in_years=40,
+                formula_name="ckd-epi",
+                baseline_egfr_value=150.0,
+            ),
+        ]:
+            with self.subTest(**opts):
+                subject_egfr = SubjectEgfr(
+                    reference_range_collection_name="my_reference_list", **opts
+                )
+                self.assert_matches_egfr(subject_egfr, **opts)
+
+    def test_age_on_report_date(self):
+        # birthday on 29 Feb, turns 35 on 28 Feb 2023 (UTC)
+        opts = dict(
+            gender=MALE, ethnicity=BLACK, dob=date(1988, 2, 29), formula_name="ckd-epi"
+        )
+        subject_egfr = SubjectEgfr(reference_range_collection_name="my_reference_list", **opts)
+        self.assertEqual(subject_egfr.get_age_in_years(self.rows[0][0]), 34)
+        self.assertEqual(subject_egfr.get_age_in_years(self.rows[1][0]), 35)
+        self.assert_matches_egfr(subject_egfr, **opts)
+
+    def test_errors(self):
+        with self.assertRaises(EgfrError):
+            SubjectEgfr(
+                gender=MALE,
+                dob=date(1990, 5, 1),
+                formula_name="blah",
+                reference_range_collection_name="my_reference_list",
+            )
+        with self.assertRaises(EgfrError):
+            SubjectEgfr(
+                gender=MALE,
+                formula_name="ckd-epi",
+                reference_range_collection_name="my_reference_list",
+            )
+        subject_egfr = SubjectEgfr(
+            gender=MALE,
+            ethnicity=BLACK,
+            dob=date(1990, 5, 1),
+            formula_name="ckd-epi",
+            reference_range_collection_name="my_reference_list",
+        )
+        results = subject_egfr.evaluate_many(
+            [(self.rows[0][0], None, MICROMOLES_PER_LITER, None), self.rows[0]]
+        )
+        self.assertIsNone(results[0].egfr_value)
+        self.assertIn("Unable to calculate", results[0].error)
+        self.assertIsNotNone(results[1].egfr_value)
+
+    def get_grading_table(self, *grades_and_lower: tuple[int, float], age_lower=18):
+        return CompiledGradingTable(
+            "egfr",
+            [
+                CompiledGradeReference(
+                    grade=grade,
+                    gender=MALE,
+                    units=EGFR_UNITS,
+                    lower=lower,
+                    upper=None,
+                    lower_inclusive=True,
+                    upper_inclusive=False,
+                    age_lower=age_lower,
+                    age_upper=None,
+                    age_lower_inclusive=True,
+                    age_upper_inclusive=False,
+                )
+                for grade, lower in grades_and_lower
+            ],
+        )
+
+    def test_grading_errors_raised_as_egfr(self):
+        subject_egfr = SubjectEgfr(
+            gender=MALE,
+            ethnicity=BLACK,
+            dob=date(1990, 5, 1),
+            formula_name="ckd-epi",
+            reference_range_collection_name="my_reference_list",
+        )
+        # no reference for a subject of 32
+        subject_egfr.egfr_grading_table = self.get_grading_table((2, 0), age_lower=65)
+        self.assertIsNone(subject_egfr.egfr_grading_table.get_grade(50, MALE, 32, EGFR_UNITS))
+        with self.assertRaises(NotEvaluated):
+            subject_egfr.evaluate(*self.rows[0])
+        results = subject_egfr.evaluate_many(self.rows[:1])
+        self.assertIsNone(results[0].egfr_grade)
+        self.assertIn("not graded", results[0].error)
+
+        subject_egfr.egfr_grading_table = self.get_grading_table((2, 0), (3, 10))
+        self.assertEqual(subject_egfr.egfr_grading_table.get_grade(5, MALE, 32, EGFR_UNITS), 2)
+        self.assertEqual(
+            subject_egfr.egfr_grading_table.get_grade(50, MALE, 32, EGFR_UNITS), 3
+        )
+        with self.assertRaises(BoundariesOverlap):
+            subject_egfr.evaluate(*self.rows[0])
+        results = subject_egfr.evaluate_many(self.rows[:1])
+        self.assertIsNone(results[0].egfr_grade)
+        self.assertIn("more than one grade", results[0].error)
@@ -0,0 +1,167 @@
+import json
+import sys
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from edc_constants.constants import BLACK, FEMALE, MALE
+from edc_reportable import MICROMOLES_PER_LITER, MILLIGRAMS_PER_DECILITER
+
+from edc_egfr import calculators
+from edc_egfr.calculators import EgfrCkdEpi, EgfrCockcroftGault
+
+
+class TestBatchEgfrView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="erik")
+        self.client.force_login(self.user)
+        self.url = reverse("edc_egfr:batch_egfr_url")
+        self.rows = [
+            dict(
+                id="A1",
+                gender=MALE,
+                ethnicity=BLACK,
+                age_in_years=30,
+                creatinine_value=53.0,
+                creatinine_units=MICROMOLES_PER_LITER,
+                weight=65,
+            ),
+            dict(
+                id="A2",
+                gender=FEMALE,
+                ethnicity=BLACK,
+                age_in_years="45",
+                creatinine_value=1.3,
+                creatinine_units=MILLIGRAMS_PER_DECILITER,
+                weight=72.5,
+            ),
+            dict(
+                id="A3",
+                gender=MALE,
+                ethnicity=BLACK,
+                age_in_years=17,
+                creatinine_value=53.0,
+                creatinine_units=MICROMOLES_PER_LITER,
+            ),
+        ]
+
+    def post_json_lines(self, lines: list[str], formula_name="ckd-epi"):
+        return self.client.post(
+            f"{self.url}?formula_name={formula_name}",
+            data="\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+    @staticmethod
+    def get_results(response) -> list[dict]:
+        content = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_json_lines(self):
+        lines = [json.dumps(row) for row in self.rows]
+        for formula_name, calculator_cls in [
+            ("ckd-epi", EgfrCkdEpi),
+            ("cockcroft-gault", EgfrCockcroftGault),
+        ]:
+            with self.subTest(formula_name=formula_name):
+                response = self.post_json_lines(lines, formula_name=formula_name)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                results = self.get_results(response)
+                self.assertEqual([r["row"] for r in results], [0, 1, 2])
+                self.assertEqual([r["id"] for r in results], ["A1", "A2", "A3"])
+                for row, result in zip(self.rows[:2], results):
+                    opts = {k: v for k, v in row.items() if k != "id"}
+                    opts.update(age_in_years=int(opts["age_in_years"]))
+                    self.assertIsNone(result["error"])
+                    self.assertEqual(result["egfr_value"], calculator_cls(**opts).value)
+                self.assertEqual(results[2]["error"], "invalid_age")
+                self.assertIsNone(results[2]["egfr_value"])
+
+    def test_row_errors(self):
+        response = self.post_json_lines(
+            [
+                json.dumps(self.rows[0]),
+                "{blah",
+                json.dumps([1, 2]),
+                json.dumps(dict(self.rows[1], creatinine_value="abc")),
+                "",
+                json.dumps(dict(self.rows[1], ethnicity=None)),
+            ]
+        )
+        results = self.get_results(response)
+        self.assertEqual(
+            [r["error"] for r in results],
+            [None, "invalid_json", "invalid_row", "invalid_value", "missing_ethnicity"],
+        )
+
+    def test_json(self):
+        response = self.client.post(
+            self.url,
+            data=dict(formula_name="ckd-epi", rows=self.rows),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.get_results(response)), 3)
+        response = self.client.post(
+            f"{self.url}?formula_name=ckd-epi", data=self.rows, content_type="application/json"
+        )
+        self.assertEqual(len(self.get_results(response)), 3)
+
+    def test_chunks(self):
+        lines = [json.dumps(self.rows[0])] * 2500
+        response = self.post_json_lines(lines)
+        results = self.get_results(response)
+        self.assertEqual([r["row"] for r in results], list(range(2500)))
+        self.assertEqual(len({r["egfr_value"] for r in results}), 1)
+
+    def test_bad_requests(self):
+        response = self.post_json_lines([json.dumps(self.rows[0])], formula_name="blah")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid formula_name", response.json()["error"])
+        response = self.client.post(self.url, data="{blah", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        with override_settings(EDC_EGFR_BATCH_MAX_ROWS=2):
+            response = self.post_json_lines([json.dumps(row) for row in self.rows])
+            self.assertEqual(response.status_code, 413)
+        with override_settings(EDC_EGFR_BATCH_MAX_BYTES=100):
+            response = self.post_json_lines([json.dumps(row) for row in self.rows])
+            self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.client.logout()
+        response = self.post_json_lines([json.dumps(self.rows[0])])
+        self.assertEqual(response.status_code, 403)
+
+    def test_csrf_checked(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+        response = self.post_json_lines([json.dumps(self.rows[0])])
+        self.assertEqual(response.status_code, 403)
+        request = RequestFactory().get("/")
+        token = get_token(request)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = request.META["CSRF_COOKIE"]
+        response = self.client.post(
+            f"{self.url}?formula_name=ckd-epi",
+            data=json.dumps(self.rows[0]),
+            content_type="application/x-ndjson",
+            HTTP_X_CSRFTOKEN=token,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_numpy_not_installed(self):
+        # as if the batch kernels failed to import numpy
+        with (
+            patch.dict(
+                sys.modules,
+                {"edc_egfr.calculators.batch": None, "edc_egfr.calculators.vectorized": None},
+            ),
+            patch.dict(calculators.__dict__),
+        ):
+            calculators.__dict__.pop("batch", None)
+            calculators.__dict__.pop("vectorized", None)
+            response = self.post_json_lines([json.dumps(self.rows[0])])
+        self.assertEqual(response.status_code, 501)
+        self.assertIn("requires numpy", response.json()["error"])
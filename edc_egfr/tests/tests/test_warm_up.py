@@ -0,0 +1,58 @@
+from django.test import TestCase, override_settings
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+
+from edc_egfr.get_drop_notification_model import get_egfr_drop_notification_model_cls
+from edc_egfr.grading import get_compiled_grading_table
+from edc_egfr.system_checks import egfr_drop_notification_model_check
+from edc_egfr.warm_up import warm_up_egfr
+from egfr_app.models import EgfrDropNotification
+
+
+@override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.EgfrDropNotification")
+class TestWarmUp(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+
+    def test_warm_up(self):
+        report = warm_up_egfr()
+        self.assertEqual(report.notification_model, "egfr_app.egfrdropnotification")
+        self.assertEqual(report.collections, ["my_reference_list"])
+        self.assertEqual(report.messages, [])
+        self.assertIn("eGFR warm-up took", str(report))
+        self.assertIs(get_egfr_drop_notification_model_cls(), EgfrDropNotification)
+
+    def test_skips_unknown_collection(self):
+        report = warm_up_egfr(["my_reference_list", "blah"])
+        self.assertEqual(report.collections, ["my_reference_list"])
+        self.assertIn("blah", report.skipped)
+
+    def test_compiled_tables_are_cached(self):
+        table = get_compiled_grading_table("my_reference_list", "egfr")
+        self.assertIs(get_compiled_grading_table("my_reference_list", "egfr"), table)
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        self.assertIsNot(get_compiled_grading_table("my_reference_list", "egfr"), table)
+
+    def test_system_check(self):
+        self.assertEqual(egfr_drop_notification_model_check(None), [])
+        with override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL=None):
+            self.assertEqual(
+                [e.id for e in egfr_drop_notification_model_check(None)], ["edc_egfr.W001"]
+            )
+            self.assertEqual(warm_up_egfr().notification_model, None)
+        with override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.blah"):
+            self.assertEqual(
+                [e.id for e in egfr_drop_notification_model_check(None)], ["edc_egfr.E001"]
+            )
+        with override_settings(EDC_EGFR_DROP_NOTIFICATION_MODEL="egfr_app.ResultCrf"):
+            self.assertEqual(
+                [e.id for e in egfr_drop_notification_model_check(None)], ["edc_egfr.E002"]
+            )
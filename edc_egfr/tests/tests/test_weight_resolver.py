@@ -0,0 +1,90 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+from edc_lab import site_labs
+from edc_reportable import site_reportables
+from edc_reportable.grading_data.daids_july_2017 import grading_data
+from edc_reportable.normal_data.africa import normal_data
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from edc_egfr.weight_resolver import WeightResolver
+from egfr_app.lab_profiles import lab_profile
+from egfr_app.models import ResultCrf, SubjectVitals
+from egfr_app.visit_schedules import visit_schedule
+
+from ..helper import Helper
+
+
+class TestWeightResolver(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        site_reportables._registry = {}
+        site_reportables.register(
+            name="my_reference_list", normal_data=normal_data, grading_data=grading_data
+        )
+        site_labs.initialize()
+        site_labs.register(lab_profile=lab_profile)
+
+    def setUp(self) -> None:
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule)
+        self.helper = Helper()
+        self.visits = {}
+        for subject_identifier in ["1234", "5678"]:
+            self.helper.make_registered_subject(subject_identifier)
+            self.visits[subject_identifier] = [
+                self.helper.make_subject_visit(subject_identifier, timepoint=timepoint)
+                for timepoint in range(0, 3)
+            ]
+        # 1234 has weights at visits 0 and 2, 5678 at visit 1 only
+        for subject_visit, weight in [
+            (self.visits["1234"][0], Decimal("60.0")),
+            (self.visits["1234"][2], Decimal("62.0")),
+            (self.visits["5678"][1], Decimal("70.0")),
+        ]:
+            SubjectVitals.objects.create(
+                subject_visit=subject_visit,
+                report_datetime=subject_visit.report_datetime,
+                weight=weight,
+            )
+
+    def test_most_recent_weight_at_or_before_visit(self):
+        resolver = WeightResolver("egfr_app.subjectvitals")
+        visits = self.visits["1234"]
+        self.assertEqual(resolver.get_weight("1234", visits[0].report_datetime), 60)
+        self.assertEqual(resolver.get_weight("1234", visits[1].report_datetime), 60)
+        self.assertEqual(resolver.get_weight("1234", visits[2].report_datetime), 62)
+        self.assertIsNone(
+            resolver.get_weight("1234", visits[0].report_datetime - relativedelta(days=1))
+        )
+
+    def test_weights_are_cached_per_subject(self):
+        resolver = WeightResolver("egfr_app.subjectvitals")
+        with self.assertNumQueries(1):
+            for subject_visit in self.visits["1234"]:
+                resolver.get_weight("1234", subject_visit.report_datetime)
+
+    def test_resolve_batch_with_one_query(self):
+        resolver = WeightResolver("egfr_app.subjectvitals")
+        visits = self.visits["1234"] + self.visits["5678"]
+        with self.assertNumQueries(1):
+            weights = resolver.resolve(visits)
+        self.assertEqual(
+            [weights[v.id] for v in visits],
+            [60, 60, 62, None, 70, 70],
+        )
+
+    def test_resolve_refetches_beyond_cached_window(self):
+        resolver = WeightResolver("egfr_app.subjectvitals")
+        visits = self.visits["1234"]
+        self.assertEqual(resolver.resolve(visits[:2])[visits[1].id], 60)
+        self.assertEqual(resolver.resolve(visits[2:])[visits[2].id], 62)
+
+    def test_model_mixin_uses_resolver(self):
+        subject_visit = self.visits["1234"][1]
+        crf = self.helper.make_result_crf(subject_visit)
+        self.assertIsNone(crf.get_weight_in_kgs_for_egfr())
+        with patch.object(ResultCrf, "egfr_weight_model", "egfr_app.subjectvitals"):
+            self.assertEqual(crf.get_weight_in_kgs_for_egfr(), 60)
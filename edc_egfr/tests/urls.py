@@ -1,4 +1,7 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
-urlpatterns = [path(r"admin/", admin.site.urls)]
+urlpatterns = [
+    path(r"admin/", admin.site.urls),
+    path("edc_egfr/", include("edc_egfr.urls")),
+]
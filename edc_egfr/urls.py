@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import BatchEgfrView
+
+app_name = "edc_egfr"
+
+urlpatterns = [
+    path("batch/", BatchEgfrView.as_view(), name="batch_egfr_url"),
+]
@@ -0,0 +1,237 @@
+"""Batch eGFR calculation over HTTP.
+
+Requires numpy (pip install edc-egfr[pandas]). numpy is imported
+on the first request, not with this module, and the view responds
+501 if it is not installed.
+
+POST rows of calculator keyword arguments, as passed to `EgfrCkdEpi`
+or `EgfrCockcroftGault`, either as JSON Lines, one row per line, or
+as JSON, `{"formula_name": ..., "rows": [...]}`. For JSON Lines
+pass the formula name in the query string, e.g.
+`?formula_name=ckd-epi`.
+
+Rows are calculated in chunks with the batch kernels and results
+are streamed back as JSON Lines in input order:
+
+    {"row": 0, "id": "A1", "egfr_value": 105.78, "error": null}
+    {"row": 1, "id": "A2", "egfr_value": null, "error": "invalid_age"}
+
+`id` is echoed from the input row, if given. `error` is one of
+`batch.error_reasons` or "invalid_json", "invalid_row" or
+"invalid_value".
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from types import ModuleType
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
+from django.views import View
+
+INVALID_JSON = "invalid_json"
+INVALID_ROW = "invalid_row"
+INVALID_VALUE = "invalid_value"
+
+JSON_LINES_CONTENT_TYPES = [
+    "application/jsonl",
+    "application/x-ndjson",
+    "application/x-jsonlines",
+]
+NUMERIC_FIELDS = ["age_in_years", "creatinine_value", "weight"]
+TEXT_FIELDS = ["gender", "ethnicity", "creatinine_units"]
+
+
+class BatchRequestError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_batch_max_rows() -> int:
+    """Returns the maximum number of rows in one request.
+
+    Set `EDC_EGFR_BATCH_MAX_ROWS`, default 10000.
+    """
+    return getattr(settings, "EDC_EGFR_BATCH_MAX_ROWS", 10000)
+
+
+def get_batch_max_bytes() -> int:
+    """Returns the maximum size of a request body in bytes.
+
+    Set `EDC_EGFR_BATCH_MAX_BYTES`, default 5MB.
+    """
+    return getattr(settings, "EDC_EGFR_BATCH_MAX_BYTES", 5 * 1024 * 1024)
+
+
+def import_batch_kernels() -> tuple[ModuleType, ModuleType]:
+    """Returns the `batch` and `vectorized` calculator modules or
+    raises if numpy is not installed.
+    """
+    try:
+        from .calculators import batch, vectorized
+    except ImportError as e:
+        raise BatchRequestError(
+            f"Batch calculation requires numpy (pip install edc-egfr[pandas]). Got {e}.",
+            status=501,
+        )
+    return batch, vectorized
+
+
+def read_body(request: HttpRequest, max_bytes: int) -> bytes:
+    """Returns the request body or raises if larger than
+    `max_bytes`.
+
+    Reads the stream directly so the limit applies instead of
+    `DATA_UPLOAD_MAX_MEMORY_SIZE`.
+    """
+    content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    if content_length > max_bytes:
+        raise BatchRequestError(f"Request body exceeds {max_bytes} bytes.", status=413)
+    body = request.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise BatchRequestError(f"Request body exceeds {max_bytes} bytes.", status=413)
+    return body
+
+
+def parse_json_lines(body: bytes) -> list[dict | str]:
+    """Returns a row, or an error reason, for each non-blank line."""
+    rows = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            rows.append(INVALID_JSON)
+    return rows
+
+
+def parse_json(body: bytes) -> tuple[str | None, list]:
+    """Returns the formula name and rows of a JSON request body."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise BatchRequestError("Invalid JSON.")
+    if isinstance(data, list):
+        return None, data
+    if not isinstance(data, dict) or not isinstance(data.get("rows"), list):
+        raise BatchRequestError('Expected a list of rows or {"rows": [...]}.')
+    return data.get("formula_name"), data["rows"]
+
+
+def as_number(value: Any) -> float | None:
+    """Returns a float, None for a missing value, or raises
+    ValueError.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(value)
+    return value
+
+
+def clean_row(row: Any) -> tuple[dict, str | None]:
+    """Returns calculator keyword arguments and an error reason,
+    if the row cannot be used.
+    """
+    if isinstance(row, str):
+        return {}, row
+    if not isinstance(row, dict):
+        return {}, INVALID_ROW
+    cleaned = {}
+    for name in TEXT_FIELDS:
+        value = row.get(name)
+        if value is not None and not isinstance(value, str):
+            return {}, INVALID_VALUE
+        cleaned[name] = value
+    for name in NUMERIC_FIELDS:
+        try:
+            cleaned[name] = as_number(row.get(name))
+        except (TypeError, ValueError):
+            return {}, INVALID_VALUE
+    return cleaned, None
+
+
+def evaluate_chunk(formula_name: str, rows: list, start: int) -> str:
+    """Returns JSON Lines for a chunk of parsed rows."""
+    batch, vectorized = import_batch_kernels()
+    cleaned = [clean_row(row) for row in rows]
+    result = batch.evaluate_batch(
+        formula_name,
+        vectorized.EgfrInputs.from_values(
+            **{
+                name: [kwargs.get(name) for kwargs, _ in cleaned]
+                for name in TEXT_FIELDS + NUMERIC_FIELDS
+            }
+        ),
+    )
+    lines = []
+    for index, (row, (_, error), value, code) in enumerate(
+        zip(rows, cleaned, result.values.tolist(), result.error_codes.tolist())
+    ):
+        error = error or (None if code == batch.OK else batch.error_reasons[code])
+        lines.append(
+            json.dumps(
+                {
+                    "row": start + index,
+                    "id": row.get("id") if isinstance(row, dict) else None,
+                    "egfr_value": None if error else value,
+                    "error": error,
+                }
+            )
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def stream_results(formula_name: str, rows: list, chunk_size: int) -> Iterator[str]:
+    for start in range(0, len(rows), chunk_size):
+        yield evaluate_chunk(formula_name, rows[start : start + chunk_size], start)
+
+
+class BatchEgfrView(LoginRequiredMixin, View):
+    """Calculates eGFR for a batch of rows and streams the results
+    as JSON Lines.
+    """
+
+    http_method_names = ["post"]
+    raise_exception = True
+    chunk_size = 1000
+
+    def post(self, request: HttpRequest, *args, **kwargs):
+        try:
+            formula_name, rows = self.get_rows(request)
+        except BatchRequestError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+        return StreamingHttpResponse(
+            stream_results(formula_name, rows, self.chunk_size),
+            content_type="application/x-ndjson",
+        )
+
+    @staticmethod
+    def get_rows(request: HttpRequest) -> tuple[str, list]:
+        _, vectorized = import_batch_kernels()
+        body = read_body(request, get_batch_max_bytes())
+        formula_name = request.GET.get("formula_name")
+        if request.content_type in JSON_LINES_CONTENT_TYPES:
+            rows = parse_json_lines(body)
+        else:
+            json_formula_name, rows = parse_json(body)
+            formula_name = formula_name or json_formula_name
+        if formula_name not in vectorized.calculators:
+            raise BatchRequestError(
+                f"Invalid formula_name. Expected one of {list(vectorized.calculators)}. "
+                f"Got {formula_name}."
+            )
+        max_rows = get_batch_max_rows()
+        if len(rows) > max_rows:
+            raise BatchRequestError(f"Expected at most {max_rows} rows.", status=413)
+        return formula_name, rows
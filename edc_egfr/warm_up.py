@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from importlib import import_module
+
+from django.conf import settings
+from edc_reportable import site_reportables
+
+from .get_drop_notification_model import get_egfr_drop_notification_model_cls
+from .grading import (
+    CompiledGradingError,
+    get_compiled_grading_table,
+    get_grading_cache_dir,
+)
+from .system_checks import egfr_drop_notification_model_check
+
+warm_up_modules = ["edc_egfr.calculators", "edc_egfr.egfr", "edc_egfr.grading"]
+
+
+@dataclass
+class WarmUpReport:
+    seconds: float = 0.0
+    notification_model: str | None = None
+    # reference range collections compiled
+    collections: list[str] = field(default_factory=list)
+    # {name: reason}
+    skipped: dict[str, str] = field(default_factory=dict)
+    # system check messages for the notification model setting
+    messages: list[str] = field(default_factory=list)
+    # grading cache files written or found, see `write_grading_cache`
+    grading_cache_files: list[str] = field(default_factory=list)
+
+    def __str__(self):
+        text = f"eGFR warm-up took {self.seconds * 1000:.0f}ms"
+        if self.collections:
+            text += f", compiled grading for {', '.join(self.collections)}"
+        if self.skipped:
+            text += f", skipped {', '.join(self.skipped)}"
+        return text
+
+
+def get_warm_up() -> bool:
+    """Returns True if `AppConfig.ready` should call
+    `warm_up_egfr()`.
+
+    Set `EDC_EGFR_WARM_UP`, default False.
+    """
+    return getattr(settings, "EDC_EGFR_WARM_UP", False)
+
+
+def warm_up_egfr(reference_range_collection_names: list[str] | None = None) -> WarmUpReport:
+    """Does the once-per-process work of the first eGFR save ahead of
+    time, e.g. in each worker after fork.
+
+    Imports the calculators, resolves and caches the drop
+    notification model class, and compiles the "egfr" and
+    "egfr_drop" grading tables of each reference range collection.
+    Collections default to `EDC_EGFR_WARM_UP_REFERENCE_RANGE_COLLECTIONS`
+    or, if not set, all registered with `site_reportables`.
+
+    If `EDC_EGFR_GRADING_CACHE_DIR` is set, the grading cache file of
+    each collection is written if it is missing or out of date.
+    """
+    start = time.perf_counter()
+    report = WarmUpReport()
+    for module in warm_up_modules:
+        import_module(module)
+    report.messages = [
+        f"{message.id}: {message.msg}" for message in egfr_drop_notification_model_check(None)
+    ]
+    if not report.messages:
+        report.notification_model = get_egfr_drop_notification_model_cls()._meta.label_lower
+    names = (
+        reference_range_collection_names
+        or getattr(settings, "EDC_EGFR_WARM_UP_REFERENCE_RANGE_COLLECTIONS", None)
+        or [name for name, _ in site_reportables]
+    )
+    for name in names:
+        try:
+            get_compiled_grading_table(name, "egfr")
+            get_compiled_grading_table(name, "egfr_drop")
+        except CompiledGradingError as e:
+            report.skipped[name] = str(e)
+        else:
+            report.collections.append(name)
+    if get_grading_cache_dir() and report.collections:
+        from .grading_cache import write_grading_cache
+
+        for name in report.collections:
+            report.grading_cache_files.append(str(write_grading_cache(name)))
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Iterable
+
+from django.apps import apps as django_apps
+
+if TYPE_CHECKING:
+    from django.db import models
+    from edc_visit_tracking.typing_stubs import RelatedVisitProtocol
+
+
+class WeightResolver:
+    """Resolves the most recent weight at or before a visit from a
+    vitals model, e.g. a vitals CRF.
+
+    Weights are fetched once per subject and cached. Use `resolve()`
+    to fetch the weights for a batch of visits with a single query.
+
+    Set `using` to read from a database other than the default, e.g.
+    a read replica.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        field_name: str | None = None,
+        related_visit_model_attr: str | None = None,
+        datetime_field: str | None = None,
+        using: str | None = None,
+    ):
+        self.model = model
+        self.using = using
+        self.field_name = field_name or "weight"
+        self.related_visit_model_attr = related_visit_model_attr or "subject_visit"
+        self.datetime_field = datetime_field or "report_datetime"
+        # {subject_identifier: ([report_datetime, ...], [weight, ...])}
+        self._cache: dict[str, tuple[list[datetime], list[Decimal]]] = {}
+        # {subject_identifier: upper bound of the cached window or None}
+        self._cached_upto: dict[str, datetime | None] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(model={self.model}, field_name={self.field_name})"
+
+    @property
+    def model_cls(self) -> models.Model:
+        return django_apps.get_model(self.model)
+
+    def get_weight(self, subject_identifier: str, report_datetime: datetime) -> Decimal | None:
+        """Returns the most recent weight at or before `report_datetime`
+        or None.
+        """
+        if not self.is_cached(subject_identifier, report_datetime):
+            self.prefetch([subject_identifier])
+        datetimes, weights = self._cache[subject_identifier]
+        index = bisect_right(datetimes, report_datetime)
+        return weights[index - 1] if index else None
+
+    def resolve(self, related_visits: Iterable[RelatedVisitProtocol]) -> dict:
+        """Returns a dictionary of {related_visit.id: weight} for a
+        batch of related visits.
+
+        Weights for subjects not yet cached are fetched in a single
+        query windowed up to the latest visit in the batch.
+        """
+        related_visits = list(related_visits)
+        upto = max((v.report_datetime for v in related_visits), default=None)
+        subject_identifiers = {
+            v.subject_identifier
+            for v in related_visits
+            if not self.is_cached(v.subject_identifier, v.report_datetime)
+        }
+        if subject_identifiers:
+            self.prefetch(subject_identifiers, upto=upto)
+        return {
+            v.id: self.get_weight(v.subject_identifier, v.report_datetime)
+            for v in related_visits
+        }
+
+    def prefetch(self, subject_identifiers: Iterable[str], upto: datetime | None = None):
+        """Fetches and caches the weights for the given subjects with
+        one query.
+        """
+        subject_identifiers = set(subject_identifiers)
+        subject_identifier_field = f"{self.related_visit_model_attr}__subject_identifier"
+        opts = {
+            f"{subject_identifier_field}__in": subject_identifiers,
+            f"{self.field_name}__isnull": False,
+        }
+        if upto:
+            opts.update({f"{self.datetime_field}__lte": upto})
+        queryset = (
+            self.model_cls._default_manager.using(self.using)
+            .filter(**opts)
+            .values_list(subject_identifier_field, self.datetime_field, self.field_name)
+            .order_by(subject_identifier_field, self.datetime_field)
+        )
+        data = defaultdict(lambda: ([], []))
+        for subject_identifier, report_datetime, weight in queryset:
+            data[subject_identifier][0].append(report_datetime)
+            data[subject_identifier][1].append(weight)
+        for subject_identifier in subject_identifiers:
+            self._cache[subject_identifier] = data[subject_identifier]
+            self._cached_upto[subject_identifier] = upto
+
+    def is_cached(self, subject_identifier: str, report_datetime: datetime) -> bool:
+        if subject_identifier not in self._cache:
+            return False
+        upto = self._cached_upto.get(subject_identifier)
+        return upto is None or report_datetime <= upto
+
+    def clear(self) -> None:
+        self._cache = {}
+        self._cached_upto = {}
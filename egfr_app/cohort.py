@@ -0,0 +1,247 @@
+"""A synthetic cohort for load testing the eGFR save path.
+
+`SyntheticCohort` bulk-creates subjects with a registration, a
+consent and, for each visit of the `egfr_app` schedule, an
+appointment, a visit, an RFT requisition and a `ResultCrf` with a
+creatinine value. Rows are inserted with `bulk_create`, so
+`ResultCrf.save()` is not called and `egfr_value` is left empty
+for `EgfrLoadTest` to fill in.
+
+Creatinine follows one of these trajectories per subject:
+
+    stable: the baseline value with about 5% noise each visit
+    declining: rising 10-30% a visit, i.e. a falling eGFR
+    aki: stable except for one visit at 1.8-3 times the baseline
+
+The same `seed` gives the same cohort.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from edc_appointment.constants import SCHEDULED_APPT
+from edc_appointment.models import Appointment
+from edc_constants.constants import BLACK, FEMALE, MALE, NON_BLACK
+from edc_lab.models import Panel
+from edc_lab_panel.panels import rft_panel
+from edc_registration.models import RegisteredSubject
+from edc_reportable import MICROMOLES_PER_LITER
+from edc_utils import get_utcnow
+from edc_visit_tracking.constants import SCHEDULED
+
+from edc_egfr.get_drop_notification_model import get_egfr_drop_notification_model_cls
+
+from .consents import consent_v1
+from .models import ResultCrf, SubjectConsent, SubjectRequisition, SubjectVisit
+from .visit_schedules import schedule, visit_schedule
+
+STABLE = "stable"
+DECLINING = "declining"
+AKI = "aki"
+
+# share of subjects by trajectory
+trajectories = {STABLE: 0.80, DECLINING: 0.15, AKI: 0.05}
+
+# median baseline creatinine, umol/L, by gender
+baseline_creatinine = {MALE: 85.0, FEMALE: 68.0}
+
+
+@dataclass
+class CohortSummary:
+    subjects: int = 0
+    visits: int = 0
+    results: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.subjects} subjects, {self.visits} visits, {self.results} results "
+            f"({self.seconds:.1f}s)"
+        )
+
+
+class SyntheticCohort:
+    """Bulk-creates `subjects` synthetic subjects with identifiers
+    `<prefix>-000001`, `<prefix>-000002`, ...
+
+    Subjects are inserted `batch_size` at a time, each batch in its
+    own transaction. Enrolment dates are spread over the
+    `enrolment_days` before `base_datetime`.
+    """
+
+    def __init__(
+        self,
+        subjects: int | None = None,
+        prefix: str | None = None,
+        seed: int | None = None,
+        site_id: int | None = None,
+        base_datetime: datetime | None = None,
+        enrolment_days: int | None = None,
+        batch_size: int | None = None,
+    ):
+        self.subjects = subjects or 1000
+        self.prefix = prefix or "SYN"
+        self.random = random.Random(seed)
+        self.site_id = site_id or settings.SITE_ID
+        self.base_datetime = base_datetime or get_utcnow() - relativedelta(days=10)
+        self.enrolment_days = enrolment_days or 30
+        self.batch_size = batch_size or 500
+        self.visits = sorted(schedule.visits.values(), key=lambda visit: visit.timepoint)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(subjects={self.subjects}, prefix={self.prefix})"
+
+    def get_subject_identifier(self, index: int) -> str:
+        return f"{self.prefix}-{index:06d}"
+
+    def make(self) -> CohortSummary:
+        """Creates the cohort and returns the row counts."""
+        summary = CohortSummary()
+        start = time.perf_counter()
+        panel = Panel.objects.get(name=rft_panel.name)
+        for first in range(1, self.subjects + 1, self.batch_size):
+            last = min(first + self.batch_size, self.subjects + 1)
+            with transaction.atomic():
+                summary.visits += self.make_batch(range(first, last), panel)
+            summary.subjects += last - first
+        summary.results = summary.visits
+        summary.seconds = time.perf_counter() - start
+        return summary
+
+    def make_batch(self, indexes: range, panel: Panel) -> int:
+        """Creates the subjects of one batch and returns the number of
+        visits.
+        """
+        registered_subjects, consents = [], []
+        appointments, subject_visits, requisitions, results = [], [], [], []
+        for index in indexes:
+            subject_identifier = self.get_subject_identifier(index)
+            gender = self.random.choice([MALE, FEMALE])
+            ethnicity = self.random.choices([BLACK, NON_BLACK], [0.6, 0.4])[0]
+            age_in_years = self.random.randint(consent_v1.age_min, consent_v1.age_max)
+            enrolment_datetime = self.base_datetime - relativedelta(
+                days=self.random.randint(0, self.enrolment_days)
+            )
+            dob = (enrolment_datetime - relativedelta(years=age_in_years, days=1)).date()
+            registered_subjects.append(
+                RegisteredSubject(
+                    subject_identifier=subject_identifier,
+                    gender=gender,
+                    dob=dob,
+                    ethnicity=ethnicity,
+                    consent_datetime=enrolment_datetime,
+                    registration_datetime=enrolment_datetime,
+                    site_id=self.site_id,
+                )
+            )
+            consents.append(
+                SubjectConsent(
+                    subject_identifier=subject_identifier,
+                    consent_datetime=enrolment_datetime,
+                    identity=subject_identifier,
+                    confirm_identity=subject_identifier,
+                    dob=dob,
+                    version=consent_v1.version,
+                    consent_definition_name=consent_v1.name,
+                    site_id=self.site_id,
+                )
+            )
+            creatinine_values = self.get_creatinine_values(gender)
+            for visit, creatinine_value in zip(self.visits, creatinine_values):
+                report_datetime = enrolment_datetime + visit.rbase
+                report_datetime += relativedelta(minutes=self.random.randint(0, 360))
+                appointment = Appointment(
+                    subject_identifier=subject_identifier,
+                    appt_datetime=report_datetime,
+                    timepoint=visit.timepoint,
+                    timepoint_datetime=report_datetime,
+                    visit_code=visit.code,
+                    visit_code_sequence=0,
+                    visit_schedule_name=visit_schedule.name,
+                    schedule_name=schedule.name,
+                    appt_reason=SCHEDULED_APPT,
+                    site_id=self.site_id,
+                )
+                subject_visit = SubjectVisit(
+                    subject_identifier=subject_identifier,
+                    appointment=appointment,
+                    report_datetime=report_datetime,
+                    visit_code=visit.code,
+                    visit_code_sequence=0,
+                    visit_schedule_name=visit_schedule.name,
+                    schedule_name=schedule.name,
+                    reason=SCHEDULED,
+                    site_id=self.site_id,
+                )
+                requisition = SubjectRequisition(
+                    subject_identifier=subject_identifier,
+                    subject_visit=subject_visit,
+                    report_datetime=report_datetime,
+                    requisition_datetime=report_datetime,
+                    panel=panel,
+                )
+                appointments.append(appointment)
+                subject_visits.append(subject_visit)
+                requisitions.append(requisition)
+                results.append(
+                    ResultCrf(
+                        subject_visit=subject_visit,
+                        requisition=requisition,
+                        report_datetime=report_datetime,
+                        assay_datetime=report_datetime,
+                        creatinine_value=creatinine_value,
+                        creatinine_units=MICROMOLES_PER_LITER,
+                    )
+                )
+        RegisteredSubject.objects.bulk_create(registered_subjects)
+        SubjectConsent.objects.bulk_create(consents)
+        Appointment.objects.bulk_create(appointments)
+        SubjectVisit.objects.bulk_create(subject_visits)
+        SubjectRequisition.objects.bulk_create(requisitions)
+        ResultCrf.objects.bulk_create(results)
+        return len(subject_visits)
+
+    def get_creatinine_values(self, gender: str) -> list[Decimal]:
+        """Returns a creatinine value, in umol/L, for each visit."""
+        trajectory = self.random.choices(list(trajectories), list(trajectories.values()))[0]
+        baseline = baseline_creatinine[gender] * self.random.lognormvariate(0, 0.15)
+        rate = self.random.uniform(0.10, 0.30)
+        aki_index = self.random.randrange(1, len(self.visits))
+        values = []
+        for index in range(len(self.visits)):
+            value = baseline * self.random.gauss(1.0, 0.05)
+            if trajectory == DECLINING:
+                value *= (1 + rate) ** index
+            elif trajectory == AKI and index == aki_index:
+                value *= self.random.uniform(1.8, 3.0)
+            values.append(Decimal(str(round(min(value, 9999.0), 2))))
+        return values
+
+    def delete(self) -> int:
+        """Deletes the rows of subjects with this prefix and returns
+        the number of subjects deleted.
+        """
+        lookup = dict(subject_identifier__startswith=f"{self.prefix}-")
+        visit_lookup = dict(subject_visit__subject_identifier__startswith=f"{self.prefix}-")
+        with transaction.atomic():
+            try:
+                notification_model_cls = get_egfr_drop_notification_model_cls()
+            except (AttributeError, LookupError):
+                pass
+            else:
+                notification_model_cls.objects.filter(**visit_lookup).delete()
+            ResultCrf.objects.filter(**visit_lookup).delete()
+            SubjectRequisition.objects.filter(**lookup).delete()
+            SubjectVisit.objects.filter(**lookup).delete()
+            Appointment.objects.filter(**lookup).delete()
+            SubjectConsent.objects.filter(**lookup).delete()
+            deleted, _ = RegisteredSubject.objects.filter(**lookup).delete()
+        return deleted
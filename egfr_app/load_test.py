@@ -0,0 +1,170 @@
+"""Replays concurrent saves of a synthetic cohort's `ResultCrf`
+rows; see `SyntheticCohort`.
+
+Each subject's rows are saved in visit order by one worker, so the
+baseline is calculated before later visits. Subjects are shared
+among `workers` threads, each with its own database connection.
+On SQLite writes are serialized, so more than one worker measures
+lock waits rather than parallel saves. Use PostgreSQL for that.
+"""
+
+from __future__ import annotations
+
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.db import connections
+from edc_registration.models import RegisteredSubject
+
+from edc_egfr.get_drop_notification_model import get_egfr_drop_notification_model_cls
+
+from .models import ResultCrf
+
+
+@dataclass
+class LoadTestReport:
+    workers: int = 1
+    subjects: int = 0
+    seconds: float = 0.0
+    # seconds per successful save
+    latencies: list[float] = field(default_factory=list)
+    # {exception class name: count}
+    errors: dict[str, int] = field(default_factory=dict)
+    notifications_before: int | None = None
+    notifications_after: int | None = None
+
+    def __str__(self):
+        latency = ", ".join(
+            f"p{p} {self.get_percentile(p) * 1000:.1f}ms" for p in [50, 90, 99]
+        )
+        text = (
+            f"{self.saves} saves of {self.subjects} subjects by {self.workers} workers "
+            f"in {self.seconds:.1f}s, {self.throughput:.1f} saves/s\n"
+            f"latency {latency}, max {self.get_percentile(100) * 1000:.1f}ms\n"
+            f"notifications {self.notifications_before} -> {self.notifications_after}"
+        )
+        if self.errors:
+            text += "\nerrors " + ", ".join(f"{k}: {v}" for k, v in self.errors.items())
+        return text
+
+    @property
+    def saves(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.saves / self.seconds if self.seconds else 0.0
+
+    def get_percentile(self, percentile: float) -> float:
+        """Returns the nearest-rank percentile of the latencies, in
+        seconds.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        rank = max(math.ceil(percentile / 100 * len(latencies)), 1)
+        return latencies[rank - 1]
+
+
+def count_egfr_drop_notifications(prefix: str) -> int | None:
+    try:
+        model_cls = get_egfr_drop_notification_model_cls()
+    except (AttributeError, LookupError):
+        return None
+    return model_cls._default_manager.filter(
+        subject_visit__subject_identifier__startswith=f"{prefix}-"
+    ).count()
+
+
+class EgfrLoadTest:
+    """Saves each `ResultCrf` of the cohort with `prefix`, or of the
+    first `subjects`, `repeat` times and reports throughput, save
+    latency and drop notification counts.
+
+    With one worker, saves are replayed in the calling thread.
+    """
+
+    def __init__(
+        self,
+        prefix: str | None = None,
+        workers: int | None = None,
+        subjects: int | None = None,
+        repeat: int | None = None,
+    ):
+        self.prefix = prefix or "SYN"
+        self.workers = workers or 1
+        self.subjects = subjects
+        self.repeat = repeat or 1
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(prefix={self.prefix}, workers={self.workers})"
+
+    def get_subject_identifiers(self) -> list[str]:
+        queryset = (
+            RegisteredSubject.objects.filter(subject_identifier__startswith=f"{self.prefix}-")
+            .order_by("subject_identifier")
+            .values_list("subject_identifier", flat=True)
+        )
+        return list(queryset[: self.subjects] if self.subjects else queryset)
+
+    def run(self) -> LoadTestReport:
+        subject_identifiers = self.get_subject_identifiers()
+        report = LoadTestReport(workers=self.workers, subjects=len(subject_identifiers))
+        report.notifications_before = count_egfr_drop_notifications(self.prefix)
+        pending = queue.SimpleQueue()
+        for _ in range(self.repeat):
+            for subject_identifier in subject_identifiers:
+                pending.put(subject_identifier)
+        start = time.perf_counter()
+        if self.workers == 1:
+            self.save_subjects(pending, report)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    executor.submit(self.run_worker, pending, report)
+                    for _ in range(self.workers)
+                ]
+            for future in futures:
+                future.result()
+        report.seconds = time.perf_counter() - start
+        report.notifications_after = count_egfr_drop_notifications(self.prefix)
+        return report
+
+    def run_worker(self, pending: queue.SimpleQueue, report: LoadTestReport) -> None:
+        try:
+            self.save_subjects(pending, report)
+        finally:
+            connections.close_all()
+
+    def save_subjects(self, pending: queue.SimpleQueue, report: LoadTestReport) -> None:
+        """Saves the rows of subjects from `pending` until it is
+        empty.
+        """
+        while True:
+            try:
+                subject_identifier = pending.get_nowait()
+            except queue.Empty:
+                return
+            pks = (
+                ResultCrf.objects.filter(subject_visit__subject_identifier=subject_identifier)
+                .order_by("report_datetime")
+                .values_list("pk", flat=True)
+            )
+            for pk in pks:
+                obj = ResultCrf.objects.select_related("subject_visit").get(pk=pk)
+                start = time.perf_counter()
+                try:
+                    obj.save()
+                except Exception as e:
+                    name = e.__class__.__name__
+                    with self._lock:
+                        report.errors[name] = report.errors.get(name, 0) + 1
+                else:
+                    latency = time.perf_counter() - start
+                    with self._lock:
+                        report.latencies.append(latency)
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import color_style
+
+from egfr_app.load_test import EgfrLoadTest
+
+style = color_style()
+
+
+class Command(BaseCommand):
+    help = "Replay concurrent saves of a synthetic cohort's results and report the timings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default="SYN",
+            help="Subject identifier prefix of the cohort. Default: SYN",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of threads saving in parallel. Default: 1",
+        )
+        parser.add_argument(
+            "--subjects",
+            type=int,
+            default=None,
+            help="Save the results of the first N subjects only. Default: all",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Number of passes over the subjects. Default: 1",
+        )
+
+    def handle(self, *args, **options):
+        report = EgfrLoadTest(
+            prefix=options["prefix"],
+            workers=options["workers"],
+            subjects=options["subjects"],
+            repeat=options["repeat"],
+        ).run()
+        sys.stdout.write(f"{report}\n")
+        sys.stderr.write(style.MIGRATE_HEADING("Done\n"))
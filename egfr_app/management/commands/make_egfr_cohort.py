@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import color_style
+
+from egfr_app.cohort import SyntheticCohort
+
+style = color_style()
+
+
+class Command(BaseCommand):
+    help = "Bulk-create a synthetic cohort with creatinine results for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subjects",
+            type=int,
+            default=1000,
+            help="Number of subjects. Default: 1000",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="SYN",
+            help="Subject identifier prefix. Default: SYN",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Random seed, for a reproducible cohort",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=500,
+            help="Subjects inserted per transaction. Default: 500",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            default=False,
+            help="Delete the subjects with this prefix before creating the cohort",
+        )
+
+    def handle(self, *args, **options):
+        cohort = SyntheticCohort(
+            subjects=options["subjects"],
+            prefix=options["prefix"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+        )
+        if options["delete"]:
+            sys.stderr.write(f"  * deleted {cohort.delete()} subjects\n")
+        summary = cohort.make()
+        sys.stderr.write(style.MIGRATE_HEADING(f"Done. Created {summary}.\n"))
@@ -17,6 +17,7 @@ from edc_screening.model_mixins import ScreeningIdentifierModelMixin
 from edc_sites.model_mixins import SiteModelMixin
 from edc_utils import get_utcnow
 from edc_visit_tracking.models import SubjectVisit
+from edc_vitals.models import WeightField
 
 from edc_egfr.model_mixins import EgfrDropNotificationModelMixin, EgfrModelMixin
 
@@ -132,3 +133,15 @@ class EgfrDropNotification(
 
     class Meta(EgfrDropNotificationModelMixin.Meta, BaseUuidModel.Meta):
         app_label = "egfr_app"
+
+
+class SubjectVitals(models.Model):
+    subject_visit = models.ForeignKey(SubjectVisit, on_delete=PROTECT)
+
+    report_datetime = models.DateTimeField(
+        verbose_name="Report Date and Time",
+        default=get_utcnow,
+        help_text="Date and time of report.",
+    )
+
+    weight = WeightField(null=True, blank=True)
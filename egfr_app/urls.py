@@ -1,10 +1,11 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.views.generic import RedirectView
 
 app_name = "edc_egfr"
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("edc_egfr/", include("edc_egfr.urls")),
     path("", RedirectView.as_view(url="admin/"), name="home_url"),
 ]